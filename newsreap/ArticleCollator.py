@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+#
+# Collates the articles cached in a group database into posts (NZB-Files)
+#
+# Copyright (C) 2017 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+
+import sqlite3
+import hashlib
+from sys import maxint
+from datetime import datetime
+
+from newsreap.codecs.CodecYenc import CodecYenc
+from newsreap.NNTPnzb import NNTPnzb
+from newsreap.NNTPArticle import NNTPArticle
+from newsreap.NNTPEmptyContent import NNTPEmptyContent
+from newsreap.NNTPSegmentedPost import NNTPSegmentedPost
+from newsreap.ArticleIndexWriter import SQLITE_DATETIME_FORMAT
+
+# Logging
+import logging
+from newsreap.Logging import NEWSREAP_ENGINE
+logger = logging.getLogger(NEWSREAP_ENGINE)
+
+# The articles we collate (in the order they were posted); articles marked
+# for deletion are left alone
+ARTICLE_COLLATE_SQL = \
+    'SELECT message_id, article_no, subject, poster, size, posted_date ' \
+    'FROM article WHERE article_no > ? AND article_no <= ? ' \
+    'AND deleted IS NULL ORDER BY article_no LIMIT ?'
+
+# The statement used to create the posts we find; posts we already have
+# are left alone
+POST_INSERT_SQL = \
+    'INSERT OR IGNORE INTO post (key, poster, subject, count, files, ' \
+    'segments, total, size, complete) VALUES (?, ?, ?, ?, 0, 0, 0, 0, 0)'
+
+# The statement used to store our segments; parts we already have (such as
+# those that were reposted) are left alone
+SEGMENT_INSERT_SQL = \
+    'INSERT OR IGNORE INTO segment (message_id, post_key, filename, part, ' \
+    'total, article_no, size, posted_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
+
+# Tallies the files (and segments) of the posts specified; the number of
+# files found, segments found, segments expected, files complete, size and
+# oldest segment is returned for each of them
+POST_TALLY_SQL = \
+    'SELECT post_key, count(*), sum(parts), sum(total), ' \
+    'sum(parts >= total), sum(size), min(posted_date) FROM (' \
+    'SELECT post_key, count(*) AS parts, max(total) AS total, ' \
+    'sum(size) AS size, min(posted_date) AS posted_date FROM segment ' \
+    'WHERE post_key IN (%s) GROUP BY post_key, filename) GROUP BY post_key'
+
+# The statement used to update a post with it's tally; a post is complete
+# once we have every file we were told to expect and every part of them.
+# A post that gained segments has to be written again.
+POST_UPDATE_SQL = \
+    'UPDATE post SET written = CASE WHEN segments = ? THEN written END, ' \
+    'files = ?, segments = ?, total = ?, size = ?, posted_date = ?, ' \
+    'complete = (count <= ? AND ? = ?), updated = ? WHERE key = ?'
+
+# Returns the posts that are complete but haven't been written yet
+POST_COMPLETE_SQL = \
+    'SELECT key FROM post WHERE complete = 1 AND written IS NULL ' \
+    'ORDER BY posted_date'
+
+# Marks a post as written
+POST_WRITTEN_SQL = 'UPDATE post SET written = ? WHERE key = ?'
+
+# Returns a post
+POST_SELECT_SQL = \
+    'SELECT poster, subject, posted_date FROM post WHERE key = ?'
+
+# Returns the segments of a post (along with the subject of the article
+# they were found in)
+SEGMENT_SELECT_SQL = \
+    'SELECT s.message_id, s.filename, s.part, s.size, s.posted_date, ' \
+    'a.subject FROM segment s LEFT JOIN article a ' \
+    'ON a.message_id = s.message_id WHERE s.post_key = ? ' \
+    'ORDER BY s.filename, s.part'
+
+# The most posts we tally with a single statement
+POST_TALLY_LIMIT = 500
+
+
+class ArticleCollator(object):
+    """
+    Collates the articles cached in an (SQLite) group database into posts.
+
+    Articles are parsed (see CodecYenc.parse_article()) for the file and
+    part they hold; every article posted by the same poster under the
+    same description belongs to the same post.  Posts are keyed by a hash
+    of just that, so each article is stored (as a segment) against it's
+    post as we go; a group never has to be sorted into posts.
+
+    Articles are collated a chunk at a time in the order they were posted
+    and only the posts they touched are tallied again; the pointer (see
+    on_commit) is advanced after each chunk so we can pick up where we
+    left off the next time around.
+
+    """
+
+    def __init__(self, path, pointer=0, on_commit=None, chunk_size=100000,
+                 codecs=None):
+        """
+        Initializes our collator for the SQLite database file specified.
+
+        The pointer is the last article number already collated; our
+        on_commit callback (if specified) is called with the new pointer
+        each time it advances.
+
+        """
+        # The SQLite database we collate
+        self.path = path
+
+        # The last article number collated
+        self.pointer = pointer
+
+        # Called with our pointer each time it advances
+        self.on_commit = on_commit
+
+        # The number of articles we collate in a single transaction
+        self.chunk_size = chunk_size
+
+        # The codecs used to parse our article subjects
+        self._codecs = codecs
+        if not self._codecs:
+            self._codecs = [CodecYenc(), ]
+
+        # The number of articles collated
+        self.count = 0
+
+        # The number of articles that didn't belong to a post
+        self.skipped = 0
+
+        # Open our database
+        self._db = sqlite3.connect(self.path)
+
+        # SQLite Speed changes
+        self._db.execute('PRAGMA journal_mode = MEMORY')
+        self._db.execute('PRAGMA temp_store = MEMORY')
+        self._db.execute('PRAGMA synchronous = OFF')
+
+    @staticmethod
+    def key(poster, subject, count=0):
+        """
+        Returns the key of the post the poster, description and file count
+        specified belong to; case and spacing are ignored.
+        """
+        key = u'%s\0%s\0%d' % (
+            poster, u' '.join(subject.lower().split()), count)
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def parse(self, subject):
+        """
+        Returns the results of the first of our codecs to parse the subject
+        specified, otherwise None is returned.
+        """
+        for codec in self._codecs:
+            results = codec.parse_article(subject)
+            if results and results.get('fname'):
+                return results
+
+        return None
+
+    def collate(self, high=None):
+        """
+        Collates the articles after our pointer (up to and including the
+        high article number, if specified).
+
+        Returns True if everything was collated, otherwise False is
+        returned.
+
+        """
+        if high is None:
+            high = maxint
+
+        # Get the current time for our timer
+        cur_time = datetime.now()
+
+        try:
+            while True:
+                chunk = self._db.execute(
+                    ARTICLE_COLLATE_SQL,
+                    (self.pointer, high, self.chunk_size)).fetchall()
+
+                if not chunk:
+                    break
+
+                self._commit(chunk)
+
+                if len(chunk) < self.chunk_size:
+                    break
+
+        except sqlite3.Error as e:
+            logger.error('Failed to collate %s.' % self.path)
+            logger.debug('Exception: %s' % str(e))
+            return False
+
+        # Calculate Processing Time
+        delta_time = datetime.now() - cur_time
+        delta_time = (delta_time.days * 86400) + delta_time.seconds \
+            + (delta_time.microseconds / 1e6)
+
+        logger.info(
+            'Collated %d article(s) in %s sec(s) [skipped=%d].' % (
+                self.count, delta_time, self.skipped))
+
+        return True
+
+    def _commit(self, chunk):
+        """
+        Collates the chunk of articles specified in a single transaction
+        and advances our pointer
+        """
+        posts = {}
+        segments = []
+        for message_id, article_no, subject, poster, size, date in chunk:
+            results = self.parse(subject)
+            if results is None:
+                # Not part of a (binary) post
+                self.skipped += 1
+                continue
+
+            # Single files are often posted without a description
+            desc = results.get('desc') or results['fname']
+            count = results.get('count', 0)
+
+            key = self.key(poster, desc, count)
+            if key not in posts:
+                posts[key] = (key, poster, desc, count)
+
+            segments.append((
+                message_id, key, results['fname'],
+                results.get('yindex', 1), results.get('ycount', 1),
+                article_no, size, date,
+            ))
+
+        with self._db:
+            self._db.executemany(POST_INSERT_SQL, posts.itervalues())
+            self._db.executemany(SEGMENT_INSERT_SQL, segments)
+
+            # Only the posts we touched are tallied again
+            updated = datetime.utcnow().strftime(SQLITE_DATETIME_FORMAT)
+            keys = posts.keys()
+            for n in range(0, len(keys), POST_TALLY_LIMIT):
+                batch = keys[n:n + POST_TALLY_LIMIT]
+                self._db.executemany(POST_UPDATE_SQL, (
+                    (found, files, found, total, size, date, files, complete,
+                     files, updated, key)
+                    for key, files, found, total, complete, size, date in
+                    self._db.execute(POST_TALLY_SQL % ', '.join(
+                        '?' * len(batch)), batch).fetchall()))
+
+        self.count += len(segments)
+        self.pointer = chunk[-1][1]
+        if self.on_commit is not None:
+            self.on_commit(self.pointer)
+
+    def completed(self):
+        """
+        Returns the keys of the posts that are complete but haven't been
+        written yet (see written()); this includes those completed by
+        earlier runs that never got that far.
+        """
+        return [k for k, in self._db.execute(POST_COMPLETE_SQL)]
+
+    def written(self, key):
+        """
+        Marks the post specified as written; it isn't returned by
+        completed() again unless it gains more segments.
+        """
+        with self._db:
+            self._db.execute(POST_WRITTEN_SQL, (
+                datetime.utcnow().strftime(SQLITE_DATETIME_FORMAT), key))
+
+    def nzb(self, key, groups=None, work_dir=None):
+        """
+        Returns an NNTPnzb() object made up of the post specified ready to
+        be written (see NNTPnzb.save()), otherwise None is returned if the
+        post doesn't exist.
+
+        The group(s) specified are associated with each file.
+
+        """
+        post = self._db.execute(POST_SELECT_SQL, (key, )).fetchone()
+        if post is None:
+            return None
+
+        poster, subject, _ = post
+
+        nzb = NNTPnzb(work_dir=work_dir)
+        nzb.meta = {u'name': subject}
+
+        _file = None
+        files = 0
+        for message_id, filename, part, size, date, _subject in \
+                self._db.execute(SEGMENT_SELECT_SQL, (key, )):
+
+            if _file is None or _file.filename != filename:
+                try:
+                    date = datetime.strptime(date, SQLITE_DATETIME_FORMAT)
+
+                except (TypeError, ValueError):
+                    # Articles we couldn't get a date for
+                    date = None
+
+                _file = NNTPSegmentedPost(
+                    filename,
+                    subject=_subject or subject,
+                    poster=poster,
+                    groups=groups,
+                    utc=date,
+                    work_dir=work_dir,
+                    sort_no=files,
+                )
+                nzb.add(_file)
+                files += 1
+
+            article = NNTPArticle(
+                subject=_file.subject,
+                poster=poster,
+                id=message_id,
+                no=part,
+                work_dir=work_dir,
+                codecs=self._codecs,
+            )
+
+            # Store our empty content Placeholder
+            article.add(
+                NNTPEmptyContent(
+                    filepath=filename,
+                    part=part,
+                    total_size=size,
+                    work_dir=work_dir,
+                )
+            )
+
+            _file.add(article)
+
+        return nzb
+
+    def close(self):
+        """
+        Closes our database.
+        """
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __repr__(self):
+        """
+        Return a printable version of our collator
+        """
+        return '<ArticleCollator path="%s" pointer=%d />' % (
+            self.path, self.pointer)
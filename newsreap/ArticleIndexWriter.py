@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+#
+# Writes the article indexes (XOVER results) retrieved into a group database
+#
+# Copyright (C) 2017 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+
+import gevent.monkey
+gevent.monkey.patch_all()
+
+import sqlite3
+from itertools import izip
+from datetime import datetime
+
+from gevent import spawn
+from gevent.queue import Queue
+from gevent.threadpool import ThreadPool
+
+# Logging
+import logging
+from newsreap.Logging import NEWSREAP_ENGINE
+logger = logging.getLogger(NEWSREAP_ENGINE)
+
+# The statement used to store our articles; articles we already have are
+# left alone
+ARTICLE_INSERT_SQL = \
+    'INSERT OR IGNORE INTO article (message_id, article_no, subject, ' \
+    'poster, size, lines, posted_date, score, hidden) ' \
+    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)'
+
+# The format SQLAlchemy stores it's dates in (in an SQLite database)
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+class ArticleIndexWriter(object):
+    """
+    Writes the ArticleIndexBatch() objects it's handed into an (SQLite)
+    group database.
+
+    Batches are queued (up to queue_size of them) and written in large
+    transactions by a greenlet of their own. The actual database work
+    is done in a separate thread so that our connections can keep on
+    fetching while we write.
+
+    Each batch covers a range of article numbers; since batches can be
+    written out of order, the pointer (see on_commit) is only advanced
+    over ranges that have been written without any gaps between them.
+
+    """
+
+    def __init__(self, path, pointer, on_commit=None, queue_size=4,
+                 transaction_size=100000):
+        """
+        Initializes our writer for the SQLite database file specified.
+
+        The pointer is the last article number already written; our
+        on_commit callback (if specified) is called with the new pointer
+        each time it advances.
+
+        """
+        # The SQLite database we write to
+        self.path = path
+
+        # The last article number written (with no gaps before it)
+        self.pointer = pointer
+
+        # Called with our pointer each time it advances
+        self.on_commit = on_commit
+
+        # The number of articles we try to write in a single transaction
+        self.transaction_size = transaction_size
+
+        # The batches waiting to be written
+        self._queue = Queue(maxsize=queue_size)
+
+        # The ranges written that we can't advance our pointer over yet
+        # (mapped low to high)
+        self._ranges = {}
+
+        # Set to the exception that stopped us (if any)
+        self.error = None
+
+        # The number of articles written
+        self.count = 0
+
+        # The thread our database work is done in
+        self._pool = ThreadPool(1)
+
+        # Open our database
+        self._db = self._pool.apply(self._connect)
+
+        # Our writer
+        self._writer = spawn(self._run)
+
+    def _connect(self):
+        """
+        Opens our database (within our thread)
+        """
+        db = sqlite3.connect(self.path, check_same_thread=False)
+
+        # SQLite Speed changes
+        db.execute('PRAGMA journal_mode = MEMORY')
+        db.execute('PRAGMA temp_store = MEMORY')
+        db.execute('PRAGMA synchronous = OFF')
+        db.execute('PRAGMA cache_size = 2000000')
+        return db
+
+    def _write(self, rows):
+        """
+        Writes the rows specified in a single transaction (within our
+        thread)
+        """
+        with self._db:
+            self._db.executemany(ARTICLE_INSERT_SQL, rows)
+
+    def put(self, low, high, batch):
+        """
+        Queues the batch covering the article numbers specified to be
+        written.  We block if there are already too many batches waiting.
+
+        Returns False if we've stopped writing due to an error.
+
+        """
+        if self.error is not None:
+            return False
+
+        self._queue.put((low, high, batch))
+        return True
+
+    def _rows(self, batch):
+        """
+        Returns a generator of the rows to write built straight from the
+        columns of our batch
+        """
+        return ((
+            message_id, article_no, subject, poster, size, lines,
+            date.strftime(SQLITE_DATETIME_FORMAT), score,
+        ) for (message_id, article_no, subject, poster, size, lines, date,
+               score) in izip(*[batch.column(c) for c in (
+                   'id', 'article_no', 'subject', 'poster', 'size', 'lines',
+                   'date', 'score')]))
+
+    def _run(self):
+        """
+        Writes the batches we're handed as they arrive
+        """
+        while True:
+            # Block for our next batch
+            entry = self._queue.get()
+            if entry is StopIteration:
+                break
+
+            entries = [entry]
+            count = len(entry[-1])
+            done = False
+
+            # Gather everything else that is already waiting (within reason)
+            while count < self.transaction_size and not self._queue.empty():
+                entry = self._queue.get()
+                if entry is StopIteration:
+                    done = True
+                    break
+
+                entries.append(entry)
+                count += len(entry[-1])
+
+            if self.error is None:
+                self._commit(entries)
+
+            if done:
+                break
+
+    def _commit(self, entries):
+        """
+        Writes the (low, high, batch) entries specified in a single
+        transaction and advances our pointer
+        """
+        # Get the current time for our timer
+        cur_time = datetime.now()
+
+        rows = []
+        for _, _, batch in entries:
+            rows.extend(self._rows(batch))
+
+        try:
+            self._pool.apply(self._write, (rows, ))
+
+        except sqlite3.Error as e:
+            logger.error('Failed to write %d article(s).' % len(rows))
+            logger.debug('Exception: %s' % str(e))
+            self.error = e
+            return False
+
+        self.count += len(rows)
+
+        # Calculate Processing Time
+        delta_time = datetime.now() - cur_time
+        delta_time = (delta_time.days * 86400) + delta_time.seconds \
+            + (delta_time.microseconds / 1e6)
+
+        logger.info(
+            'Cached %d article(s) in %s sec(s) [queued=%d].' % (
+                len(rows), delta_time, self._queue.qsize()))
+
+        for low, high, _ in entries:
+            self._ranges[low] = high
+
+        self._advance()
+        return True
+
+    def _advance(self):
+        """
+        Advances our pointer over the ranges we've written without any gaps
+        between them.
+        """
+        pointer = self.pointer
+        while (pointer + 1) in self._ranges:
+            pointer = self._ranges.pop(pointer + 1)
+
+        if pointer != self.pointer:
+            self.pointer = pointer
+            if self.on_commit is not None:
+                self.on_commit(pointer)
+
+    def close(self):
+        """
+        Writes anything still queued and closes our database.
+
+        Returns True if everything was written, otherwise False is returned.
+
+        """
+        if self._writer is not None:
+            self._queue.put(StopIteration)
+            self._writer.join()
+            self._writer = None
+
+            self._pool.apply(self._db.close)
+            self._pool.kill()
+
+        return self.error is None
+
+    def __len__(self):
+        """
+        Returns the number of batches waiting to be written
+        """
+        return self._queue.qsize()
+
+    def __repr__(self):
+        """
+        Return a printable version of our writer
+        """
+        return '<ArticleIndexWriter path="%s" pointer=%d />' % (
+            self.path, self.pointer)
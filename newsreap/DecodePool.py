@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+#
+# A pool of processes used to decode retrieved content
+#
+# Copyright (C) 2017 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+
+import gevent.monkey
+gevent.monkey.patch_all()
+
+import socket
+import struct
+import cPickle as pickle
+from io import BytesIO
+from multiprocessing import Process
+from multiprocessing import cpu_count
+
+from gevent.queue import Queue
+
+from .NNTPContent import NNTPContent
+from .codecs.CodecBase import CodecBase
+
+# Logging
+import logging
+from newsreap.Logging import NEWSREAP_ENGINE
+logger = logging.getLogger(NEWSREAP_ENGINE)
+
+# Each message passed to (and from) our workers is prefixed with it's length
+MESSAGE_HEADER = struct.Struct('!I')
+
+
+def send_message(sock, obj):
+    """
+    Sends a (pickled) object over the socket specified; a message of None
+    tells the other end we're done.
+
+    """
+    payload = '' if obj is None else pickle.dumps(obj, -1)
+    sock.sendall(MESSAGE_HEADER.pack(len(payload)) + payload)
+
+
+def recv_message(sock):
+    """
+    Receives an object sent using send_message(). None is returned if we
+    were told we're done (or lost the other end).
+
+    """
+    header = recv_bytes(sock, MESSAGE_HEADER.size)
+    if header is None:
+        return None
+
+    length = MESSAGE_HEADER.unpack(header)[0]
+    if not length:
+        return None
+
+    payload = recv_bytes(sock, length)
+    if payload is None:
+        return None
+
+    return pickle.loads(payload)
+
+
+def recv_bytes(sock, length):
+    """
+    Reads exactly the number of bytes specified from the socket. None is
+    returned if the other end went away before we could.
+
+    """
+    buf = bytearray(length)
+    view = memoryview(buf)
+    offset = 0
+    while offset < length:
+        _bytes = sock.recv_into(view[offset:], length - offset)
+        if not _bytes:
+            return None
+        offset += _bytes
+
+    return str(buf)
+
+
+def decode_payload(data, decoders):
+    """
+    Decodes the payload of an article using the decoders specified.  This
+    is what each of our workers do with the content handed to them.
+
+    A tuple of (body, decoded) is returned where the body is the content
+    no decoder took ownership of and decoded is a list of the NNTPContent
+    objects that were produced.
+
+    """
+    stream = BytesIO(data)
+    length = len(data)
+
+    body = BytesIO()
+    decoded = []
+
+    for decoder in decoders:
+        # Prepare our decoders for re-use
+        decoder.reset()
+
+    while stream.tell() < length:
+        ptr = stream.tell()
+        line = stream.readline()
+
+        # Find the decoder that can handle our content (if any)
+        codec = next((d for d in decoders if d.detect(line) is not None), None)
+        if codec is None:
+            # All data matched that no decoder took ownership off is
+            # saved into our body
+            body.write(line)
+            continue
+
+        # Begin decoding content
+        stream.seek(ptr)
+        result = codec.decode(stream)
+        if result is True:
+            # We have all of the data there is; so store our decoded
+            # content (complete or not)
+            result = codec.decoded
+
+        if isinstance(result, NNTPContent):
+            decoded.append(result)
+
+        if stream.tell() == ptr:
+            # Safety; our decoder didn't move us along
+            body.write(stream.readline())
+
+    return body.getvalue(), decoded
+
+
+def worker(sock):
+    """
+    The main loop of each of our worker processes; it handles each
+    payload it receives until it's told to stop.
+
+    A payload that can't be decoded is answered with a string describing
+    the problem so that we're still around to handle the next one.
+
+    """
+    while True:
+        try:
+            request = recv_message(sock)
+
+        except (socket.error, EOFError):
+            break
+
+        if request is None:
+            break
+
+        try:
+            data, decoders = request
+            body, decoded = decode_payload(data, decoders)
+
+            results = []
+            for content in decoded:
+                # Our content is handed back to our parent; so we need to
+                # detach it to prevent it from being cleaned up by us
+                content.close()
+                results.append((content, content.is_attached()))
+                content.detach()
+
+            reply = (body, results)
+
+        except Exception as e:
+            # Let our parent know we couldn't decode it
+            reply = 'Could not decode payload: %s' % str(e)
+
+        try:
+            send_message(sock, reply)
+
+        except socket.error:
+            break
+
+    sock.close()
+
+
+class DecodePool(object):
+    """
+    Decoding is CPU bound; when all of it happens within our connection
+    greenlets we're limited to a single core.  A DecodePool hands the
+    article content retrieved to a number of worker processes to decode
+    instead and returns the results back to us.
+
+    Workers are forked when the pool is created so it should be created
+    before any connections are made.
+
+    """
+
+    def __init__(self, processes=None):
+        """
+        Initializes our pool of workers; if the number of processes isn't
+        specified then one is spawned for each CPU available.
+
+        """
+        if not processes:
+            processes = cpu_count()
+
+        # Our worker processes
+        self._processes = []
+
+        # The sockets to each of our workers that aren't busy
+        self._idle = Queue()
+
+        for _ in range(processes):
+            parent, child = socket.socketpair()
+
+            # Our workers can sit idle for a while; so we never want to
+            # inherit a default timeout
+            parent.settimeout(None)
+            child.settimeout(None)
+
+            process = Process(target=worker, args=(child, ))
+            process.daemon = True
+            process.start()
+
+            # The child's end is no longer needed in our process
+            child.close()
+
+            self._processes.append((process, parent))
+            self._idle.put(parent)
+
+        logger.info("Started %d decoding process(es)." % processes)
+
+    def decode(self, response, data, decoders):
+        """
+        Decodes the data specified using the decoders provided and stores
+        the results into the response.  Only the calling greenlet waits on
+        the results.
+
+        Returns True if the data was decoded, otherwise False is returned
+        (in which case the response is left untouched).
+
+        A worker we lose along the way is dropped from our pool.
+
+        """
+        if not self._processes:
+            # We've been closed
+            return False
+
+        if isinstance(decoders, CodecBase):
+            decoders = [decoders, ]
+
+        sock = self._idle.get()
+        if sock is None:
+            # We have no workers left; let anyone else waiting know too
+            self._idle.put(None)
+            return False
+
+        try:
+            send_message(sock, (data, decoders))
+
+        except (pickle.PicklingError, TypeError) as e:
+            # Our content couldn't be handed to our worker; but nothing
+            # was sent so it's still good to use
+            logger.debug('DecodePool exception: %s' % str(e))
+            self._idle.put(sock)
+            return False
+
+        except socket.error as e:
+            logger.debug('DecodePool exception: %s' % str(e))
+            results = None
+
+        else:
+            try:
+                results = recv_message(sock)
+
+            except (socket.error, pickle.UnpicklingError, EOFError) as e:
+                logger.debug('DecodePool exception: %s' % str(e))
+                results = None
+
+        if results is None:
+            # Our worker is gone (or we're no longer in sync with it)
+            self._drop(sock)
+            logger.warning('Decoding could not be handed to our pool.')
+            return False
+
+        self._idle.put(sock)
+
+        if not isinstance(results, tuple):
+            # Our worker couldn't decode our content
+            logger.warning(results)
+            return False
+
+        body, decoded = results
+
+        # Store our results
+        response.body.write(body)
+        for content, attached in decoded:
+            if attached:
+                # Take ownership of our content
+                content.attach()
+
+            response.decoded.add(content)
+
+        return True
+
+    def _drop(self, sock):
+        """
+        Removes the worker we talk to over the socket specified from our
+        pool.
+        """
+        for entry in self._processes:
+            if entry[1] is sock:
+                self._processes.remove(entry)
+                process = entry[0]
+                if process.is_alive():
+                    process.terminate()
+                process.join(1)
+                break
+
+        sock.close()
+        logger.warning(
+            'Dropped a decoding process; %d remain.' % len(self._processes))
+
+        if not self._processes:
+            # Wake anyone still waiting on a worker
+            self._idle.put(None)
+
+    def close(self):
+        """
+        Stops all of our workers
+        """
+        while self._processes:
+            process, sock = self._processes.pop()
+            try:
+                send_message(sock, None)
+
+            except socket.error:
+                pass
+
+            sock.close()
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+
+        # Reset our idle workers
+        self._idle = Queue()
+
+    def __len__(self):
+        """
+        Returns the number of worker processes in our pool
+        """
+        return len(self._processes)
+
+    def __del__(self):
+        """
+        Gracefully stop our workers
+        """
+        self.close()
+
+    def __repr__(self):
+        """
+        Return a printable version of our pool
+        """
+        return '<DecodePool processes=%d />' % len(self._processes)
@@ -870,6 +870,22 @@ class NNTPArticle(object):
         """
         return self.decoded[index]
 
+    def __getstate__(self):
+        """
+        Our decoded content is kept in a sortedset which can't be pickled
+        (because of it's key) so we store it as a list instead.
+        """
+        state = self.__dict__.copy()
+        state['decoded'] = list(self.decoded)
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores a pickled article
+        """
+        self.__dict__.update(state)
+        self.decoded = sortedset(state['decoded'], key=lambda x: x.key())
+
     def __str__(self):
         """
         Return a printable version of the article
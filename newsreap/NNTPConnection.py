@@ -77,6 +77,10 @@ EOD_RE = re.compile(r'(\.([\r]?\n))$')
 # the below fixes this
 EOLS_RE = re.compile(r'[\r]?\n')
 
+# Used to detect the end of a multi-line response while pipelining; the
+# leading new line belongs to the last line of the payload.
+PIPELINE_EOD_RE = re.compile(r'\n\.\r?\n')
+
 # When data compression in in play, the following delimiter is used
 # to deliminate the chunks of compressed data
 GZIP_EOL_RE = re.compile(r'\.([\r]?\n)$')
@@ -113,6 +117,13 @@ GZIP_COMPRESS_RE = re.compile(
     re.IGNORECASE,
 )
 
+# Scans against the CAPABILITIES response to detect if the server supports
+# RFC8054 (COMPRESS DEFLATE)
+DEFLATE_CAPABILITY_RE = re.compile(
+    r'^\s*COMPRESS\s+(.*\s)?DEFLATE(\s|$)',
+    re.IGNORECASE | re.MULTILINE,
+)
+
 # Scans against the status message to detect if posting is allowed
 POSTING_OK_RE = re.compile(
     r'.*POSTING OK.*',
@@ -169,8 +180,8 @@ class NNTPConnection(SocketBase):
         - can seek_by_date() using a recusive binary style searching
           which can narrow in great time!
 
-        - all socket i/o parsed through a BytesIO block to
-          save on the constent allocation strings would normally
+        - all socket i/o is read directly into a re-usable bytearray
+          to save on the constent allocation strings would normally
           have caused. Content is then further parsed and broken into
           an easy to parse dictionary (stored in a btree) and
           returned for the user for parsing.
@@ -183,17 +194,12 @@ class NNTPConnection(SocketBase):
     # it has the potential to get quite larger.
     MAX_BUFFER_SIZE = 10485760
 
-    # The number of characters to read backwards at a time when scanning
-    # for a new line character during situations where we've received
-    # partial data we don't want to process yet. A new line delimiter
-    # found allows us to safely process what is before it.
-    READBACK_CHUNK_SIZE = 128
-
     def __init__(self, username=None, password=None, secure=False,
                  iostream=NNTPIOStream.RFC3977_GZIP,
                  join_group=False, use_body=False, use_head=True,
-                 encoding=None, work_dir=None,
-                 filters=None, hooks=None, *args, **kwargs):
+                 encoding=None, work_dir=None, pipeline=1,
+                 filters=None, hooks=None, decode_pool=None,
+                 *args, **kwargs):
         """
         Initialize NNTP Connection
 
@@ -205,11 +211,16 @@ class NNTPConnection(SocketBase):
         --------
         NewsReap was developed in order to communicate with an NNTP server.
         The idea behind the IOStream is to allow us to handle other protocols
-        too. At this time, there are only really 2 values to specify here:
+        too. At this time, there are only really 3 values to specify here:
            - NNTPIOStream.RFC3977_GZIP : Support GZIP Compression wrapped
                                           around the standard RFC3977 (NNTP)
                                           protocol.
 
+           - NNTPIOStream.RFC8054_DEFLATE : Compress the entire session
+                                          (RFC8054) if the server advertises
+                                          it; otherwise we fall back to
+                                          NNTPIOStream.RFC3977_GZIP.
+
            - NNTPIOStream.RFC3977      : Standard RFC3977 (NNTP) Protocol
 
         join_group
@@ -236,6 +247,20 @@ class NNTPConnection(SocketBase):
         some cases. By default this is set to False so we can acquire as much
         information on the article we're retrieving as we can dispite the
         small overhead that it comes with.
+
+        pipeline
+        --------
+        The number of ARTICLE, BODY, HEAD or STAT commands we're allowed to
+        have outstanding on the server at once when fetching content in
+        batches (see get_many() and stat_many()). Pipelining saves us from
+        waiting a full round trip between each article which greatly helps
+        on high latency connections. Set this to 1 to disable pipelining.
+
+        decode_pool
+        -----------
+        A DecodePool() to hand the content we retrieve to for decoding. This
+        moves the (CPU bound) decoding off of our connection and onto other
+        processes.  If set to None, content is decoded as it arrives.
         """
 
         # get connection mode
@@ -345,8 +370,9 @@ class NNTPConnection(SocketBase):
         # or not.
         self._data_len = 0
 
-        # Temporary Buffer of read (unprocessed) data
-        self._buffer = BytesIO()
+        # Temporary Buffer of read (unprocessed) data; this is a bytearray
+        # we allocate on our first read and re-use there after
+        self._buffer = None
 
         # Our response code (integer) returned by the NNTPServer on the last
         # request made
@@ -396,6 +422,17 @@ class NNTPConnection(SocketBase):
         # Used to cache group list responses
         self._grouplist = None
 
+        # The number of commands we can have outstanding on the server at
+        # once when pipelining
+        try:
+            self.pipeline_window = max(1, int(pipeline))
+
+        except (TypeError, ValueError):
+            logger.warning(
+                'An invalid pipeline (%s) was specified; pipelining '
+                'disabled.' % str(pipeline))
+            self.pipeline_window = 1
+
         # Default Working Directory
         # All temporary content is downloaded to this location.  If set to
         # None then the defaults are used instead.
@@ -404,6 +441,9 @@ class NNTPConnection(SocketBase):
         else:
             self.work_dir = abspath(expanduser(work_dir))
 
+        # The pool of processes (if any) we hand our decoding off to
+        self.decode_pool = decode_pool
+
     def append(self, connection, *args, **kwargs):
         """
         Add a backup NNTP Server (Block Account) which is only
@@ -509,6 +549,23 @@ class NNTPConnection(SocketBase):
 
         logger.info('NNTP USER/PASS Handshake was successful.')
 
+        if self._iostream == NNTPIOStream.RFC8054_DEFLATE:
+            # Only request compression if the server advertises it
+            response = self.send('CAPABILITIES')
+            if response.code in NNTPResponseCode.SUCCESS_MULTILINE and \
+                    DEFLATE_CAPABILITY_RE.search(
+                        response.body.getvalue() or ''):
+                response = self.send('COMPRESS DEFLATE')
+
+            if response.code in NNTPResponseCode.SUCCESS and self.deflate():
+                # Everything from here on is compressed
+                logger.info('NNTP Session Compression enabled.')
+
+            else:
+                # Not supported; try the next best thing
+                logger.warning('NNTP Session Compression not supported.')
+                self._iostream = NNTPIOStream.RFC3977_GZIP
+
         if self._iostream == NNTPIOStream.RFC3977_GZIP:
             # Do Compression
             response = self.send('XFEATURE COMPRESS GZIP')
@@ -1403,7 +1460,8 @@ class NNTPConnection(SocketBase):
         # Return
         return True
 
-    def get(self, id, work_dir=None, decoders=None, group=None, max_bytes=0):
+    def get(self, id, work_dir=None, decoders=None, group=None, max_bytes=0,
+            assembly_dir=None):
         """
         A wrapper to the _get call allowing support for more then one type
         of object (oppose to just _get() which only accepts the message id
@@ -1417,6 +1475,10 @@ class NNTPConnection(SocketBase):
         inspect the first bytes of a binary file. Set this to zero to download
         the entire thing (this is the default value)
 
+        If an assembly_dir is specified, then the parts of multi-part yEnc
+        files are decoded straight into the file they make up within it
+        (see NNTPSegmentedPost.place()).
+
         """
         if work_dir is None:
             # Default
@@ -1430,6 +1492,7 @@ class NNTPConnection(SocketBase):
                 decoders=decoders,
                 group=group,
                 max_bytes=max_bytes,
+                assembly_dir=assembly_dir,
             )
 
         # A sorted list of all articles pulled down
@@ -1458,6 +1521,7 @@ class NNTPConnection(SocketBase):
                     decoders=decoders,
                     group=group,
                     max_bytes=max_bytes,
+                    assembly_dir=assembly_dir,
                 )
 
         elif isinstance(id, NNTPSegmentedPost):
@@ -1619,7 +1683,8 @@ class NNTPConnection(SocketBase):
         # Return our response
         return response
 
-    def _get(self, id, work_dir, decoders=None, group=None, max_bytes=0):
+    def _get(self, id, work_dir, decoders=None, group=None, max_bytes=0,
+             assembly_dir=None):
         """
         Download a specified message to the work_dir specified. This function
         returns an NNTPArticle() object if it can.
@@ -1649,6 +1714,25 @@ class NNTPConnection(SocketBase):
             logger.error('Could not create directory %s' % work_dir)
             return None
 
+        # Prepare our decoders
+        decoders = self._get_decoders(
+            work_dir=work_dir, decoders=decoders, max_bytes=max_bytes,
+            assembly_dir=assembly_dir)
+
+        # Send our command and handle the response
+        response = self.send(self._get_command(id), decoders=decoders)
+        return self._get_article(
+            id=id, work_dir=work_dir, group=group, response=response)
+
+    def _get_decoders(self, work_dir, decoders=None, max_bytes=0,
+                      assembly_dir=None):
+        """
+        Returns the list of decoders to use when retrieving an article.  If
+        no decoders were specified, then a default list is generated based
+        on our configuration (our yEnc decoder assembles it's parts in the
+        assembly_dir specified).
+
+        """
         if decoders is None:
             # Prepare a default list of decoders
             decoders = list()
@@ -1660,7 +1744,9 @@ class NNTPConnection(SocketBase):
 
             decoders.extend([
                 # Yenc Encoder/Decoder
-                CodecYenc(work_dir=work_dir, max_bytes=max_bytes),
+                CodecYenc(
+                    work_dir=work_dir, max_bytes=max_bytes,
+                    assembly_dir=assembly_dir),
                 # UUEncoder/Decoder
                 CodecUU(work_dir=work_dir, max_bytes=max_bytes),
             ])
@@ -1672,18 +1758,35 @@ class NNTPConnection(SocketBase):
         elif isinstance(decoders, CodecBase):
             decoders = [decoders, ]
 
+        return decoders
+
+    def _get_command(self, id):
+        """
+        Returns the NNTP command used to retrieve the article identified.
+
+        """
         if self.use_body:
             # Body returns the contents past the header;  Hence there will be
             # no header information to parse if this is the option used.
 
             # This is faster, but does not allow for some extra checking
             # we can do.
-            response = self.send('BODY <%s>' % id, decoders=decoders)
-        else:
-            # Article retrives the same content as Body plus the Header
-            # too.
-            response = self.send('ARTICLE <%s>' % id, decoders=decoders)
+            return 'BODY <%s>' % id
+
+        # Article retrives the same content as Body plus the Header
+        # too.
+        return 'ARTICLE <%s>' % id
+
+    def _get_article(self, id, work_dir, group, response):
+        """
+        Takes the response returned by the NNTP Server after requesting an
+        article and builds an NNTPArticle() object from it.
+
+        None is returned if the content could not be retrieved; in which case
+        our backup servers (if any) are consulted in the order they were
+        added.
 
+        """
         if response.is_success(multiline=True):
             # we're good to go!
             pass
@@ -1720,6 +1823,140 @@ class NNTPConnection(SocketBase):
         # Return the content retrieved
         return article
 
+    def get_many(self, ids, work_dir=None, decoders=None, group=None,
+                 max_bytes=0, assembly_dir=None):
+        """
+        Retrieves several articles at once by pipelining the requests to the
+        NNTP Server (see send_many()).  Since we don't have to wait on a
+        full round trip between each article, this is much faster on high
+        latency connections.
+
+        A list of NNTPArticle() objects (or None for the ones that could not
+        be retrieved) is returned in the same order the ids were specified
+        in.
+
+        """
+        if work_dir is None:
+            # Default
+            work_dir = self.work_dir
+
+        # Support NNTPArticle() objects as well as Message-IDs
+        ids = [i.id if isinstance(i, NNTPArticle) else i for i in ids]
+
+        if self.join_group and group is not None and group != self.group_name:
+            # allow us to switch groups if nessisary
+            if self.group(group)[0] is None:
+                # Could not select group
+                logger.error('Could not select group %s' % group)
+                return [None for i in ids]
+
+        if not isdir(work_dir) and not mkdir(work_dir):
+            logger.error('Could not create directory %s' % work_dir)
+            return [None for i in ids]
+
+        # Each command needs it's own set of decoders since they carry state
+        # with them as they decode.  If decoders were specified, then they're
+        # reset between each response instead.
+        responses = self.send_many([(
+            self._get_command(id),
+            self._get_decoders(
+                work_dir=work_dir, decoders=decoders, max_bytes=max_bytes,
+                assembly_dir=assembly_dir),
+            ) for id in ids])
+
+        results = []
+        for id, response in zip(ids, responses):
+            if response.code in (
+                    NNTPResponseCode.NO_CONNECTION,
+                    NNTPResponseCode.CONNECTION_LOST):
+                # We lost our pipeline part way through; fall back to
+                # fetching whatever remains one at a time
+                results.append(self._get(
+                    id=id,
+                    work_dir=work_dir,
+                    decoders=decoders,
+                    group=group,
+                    max_bytes=max_bytes,
+                    assembly_dir=assembly_dir,
+                ))
+                continue
+
+            results.append(self._get_article(
+                id=id, work_dir=work_dir, group=group, response=response))
+
+        return results
+
+    def stat_many(self, ids, full=None, group=None):
+        """
+        Checks for the existance of several articles at once by pipelining
+        our STAT (or HEAD) requests to the NNTP Server.
+
+        A list of results is returned in the same order the ids were
+        specified in; each entry is identical to what stat() would have
+        returned for it.
+
+        """
+        if full is None:
+            # default
+            full = self.use_head
+
+        # Support NNTPArticle() objects as well as Message-IDs
+        ids = [i.id if isinstance(i, NNTPArticle) else i for i in ids]
+
+        if self.join_group and group is not None and group != self.group_name:
+            # allow us to switch groups if nessisary
+            if self.group(group)[0] is None:
+                # Could not select group
+                logger.error('Could not select group %s' % group)
+                return [None for i in ids]
+
+        if not full:
+            commands = [('STAT <%s>' % id, None) for id in ids]
+
+        else:
+            commands = [('HEAD <%s>' % id, [CodecHeader(
+                encoding=self.encoding,
+                work_dir=self.work_dir,
+            )]) for id in ids]
+
+        results = []
+        for id, response in zip(ids, self.send_many(commands)):
+            if response.code in (
+                    NNTPResponseCode.NO_CONNECTION,
+                    NNTPResponseCode.CONNECTION_LOST):
+                # We lost our pipeline part way through; fall back to
+                # checking whatever remains one at a time
+                results.append(self._stat(id=id, full=full))
+
+            elif response.is_success(multiline=False):
+                # we're good to go, return what we do know so it fits
+                _results = NNTPHeader()
+                _results['Message-ID'] = id
+                results.append(_results)
+
+            elif response.is_success(multiline=True) and response.decoded:
+                # Return our content
+                results.append(response.decoded.pop())
+
+            elif response.code in NNTPResponseCode.NO_ARTICLE:
+                if self._backups:
+                    # Try our backup servers in the sequential order they
+                    # were added in
+                    results.append(next((
+                        b.article for b in self._backups
+                        if b.stat(id=id, full=full, group=self.group_name)
+                        not in (None, False)), False))
+
+                else:
+                    logger.warning('ARTICLE <%s> not found.' % id)
+                    results.append(False)
+
+            else:
+                logger.error('NNTP Error %s' % response)
+                results.append(None)
+
+        return results
+
     def send(self, command, timeout=None, decoders=None, retries=0):
         """
         A Simple wrapper for sending NNTP commands to the server
@@ -1804,6 +2041,218 @@ class NNTPConnection(SocketBase):
             'Invalid Command: "%s"' % command,
         )
 
+    def send_many(self, commands, timeout=NNTP_RESPONSE_TIMEOUT):
+        """
+        Pipelines the commands specified to the NNTP Server.  Up to
+        pipeline_window commands are kept outstanding on the server at any
+        given time.  The responses come back in the same order the commands
+        were sent which is how we demultiplex them.
+
+        commands is a list of (command, decoders) tuples.  A list of
+        NNTPResponse() objects is returned in the same order as the commands
+        were specified in.
+
+        Only commands whose response can be identified by it's status code
+        alone (ARTICLE, BODY, HEAD and STAT) should be pipelined.  If the
+        connection is lost part way through, the remaining responses are
+        flagged as CONNECTION_LOST so that they can be retried by the caller.
+        """
+        commands = list(commands)
+
+        # The responses we've received
+        responses = []
+
+        if not self.connected:
+            # Attempt to establish a connection
+            if not self.connect():
+                logger.error('Could not establish a connetion to NNTP Server.')
+                return [NNTPResponse(
+                    NNTPResponseCode.NO_CONNECTION,
+                    'No Connection',
+                ) for c in commands]
+
+        # Soft reset in preparation for returned results
+        self._soft_reset()
+
+        # The number of commands sent to the server
+        sent = 0
+
+        if self._buffer is None or len(self._buffer) < self.MAX_BUFFER_SIZE:
+            # Our read buffer is allocated once and re-used there after
+            self._buffer = bytearray(self.MAX_BUFFER_SIZE)
+
+        # We never copy the buffer itself; we just work with views of it
+        buf = self._buffer
+        view = memoryview(buf)
+
+        # The raw data read from the server that has not been processed yet
+        # sits in our buffer between our head pointer and total_bytes
+        head_ptr = 0
+        total_bytes = 0
+
+        while len(responses) < len(commands):
+            # Top up our window of outstanding commands; we send them in one
+            # block to keep our packet count down
+            window = min(
+                len(commands),
+                len(responses) + self.pipeline_window) - sent
+
+            if window > 0:
+                for command, _ in commands[sent:sent + window]:
+                    logger.debug('send(%s) [pipelined]' % command)
+
+                try:
+                    if not super(NNTPConnection, self).send(EOL.join(
+                            [c[0] for c in commands[sent:sent + window]]) +
+                            EOL):
+                        break
+
+                except SocketException:
+                    # Connection Lost
+                    self.close()
+                    break
+
+                sent += window
+
+            # Acquire our next response
+            command, decoders = commands[len(responses)]
+
+            # Find the end of our status line
+            eol_ptr = buf.find('\n', head_ptr, total_bytes)
+            while eol_ptr < 0:
+                total_bytes = self._fill_buffer(
+                    head_ptr, total_bytes, timeout=timeout)
+                if total_bytes < 0:
+                    break
+
+                head_ptr = 0
+                eol_ptr = buf.find('\n', head_ptr, total_bytes)
+
+            if eol_ptr < 0:
+                # We lost our connection
+                break
+
+            match = NNTP_RESPONSE_RE.match(
+                str(buf[head_ptr:eol_ptr]).strip())
+            if not match:
+                # We're out of sync with the server; there is no way to
+                # safely recover from here
+                logger.error('Bad pipelined response to %s' % command)
+                self.close()
+                break
+
+            response = NNTPResponse(
+                int(match.group('code')),
+                match.group('desc'),
+                work_dir=self.work_dir,
+            )
+            logger.debug('_recv() %d: %s [pipelined]' % (
+                response.code, response.code_str))
+
+            if response.code not in NNTPResponseCode.SUCCESS_MULTILINE:
+                # Single line response; we're done with this one
+                head_ptr = eol_ptr + 1
+                responses.append(response)
+                continue
+
+            # Prepare our data for decoding
+            self._data.truncate(0)
+            self._data.seek(0, SEEK_SET)
+
+            # Our payload starts on the line following our status line; we
+            # always search from the new line preceding it
+            head_ptr = eol_ptr + 1
+
+            # Find the end of our multi-line payload
+            eod_match = PIPELINE_EOD_RE.search(
+                buf, head_ptr - 1, total_bytes)
+            while eod_match is None:
+                # Store what we've got so far; we only hold onto the few
+                # bytes that could still be the start of our end of data
+                # marker
+                if total_bytes - 3 > head_ptr:
+                    self._data.write(view[head_ptr:total_bytes - 3])
+                    head_ptr = total_bytes - 3
+
+                total_bytes = self._fill_buffer(
+                    head_ptr - 1, total_bytes, timeout=timeout)
+                if total_bytes < 0:
+                    break
+
+                head_ptr = 1
+                eod_match = PIPELINE_EOD_RE.search(
+                    buf, head_ptr - 1, total_bytes)
+
+            if eod_match is None:
+                # We lost our connection
+                break
+
+            # Store the remainder of our payload
+            self._data.write(view[head_ptr:eod_match.start() + 1])
+
+            # Adjust our pointer for the next response
+            head_ptr = eod_match.end()
+
+            if decoders is None:
+                decoders = []
+
+            elif isinstance(decoders, CodecBase):
+                decoders = [decoders, ]
+
+            for decoder in decoders:
+                # Prepare our decoders for re-use
+                decoder.reset()
+
+            # We have all of our data at this point
+            self.article_eod = True
+            if not self._decode_pool(response, decoders):
+                self._decode(response, decoders)
+            self.article_eod = False
+
+            # Store our response
+            responses.append(response)
+
+        if len(responses) < len(commands):
+            # We're no longer in sync with the server; drop our connection
+            # and flag the responses we never received accordingly
+            self.close()
+            responses.extend([NNTPResponse(
+                NNTPResponseCode.CONNECTION_LOST,
+                'Connection Lost',
+            ) for c in commands[len(responses):]])
+
+        return responses
+
+    def _fill_buffer(self, head_ptr, total_bytes, timeout=None):
+        """
+        Reads more data from the server into our read buffer.  The
+        unprocessed data (from head_ptr up to total_bytes) is first moved to
+        the front of our buffer so that the rest of it is free to be read
+        into.
+
+        The new number of bytes sitting in our buffer is returned, or -1 if
+        the connection was lost.
+        """
+        if head_ptr > 0:
+            # Only the unprocessed data is kept
+            self._buffer[:total_bytes - head_ptr] = \
+                self._buffer[head_ptr:total_bytes]
+            total_bytes -= head_ptr
+
+        try:
+            _bytes = self.read_into(
+                memoryview(self._buffer)[total_bytes:],
+                timeout=timeout, retry_wait=None,
+            )
+
+        except (SocketException, SignalCaughtException):
+            _bytes = 0
+
+        if not _bytes:
+            return -1
+
+        return total_bytes + _bytes
+
     def _recv(self, decoders=None, timeout=None):
         """ Receive data, return #bytes, done, skip
 
@@ -1835,7 +2284,7 @@ class NNTPConnection(SocketBase):
         # completely downloaded yet
         tail_ptr = 0
 
-        # Tracks the size of the buffer
+        # Tracks the number of bytes sitting in our buffer
         total_bytes = 0
 
         # Our response object
@@ -1844,10 +2293,19 @@ class NNTPConnection(SocketBase):
         # Our decoded result
         decoded = None
 
+        # Compressed payloads are decompressed as they arrive using a single
+        # decompression object; dc_tail holds the last (incomplete) line
+        # it produced until the rest of it is decompressed on our next pass
+        dc_obj = None
+        dc_tail = ''
+
         # The maximum allowable bytes we can parse before we abort
         # this is calculated from the decoders
         max_bytes = 0
 
+        # The portion of our read buffer we're going to use
+        buffer_size = self.MAX_BUFFER_SIZE
+
         if not decoders:
             decoders = []
 
@@ -1863,16 +2321,23 @@ class NNTPConnection(SocketBase):
             # If we determine the end user has specified a max_bytes value,
             # then we adjust the total buffer read size.  This allows us to
             # force an earlier processing.  The minimum buffer size can never
-            # be less than 2048
+            # be less than NNTP_MIN_READ_BUFFER_SIZE
             max_bytes = max([d.max_bytes() for d in decoders])
             if max_bytes > 0:
-                if max_bytes < NNTP_MIN_READ_BUFFER_SIZE:
-                    self.MAX_BUFFER_SIZE = NNTP_MIN_READ_BUFFER_SIZE
-                else:
-                    self.MAX_BUFFER_SIZE = min(
-                        [max_bytes, self.MAX_BUFFER_SIZE])
+                buffer_size = max(
+                    NNTP_MIN_READ_BUFFER_SIZE,
+                    min(max_bytes, self.MAX_BUFFER_SIZE),
+                )
+
+        logger.debug('Read Buffer set to %d bytes' % buffer_size)
+
+        if self._buffer is None or len(self._buffer) < self.MAX_BUFFER_SIZE:
+            # Our read buffer is allocated once and re-used there after
+            self._buffer = bytearray(self.MAX_BUFFER_SIZE)
 
-        logger.debug('Read Buffer set to %d bytes' % self.MAX_BUFFER_SIZE)
+        # We never copy the buffer itself; we just work with views of it
+        buf = self._buffer
+        view = memoryview(buf)
 
         #  We track the last codec activated using the codec_active
         #  variable.
@@ -1883,13 +2348,12 @@ class NNTPConnection(SocketBase):
             # to just wait for a server command line. Otherwise
             # we break out the first second we have data to process
 
-            self._buffer.seek(0, SEEK_END)
-
             try:
-                self._buffer.write(self.read(
-                    max_bytes=self.MAX_BUFFER_SIZE - total_bytes,
+                # Read directly into the free space at the end of our buffer
+                _bytes = self.read_into(
+                    view[total_bytes:buffer_size],
                     timeout=timeout, retry_wait=None,
-                ))
+                )
 
             except (SocketException, SignalCaughtException):
                 logger.debug('_recv() Connection Lost')
@@ -1899,14 +2363,12 @@ class NNTPConnection(SocketBase):
                 )
 
             # Some Stats (TODO)
-            _bytes = self._buffer.tell() - total_bytes
             total_bytes += _bytes
             logger.debug('_recv() %d byte(s) read.' % (_bytes))
 
             # # DEBUG START
-            # self._buffer.seek(head_ptr, SEEK_SET)
             # logger.debug('Characters "%s"' % \
-            #     ", ".join(['0x%0x' % ord(b) for b in self._buffer.read()]))
+            #     ", ".join(['0x%0x' % b for b in buf[head_ptr:total_bytes]]))
             # # DEBUG END
 
             ##################################################################
@@ -1920,11 +2382,12 @@ class NNTPConnection(SocketBase):
                 # Reset our payload flag
                 self.payload_gzipped = None
 
-                # Seek to head of buffer
-                self._buffer.seek(head_ptr, SEEK_SET)
-
                 # Extract Header Response
-                data = self._buffer.readline()
+                eol_ptr = buf.find('\n', head_ptr, total_bytes)
+                if eol_ptr < 0:
+                    # Take what we have
+                    eol_ptr = total_bytes - 1
+                data = str(buf[head_ptr:eol_ptr + 1])
 
                 # Only the first time do we remove the first entry
                 # because this is our header
@@ -1935,7 +2398,7 @@ class NNTPConnection(SocketBase):
                     self.last_resp_str = match.group('desc')
 
                     # Adjust head ptr to end of line
-                    head_ptr = self._buffer.tell()
+                    head_ptr = eol_ptr + 1
 
                 else:
                     if self.connected:
@@ -1979,6 +2442,9 @@ class NNTPConnection(SocketBase):
                     # GZIP response type; toggle our flag
                     self.payload_gzipped = True
 
+                    # Prepare our decompression object for the response
+                    dc_obj = decompressobj()
+
                 else:
                     # Uncompressed response type; toggle our flag
                     self.payload_gzipped = False
@@ -2017,7 +2483,7 @@ class NNTPConnection(SocketBase):
 
             # We have multi-line code to store fill our buffer before
             # proceeding.
-            if can_read and total_bytes < self.MAX_BUFFER_SIZE:
+            if can_read and total_bytes < buffer_size:
                 # Keep storing content until we've either reached the end
                 # or filled our buffer
                 # logger.debug('_recv() Data pending on server...')
@@ -2034,33 +2500,14 @@ class NNTPConnection(SocketBase):
             eol = False
 
             if not can_read and total_bytes > 0:
-                # Offset
-                offset = min(5, total_bytes)
-
-                # The below accomplishes the same results as abs()
-                # but does it at a much faster speed (screw looking pythonic)
-                if offset > 0:
-                    offset = -offset
-
-                self._buffer.seek(offset, SEEK_END)
-
-                # Now we read what we can from the buffer
-                data = self._buffer.read()
-
-                if offset == -5:
-                    # Adjust offset if nessisary
-                    offset += 1
+                # Look at the tail end of our buffer
+                data = str(buf[max(0, total_bytes - 5):total_bytes])
 
                 # Check for the End of Data
                 eod_results = EOD_RE.search(data)
                 if eod_results:
-                    # We can truncate here to trim the EOD off
-                    self._buffer.truncate(
-                        total_bytes - len(eod_results.group(1)),
-                    )
-
-                    # Correct Total Length
-                    total_bytes = self._buffer.seek(0, SEEK_END)
+                    # We can trim the EOD off
+                    total_bytes -= len(eod_results.group(1))
 
                     # Toggle flag so we can break out
                     self.article_eod = True
@@ -2069,30 +2516,15 @@ class NNTPConnection(SocketBase):
                     # match below (this is okay)
                     eol = True
 
-                    # Update Offset
-                    offset = min(2, total_bytes)
-
-                    # The below accomplishes the same results as abs()
-                    # does but at a much faster speed (screw looking
-                    # pythonic)
-                    if offset > 0:
-                        offset = -offset
-
-                    self._buffer.seek(offset, SEEK_END)
-
                     # Now we read what we can from the buffer
-                    data = self._buffer.read()
+                    data = str(buf[max(0, total_bytes - 2):total_bytes])
 
                 # Check for end of line
                 eol_results = EOL_RE.search(data)
-                if eol_results:
-                    # We can truncate here to trim the EOL off
-                    self._buffer.truncate(
-                        total_bytes - len(eol_results.group(1)),
-                    )
-
-                    # Correct Total Length
-                    total_bytes = self._buffer.seek(0, SEEK_END)
+                if eol_results and data.endswith(eol_results.group(1)) \
+                        and not self.payload_gzipped:
+                    # We can trim the EOL off
+                    total_bytes -= len(eol_results.group(1))
 
                     # We have our end of line
                     eol = True
@@ -2109,6 +2541,11 @@ class NNTPConnection(SocketBase):
                         # also returns 211 too and returns a listing
                         self.article_eod = True
 
+                if total_bytes < head_ptr:
+                    # Never trim into content we've already processed (such
+                    # as our status line)
+                    total_bytes = head_ptr
+
             ##################################################################
             #                                                                #
             #  Step: 3: We now have to handle situations where we never      #
@@ -2126,90 +2563,85 @@ class NNTPConnection(SocketBase):
             # downloaded yet.
             tail_ptr = total_bytes
 
-            if not self.payload_gzipped and \
-               total_bytes >= self.MAX_BUFFER_SIZE and not eol:
+            if self.payload_gzipped:
+                if not self.article_eod:
+                    # Compressed content has no lines to speak of so we
+                    # can decompress everything we have; we just hold back
+                    # enough of it to still detect our End of Data (EOD)
+                    # marker on our next pass
+                    tail_ptr = max(head_ptr, total_bytes - 5)
+
+            elif total_bytes >= buffer_size and not eol:
                 # We have a full buffer and there is most likely
                 # a lot more content to still download; we need to find
                 # the last new line
+                offset = buf.rfind('\n', head_ptr, total_bytes)
+                if offset >= 0:
+                    # We found the new line; everything up to (and
+                    # including) it can be processed
+                    tail_ptr = offset + 1
 
-                # Number of characters to look back (chunk):
-                chunk_size = self.READBACK_CHUNK_SIZE
-
-                # Current Matched offset (<0 means no match yet)
-                offset = -1
-
-                # Our reference pointer
-                ref_ptr = tail_ptr - head_ptr
-                while offset < 0:
-                    # Keep iterating backwards by chunk sizes
-                    # until we get a match
-
-                    # a few checks to make sure we don't look past
-                    # our head_ptr
-                    chunk_size = min(ref_ptr - head_ptr, chunk_size)
-                    ref_ptr -= (chunk_size + 1)
-
-                    if ref_ptr < head_ptr:
-                        # Nothing more to look back at; we reached
-                        # the head of our buffer. do nothing; just let
-                        # process all of the data we received.
-                        break
-
-                    chunk_ptr = self._buffer.seek(ref_ptr, SEEK_SET)
-                    offset = self._buffer.read(chunk_size).rfind('\n')
-                    if offset >= 0:
-                        # We found the new line; safe our offset and break
-                        tail_ptr = offset + chunk_ptr
-                        break
+                # otherwise there is nothing more to look back at; we
+                # reached the head of our buffer. just process all of the
+                # data we received.
 
             if not self.payload_gzipped and (tail_ptr - head_ptr) > 0 \
-                    and total_bytes < self.MAX_BUFFER_SIZE \
-                    and tail_ptr < self.MAX_BUFFER_SIZE and self.can_read(1):
+                    and total_bytes < buffer_size \
+                    and tail_ptr < buffer_size and self.can_read(1):
                 # Astraweb is absolutely terrible for sending a little
                 # bit more data a few seconds later. This is a final
                 # call to try to handle these stalls just before the last
                 # few bytes are sent.
                 continue
 
-            # Ensure we're pointing at the head of our buffer
-            self._buffer.seek(head_ptr, SEEK_SET)
-
             # Compression Support
-            if (tail_ptr - head_ptr) > 0:
-                if self.payload_gzipped is True:
+            if self.payload_gzipped is True and \
+                    ((tail_ptr - head_ptr) > 0 or self.article_eod):
 
-                    dc_obj = decompressobj()
-                    try:
-                        self._data.write(dc_obj.decompress(
-                            self._buffer.read(tail_ptr - head_ptr),
-                        ))
+                try:
+                    # Feed our decompression object what we've received
+                    data = dc_tail + dc_obj.decompress(
+                        buffer(buf, head_ptr, tail_ptr - head_ptr))
+
+                    if self.article_eod:
+                        # Acquire anything still held by our decompressor
+                        data += dc_obj.flush()
                         logger.debug("NNTP ZLIB decompression successful.")
 
-                    except ZlibException:
-                        # Decompression error; since compression is only used
-                        # when retrieving server-side listings; it's best to
-                        # just alert the end user and move along
-                        logger.error(
-                            '_recv() %d byte(s) ZLIB decompression failure.'
-                            % (_bytes),
-                        )
+                except ZlibException:
+                    # Decompression error; since compression is only used
+                    # when retrieving server-side listings; it's best to
+                    # just alert the end user and move along
+                    logger.error(
+                        '_recv() %d byte(s) ZLIB decompression failure.'
+                        % (_bytes),
+                    )
 
-                        # Convert our response to that of an response Fetch
-                        # Error
-                        return NNTPResponse(
-                            NNTPResponseCode.FETCH_ERROR,
-                            'Fetch Error',
-                        )
-                else:
-                    # No compression
-                    self._data.write(self._buffer.read(tail_ptr - head_ptr))
+                    # Convert our response to that of an response Fetch
+                    # Error
+                    return NNTPResponse(
+                        NNTPResponseCode.FETCH_ERROR,
+                        'Fetch Error',
+                    )
 
-                # Truncate our original buffer by striping out what was already
-                # processed from it
-                self._buffer = BytesIO(self._buffer.read())
+                # Only pass along complete lines to our decoders unless
+                # there is nothing more to come
+                offset = len(data) if self.article_eod \
+                    else data.rfind('\n') + 1
+                self._data.write(buffer(data, 0, offset))
+                dc_tail = data[offset:]
 
-                # Correct Total Length
-                total_bytes = self._buffer.tell()
+            elif (tail_ptr - head_ptr) > 0:
+                # No compression
+                self._data.write(view[head_ptr:tail_ptr])
+
+            if (tail_ptr - head_ptr) > 0:
+                # Shift whatever (partial line) remains to the front of our
+                # buffer so that we can keep reading in behind it
+                total_bytes -= tail_ptr
+                if total_bytes > 0:
+                    buf[0:total_bytes] = buf[tail_ptr:tail_ptr + total_bytes]
+                head_ptr = 0
 
             ##################################################################
             #                                                                #
@@ -2217,146 +2649,214 @@ class NNTPConnection(SocketBase):
             #           the NNTP stream based on the decoders passed in.     #
             #                                                                #
             ##################################################################
-
-            self._data_len = self._data.seek(0, SEEK_END)
-            d_head = self._data.seek(0, SEEK_SET)
-            while d_head < self._data_len and self.connected:
-
-                if codec_active is None:
-                    # Scan our decoders (sequentially) and detect our match
-                    # If we get a match, then we want to save it in the
-                    # codec_active variable. We use this to track the data
-                    # found for processing.
-
-                    # Get our data
-                    d_head = self._data.tell()
-                    data = self._data.readline()
-
-                    # This line scans the line of data we read and determines
-                    # what kind of data it is (yEnc, Headers, etc) based on the
-                    # decoders passed into _recv()
-                    codec_active = next(
-                        (d for d in decoders
-                            if d.detect(data) is not None), None)
-                    if codec_active:
-                        logger.debug('Decoding using %s' % type(codec_active))
-
-                # Based on previous check; we may actually have an active codec
-                # now if we don't have one yet; well want to store the content
-                # into our body and move along
-                if codec_active is None:
-                    # All data matched that no decoder took ownership off is
-                    # saved into our body
-                    response.body.write(data)
-
-                    # Update d_head value
-                    d_head = self._data.tell()
-
-                    # Track lines processed
-                    self.line_count += 1
+            if not max_bytes and self._poolable(decoders):
+                # Our (binary) article is handed off to our pool to be
+                # decoded once we have all of it; anything else is decoded
+                # as it streams in
+                if not self.article_eod or \
+                        self._decode_pool(response, decoders):
                     continue
 
-                # Adjust pointer for processing
-                self._data.seek(d_head, SEEK_SET)
+            codec_active = self._decode(
+                response, decoders, codec_active=codec_active,
+                max_bytes=max_bytes,
+            )
+
+            if codec_active is False:
+                # We're instructed to only retrieve 'some' content and
+                # abort for peaking purposes; so we're done now.
+                self.close()
+                return response
+
+        # Track lines processed
+        self.line_count += len(self.lines)
+
+        logger.debug('Returning Response %s' % response)
+        return response
 
-                # Begin decoding content
-                decoded = codec_active.decode(self._data)
+    def _decode_pool(self, response, decoders):
+        """
+        Hands the content sitting in our _data buffer to our DecodePool (if
+        we have one) to be decoded and stored in the response object
+        provided.
 
-                # Adjust our pointer
+        Returns True if our content was decoded by our pool, otherwise
+        False is returned and it's up to the caller to decode it.
+        """
+        if not self._poolable(decoders):
+            return False
+
+        if not self.decode_pool.decode(
+                response, self._data.getvalue(), decoders):
+            return False
+
+        # Reset our data object once we're done parsing
+        self._data.truncate(0)
+        self._data.seek(0, SEEK_SET)
+        return True
+
+    def _poolable(self, decoders):
+        """
+        Returns True if the content handled by the decoders specified should
+        be decoded by our DecodePool (if we have one).
+
+        Only binary (yEnc) articles are worth the trip; everything else
+        (such as XOVER results) is decoded as it streams in so that we
+        never have to hold all of it at once.
+        """
+        if self.decode_pool is None or not decoders:
+            return False
+
+        if isinstance(decoders, CodecBase):
+            decoders = [decoders, ]
+
+        return next(
+            (True for d in decoders if isinstance(d, CodecYenc)), False)
+
+    def _decode(self, response, decoders, codec_active=None, max_bytes=0):
+        """
+        Processes the content sitting in our _data buffer using the decoders
+        specified and stores the results in the response object provided.
+
+        Returns the codec still expecting more data (or None if there isn't
+        one) so that it can be resumed on our next pass.  False is returned
+        if max_bytes was specified and we've acquired enough content to
+        satisfy it.
+        """
+        self._data_len = self._data.seek(0, SEEK_END)
+        d_head = self._data.seek(0, SEEK_SET)
+        while d_head < self._data_len and self.connected:
+
+            if codec_active is None:
+                # Scan our decoders (sequentially) and detect our match
+                # If we get a match, then we want to save it in the
+                # codec_active variable. We use this to track the data
+                # found for processing.
+
+                # Get our data
+                d_head = self._data.tell()
+                data = self._data.readline()
+
+                # This line scans the line of data we read and determines
+                # what kind of data it is (yEnc, Headers, etc) based on the
+                # decoders passed into _recv()
+                codec_active = next(
+                    (d for d in decoders
+                        if d.detect(data) is not None), None)
+                if codec_active:
+                    logger.debug('Decoding using %s' % type(codec_active))
+
+            # Based on previous check; we may actually have an active codec
+            # now if we don't have one yet; well want to store the content
+            # into our body and move along
+            if codec_active is None:
+                # All data matched that no decoder took ownership off is
+                # saved into our body
+                response.body.write(data)
+
+                # Update d_head value
                 d_head = self._data.tell()
 
-                # If we're at the end of our buffer; we can go ahead and clear
-                # it
-                if d_head >= self._data_len:
-                    # Reset our data object once we're done parsing
-                    self._data.truncate(0)
-                    # Adjust pointer for processing
-                    self._data.seek(0, SEEK_SET)
-
-                # A little Decoder 101 for anyone reading my code; the below
-                # identifies the possible return types from a Codec
-                # (specifically the Decoder):
-                #
-                #     - NNTPContent:  We're done with the decoder, everything
-                #                     was correctly processed. we're handled
-                #                     and NNTPContent object.
-                #
-                #     - True:         We're still expecting more content
-                #                     before we're finished, don't adjust
-                #                     this from being the 'active' decoder!
-                #
-                #     - False:        Oh boy; we had a problem and we
-                #                     couldn't deal with it. We're finished
-                #                     with the decoder; the data is bad.
-                #
-                #     - None:         A graceful way of saying that we're done
-                #                     with the decoder. Like an abort if you
-                #                     will
-                #
-                if decoded is None:
-                    # The Codec has completed and has nothing to return for
-                    # storing. We gracefully move along at this point.
-                    logger.debug(
-                        'Decoding complete (no results) / %s' % codec_active,
-                    )
+                # Track lines processed
+                self.line_count += 1
+                continue
 
-                    # we're done; do nothing more
-                    codec_active = None
+            # Adjust pointer for processing
+            self._data.seek(d_head, SEEK_SET)
 
-                    continue
+            # Begin decoding content
+            decoded = codec_active.decode(self._data)
 
-                elif decoded is True:
-                    # We're expecting more data a long as the End of Data
-                    # (EOD) flag hasn't been picked up.
-                    if not self.article_eod:
-                        logger.debug(
-                            'Expecting more data to build results with...',
-                        )
-                        continue
-
-                    # If we reach here, we've reached the end of the line
-                    # a half (or possibly full block of data), but we just
-                    # need to close off what we have. fall through and
-                    # handle our codec; the HEAD call for example doesn't
-                    # return an empty line after the the header like expected
-                    # so it's normal to reach here.  Corrupted stuff still
-                    # needs to be saved; and we can hope the par files can
-                    # rebuild it if it is infact damaged.
-                    if isinstance(codec_active, CodecBase):
-                        # Store our decoded content (complete or not)
-                        decoded = codec_active.decoded
-
-                # If we got here, our content was good; we can safely
-                # toggle our codec_active back to off since we're going to
-                # be expecting more data now
-                logger.debug('Decoding completed. %s' % codec_active)
+            # Adjust our pointer
+            d_head = self._data.tell()
+
+            # If we're at the end of our buffer; we can go ahead and clear
+            # it
+            if d_head >= self._data_len:
+                # Reset our data object once we're done parsing
+                self._data.truncate(0)
+                # Adjust pointer for processing
+                self._data.seek(0, SEEK_SET)
+
+            # A little Decoder 101 for anyone reading my code; the below
+            # identifies the possible return types from a Codec
+            # (specifically the Decoder):
+            #
+            #     - NNTPContent:  We're done with the decoder, everything
+            #                     was correctly processed. we're handled
+            #                     and NNTPContent object.
+            #
+            #     - True:         We're still expecting more content
+            #                     before we're finished, don't adjust
+            #                     this from being the 'active' decoder!
+            #
+            #     - False:        Oh boy; we had a problem and we
+            #                     couldn't deal with it. We're finished
+            #                     with the decoder; the data is bad.
+            #
+            #     - None:         A graceful way of saying that we're done
+            #                     with the decoder. Like an abort if you
+            #                     will
+            #
+            if decoded is None:
+                # The Codec has completed and has nothing to return for
+                # storing. We gracefully move along at this point.
+                logger.debug(
+                    'Decoding complete (no results) / %s' % codec_active,
+                )
+
+                # we're done; do nothing more
                 codec_active = None
 
-                if not isinstance(decoded, NNTPContent):
-                    # We ignore any other return type, Decoders should always
-                    # return an NNTPContent type; anything else is considered
-                    # moot
+                continue
+
+            elif decoded is True:
+                # We're expecting more data a long as the End of Data
+                # (EOD) flag hasn't been picked up.
+                if not self.article_eod:
+                    logger.debug(
+                        'Expecting more data to build results with...',
+                    )
                     continue
 
-                # Add to our NNTPContent() to our decoded set associated with
-                # our NNTPResponse() object
-                response.decoded.add(decoded)
+                # If we reach here, we've reached the end of the line
+                # a half (or possibly full block of data), but we just
+                # need to close off what we have. fall through and
+                # handle our codec; the HEAD call for example doesn't
+                # return an empty line after the the header like expected
+                # so it's normal to reach here.  Corrupted stuff still
+                # needs to be saved; and we can hope the par files can
+                # rebuild it if it is infact damaged.
+                if isinstance(codec_active, CodecBase):
+                    # Store our decoded content (complete or not)
+                    decoded = codec_active.decoded
+
+            # If we got here, our content was good; we can safely
+            # toggle our codec_active back to off since we're going to
+            # be expecting more data now
+            logger.debug('Decoding completed. %s' % codec_active)
+            codec_active = None
+
+            if not isinstance(decoded, NNTPContent):
+                # We ignore any other return type, Decoders should always
+                # return an NNTPContent type; anything else is considered
+                # moot
+                continue
 
-                if not isinstance(decoded, NNTPMetaContent):
-                    # Print a representative string into the body to identify
-                    # the content parsed out (and decoded)
+            # Add to our NNTPContent() to our decoded set associated with
+            # our NNTPResponse() object
+            response.decoded.add(decoded)
 
-                    if max_bytes > 0:
-                        # We're instructed to only retrieve 'some' content and
-                        # abort for peaking purposes; so we're done now.
-                        self.close()
-                        return response
+            if not isinstance(decoded, NNTPMetaContent):
+                # Print a representative string into the body to identify
+                # the content parsed out (and decoded)
 
-        # Track lines processed
-        self.line_count += len(self.lines)
+                if max_bytes > 0:
+                    # We're instructed to only retrieve 'some' content and
+                    # abort for peaking purposes; so we're done now.
+                    return False
 
-        logger.debug('Returning Response %s' % response)
-        return response
+        return codec_active
 
     def close(self):
         """
@@ -2393,8 +2893,8 @@ class NNTPConnection(SocketBase):
         self.article_eod = False
         self.article_fname = None
 
-        # Reset our Buffers
-        self._buffer.truncate(0)
+        # Reset our Buffers; our read buffer is tracked by pointers local
+        # to _recv() so it never needs to be cleared
         self._data.truncate(0)
         self._data_len = 0
 
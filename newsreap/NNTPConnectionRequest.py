@@ -19,6 +19,11 @@ gevent.monkey.patch_all()
 
 from newsreap.NNTPRequest import NNTPRequest
 
+# The NNTPConnection() functions that return None (or False) when the server
+# doesn't have the article we're after; another server may have it
+REROUTE_ACTIONS = ('get', 'stat')
+
+
 class NNTPConnectionRequest(NNTPRequest):
     """
     This is used as a direct wrapper to the NNTPConnection() class.
@@ -90,7 +95,15 @@ class NNTPConnectionRequest(NNTPRequest):
             except IndexError:
                 _kwargs = dict()
 
-            self.append(_func(*_args, **_kwargs))
+            response = _func(*_args, **_kwargs)
+            if (response is None or response is False) \
+                    and _name in REROUTE_ACTIONS \
+                    and len(self.actions) == 1 and self.reroute is not None \
+                    and self.reroute(self):
+                # Another server will handle our request
+                return False
+
+            self.append(response)
 
         # Set our completion flag; this flags any blocking
         # services waiting for us to complete to resume
@@ -340,6 +340,13 @@ class NNTPContent(object):
         """
         return self._is_valid and not self._isdir
 
+    def set_valid(self, valid=True):
+        """
+        Flags our content as being valid (or not); this is set by the
+        codecs that produce our content once they've verified it.
+        """
+        self._is_valid = bool(valid)
+
     def open(self, filepath=None, mode=None, eof=False):
         """
         Opens a filepath specified and re-attaches to it.
@@ -1011,6 +1018,68 @@ class NNTPContent(object):
 
         return True
 
+    def preallocate(self, size):
+        """
+        Sizes our file to the number of bytes specified (allocating it if it
+        hasn't been created yet). This allows content to later be written
+        into it at any offset using write_at().
+
+        """
+        if not self.open(mode=NNTPFileMode.BINARY_RW, eof=False):
+            return False
+
+        try:
+            self.stream.truncate(size)
+
+        except (IOError, OSError) as e:
+            logger.debug('Could not allocate %s (%s)' % (
+                bytes_to_strsize(size), str(e)))
+            return False
+
+        # Set dirty flag
+        self._dirty = True
+        return True
+
+    def write_at(self, content, offset=None):
+        """
+        Writes the content specified into our stream at the offset
+        specified. If no offset is specified, then the content's begin()
+        pointer is used instead.
+
+        Unlike append(), this allows the parts of a file to be written into
+        it in any order they arrive in.
+
+        """
+        if offset is None:
+            offset = content.begin()
+
+        if not self.open(mode=NNTPFileMode.BINARY_RW, eof=False):
+            return False
+
+        if not content.open(mode=NNTPFileMode.BINARY_RO, eof=False):
+            logger.debug('Error handling content: %s' % content)
+            return False
+
+        logger.debug('Writing content %s at offset %d' % (content, offset))
+
+        self.stream.seek(offset, SEEK_SET)
+        while True:
+            buf = content.stream.read(self._block_size)
+            if not buf:
+                break
+            self.stream.write(buf)
+
+        content.close()
+
+        # Set dirty flag
+        self._dirty = True
+
+        # We can't trust self._end anymore now because content was
+        # written to the file.
+        self._end = None
+
+        return True
+
     def begin(self):
         """
         Returns the beginning ptr; this is nessisary when building encoded
@@ -1035,6 +1104,11 @@ class NNTPContent(object):
         This result is the same as len() if there is only 1 part to
         the entire object
         """
+        if self._total_size is not None:
+            # We were told our total size (such as by the yEnc =ybegin
+            # size= or when we were split())
+            return self._total_size
+
         if self.total_parts <= 1:
             return len(self)
 
@@ -1216,6 +1290,22 @@ class NNTPContent(object):
 
         return self.stream.tell()
 
+    def seek(self, offset, whence=SEEK_SET):
+        """
+        Allows reference to our object from within a Codec()
+
+        """
+        if self.stream and self._dirty is True:
+            self.stream.flush()
+            self._dirty = False
+
+        if not self.stream:
+            if not self.open(mode=NNTPFileMode.BINARY_RO):
+                return None
+
+        self.stream.seek(offset, whence)
+        return self.stream.tell()
+
     def readline(self, *args, **kwargs):
         """
         Returns a single line from the stream
@@ -36,6 +36,13 @@ from os import listdir
 from os.path import basename
 from os.path import join
 import re
+from itertools import compress
+from itertools import imap
+from itertools import izip
+from itertools import repeat
+from operator import gt
+from operator import lt
+from operator import ne
 
 # Logging
 import logging
@@ -138,6 +145,444 @@ class FilterDirectives(object):
     XPOST_COUNT_LESS_THAN = '_xc_lt'
 
 
+class FilterColumn(object):
+    """
+    The columns of the rows a FilterProgram is applied to
+    """
+    SCORE = 0
+    SUBJECT = 1
+    POSTER = 2
+    LINES = 3
+    SIZE = 4
+    DATE = 5
+    XPOSTS = 6
+
+
+# Our directives (in the order they're checked) mapped to the column they
+# check and how they check it
+FILTER_DIRECTIVE_MAP = (
+    (FilterDirectives.SCORE_GREATER_THAN, FilterColumn.SCORE, gt),
+    (FilterDirectives.SCORE_LESS_THAN, FilterColumn.SCORE, lt),
+    (FilterDirectives.SUBJECT_MATCHES_REGEX, FilterColumn.SUBJECT, None),
+    (FilterDirectives.SUBJECT_STARTS_WITH, FilterColumn.SUBJECT, True),
+    (FilterDirectives.SUBJECT_ENDS_WITH, FilterColumn.SUBJECT, False),
+    (FilterDirectives.POSTER_MATCHES_REGEX, FilterColumn.POSTER, None),
+    (FilterDirectives.POSTER_STARTS_WITH, FilterColumn.POSTER, True),
+    (FilterDirectives.POSTER_ENDS_WITH, FilterColumn.POSTER, False),
+    (FilterDirectives.LINE_COUNT_GREATER_THAN, FilterColumn.LINES, gt),
+    (FilterDirectives.LINE_COUNT_LESS_THAN, FilterColumn.LINES, lt),
+    (FilterDirectives.SIZE_GREATER_THAN, FilterColumn.SIZE, gt),
+    (FilterDirectives.SIZE_LESS_THAN, FilterColumn.SIZE, lt),
+    (FilterDirectives.DATE_GREATER_THAN, FilterColumn.DATE, gt),
+    (FilterDirectives.DATE_LESS_THAN, FilterColumn.DATE, lt),
+    (FilterDirectives.XPOST_COUNT_GREATER_THAN, FilterColumn.XPOSTS, gt),
+    (FilterDirectives.XPOST_COUNT_LESS_THAN, FilterColumn.XPOSTS, lt),
+)
+
+# Regular expressions that can't be merged with others (they refer to their
+# own groups by number or by name)
+FILTER_UNMERGEABLE_RE = re.compile(r'\\[1-9]|\(\?P=')
+
+# The prefix of the named groups we merge our regular expressions with
+FILTER_GROUP_PREFIX = '_r'
+
+# Python only supports so many groups in a single regular expression
+FILTER_MAX_GROUPS = 99
+
+
+class FilterProgram(object):
+    """
+    The whitelist, blacklist and scorelist entries that apply to a group
+    compiled into a flat list of rules.
+
+    Each rule is a tuple of (score, numeric, literal, regex) where numeric
+    is a tuple of (column, operator, value) comparisons, while literal and
+    regex are tuples of the keys of the literals (starts/ends with) and
+    regular expressions that have to match.
+
+    The regular expressions of all of our rules (that share the same flags)
+    are merged into one; each is wrapped in a look-ahead of it's own named
+    group so that a single match tells us every one of them that matched.
+
+    Our literals are stored in a trie (one per column for both the starts
+    and ends with directives) so that finding all of those that match a
+    row costs the same regardless of how many there are. Rules with
+    literals are then only ever checked against the rows they matched.
+
+    """
+
+    def __init__(self, whitelist=None, blacklist=None, scorelist=None):
+        """
+        Compiles the (lists of) entries specified
+        """
+        # Our regular expressions (column, compiled) mapped by key
+        self._expressions = {}
+
+        # Our literals mapped by (column, starts with, value) to their key
+        self._literals = {}
+
+        # Our literals stored in tries mapped by (column, starts with)
+        self._tries = {}
+
+        # Our compiled rules
+        self.whitelist = self._compile(whitelist)
+        self.blacklist = self._compile(blacklist)
+
+        # Entries that don't adjust our score can be ignored
+        self.scorelist = tuple(
+            r for r in self._compile(scorelist) if r[0])
+
+        # Our rules (and how to find them) mapped by their list code
+        self._lists = {
+            FilterListCode.WHITELIST: self._index(self.whitelist),
+            FilterListCode.BLACKLIST: self._index(self.blacklist),
+            FilterListCode.SCORELIST: self._index(self.scorelist),
+        }
+
+        # Merge our regular expressions
+        self._regex = self._merge()
+
+        # The columns our rules look at
+        self.used = set(
+            [c for rules in (self.whitelist, self.blacklist, self.scorelist)
+             for rule in rules for c, _, _ in rule[1]] +
+            [c for c, _, _ in self._literals] +
+            [c for c, _ in self._expressions.itervalues()])
+
+    def _compile(self, entries):
+        """
+        Compiles a list of entries into a tuple of rules
+        """
+        rules = []
+        for entry in (entries or []):
+            # Only the first 'filters' directives are checked (the same
+            # way they always have been)
+            matches = entry.get(FilterDirectives.FILTERS, 0)
+            if not matches:
+                continue
+
+            directives = [
+                (d, c, op) for (d, c, op) in FILTER_DIRECTIVE_MAP
+                if d in entry][:matches]
+
+            if len(directives) < matches:
+                # There are directives we don't know how to check; this
+                # entry can never match
+                continue
+
+            numeric = []
+            literal = []
+            regex = []
+            for directive, column, op in directives:
+                value = entry[directive]
+                if op is None:
+                    key = len(self._expressions)
+                    self._expressions[key] = (column, value)
+                    regex.append(key)
+
+                elif op is True or op is False:
+                    literal.append(
+                        (len(value), self._literal(column, op, value)))
+
+                else:
+                    numeric.append((column, op, value))
+
+            rules.append((
+                entry.get(FilterDirectives.SCORE), tuple(numeric),
+                # Our longest (and most selective) literal comes first
+                tuple(k for _, k in sorted(literal, reverse=True)),
+                tuple(regex),
+            ))
+
+        return tuple(rules)
+
+    def _literal(self, column, starts, value):
+        """
+        Stores a literal in our trie and returns it's key
+        """
+        key = self._literals.get((column, starts, value))
+        if key is not None:
+            return key
+
+        key = self._literals[(column, starts, value)] = len(self._literals)
+
+        node = self._tries.setdefault((column, starts), {})
+        for c in (value if starts else reversed(value)):
+            node = node.setdefault(c, {})
+
+        # The keys of the literals that end at a node are stored under None
+        node.setdefault(None, []).append(key)
+        return key
+
+    @staticmethod
+    def _index(rules):
+        """
+        Returns a tuple of (rules, plain, anchors) for the rules specified
+        where plain is a list of the rules without any literals and anchors
+        maps the key of a literal to the rules that start with it.
+        """
+        plain = []
+        anchors = {}
+        for r, rule in enumerate(rules):
+            if rule[2]:
+                anchors.setdefault(rule[2][0], []).append(r)
+
+            else:
+                plain.append(r)
+
+        return rules, plain, anchors
+
+    def _merge(self):
+        """
+        Merges our regular expressions; a tuple of (column, compiled, groups,
+        key) entries is returned. For merged expressions groups is a tuple of
+        the group numbers that identify each of them and key is a tuple of
+        their keys (otherwise groups is None and key identifies the
+        expression).
+        """
+        # Group our expressions by column, flags and type
+        buckets = {}
+        regex = []
+        for key in sorted(self._expressions):
+            column, compiled = self._expressions[key]
+            if FILTER_UNMERGEABLE_RE.search(compiled.pattern) or \
+                    next((True for n in compiled.groupindex
+                          if n.startswith(FILTER_GROUP_PREFIX)), False):
+                regex.append((column, compiled, None, key))
+                continue
+
+            buckets.setdefault(
+                (column, compiled.flags, type(compiled.pattern)), [],
+            ).append((key, compiled))
+
+        for (column, flags, _), expressions in sorted(buckets.iteritems()):
+            if len(expressions) == 1:
+                key, compiled = expressions[0]
+                regex.append((column, compiled, None, key))
+                continue
+
+            while expressions:
+                # Break our expressions up so we don't exceed the number of
+                # groups we're allowed to have
+                chunk = []
+                groups = 0
+                while expressions and groups + \
+                        expressions[0][1].groups + 1 <= FILTER_MAX_GROUPS:
+                    groups += expressions[0][1].groups + 1
+                    chunk.append(expressions.pop(0))
+
+                if not chunk:
+                    # A single expression with too many groups of it's own
+                    key, compiled = expressions.pop(0)
+                    regex.append((column, compiled, None, key))
+                    continue
+
+                names = tuple(
+                    ('%s%d' % (FILTER_GROUP_PREFIX, key), key)
+                    for key, _ in chunk)
+
+                try:
+                    compiled = re.compile(''.join(
+                        '(?:(?=(?P<%s>%s))|)' % (name, c.pattern)
+                        for (name, _), (_, c) in zip(names, chunk)), flags)
+
+                except Exception:
+                    # Use them as they are
+                    regex.extend(
+                        (column, c, None, key) for key, c in chunk)
+                    continue
+
+                regex.append((
+                    column, compiled,
+                    tuple(compiled.groupindex[n] for n, _ in names),
+                    tuple(k for _, k in names),
+                ))
+
+        return tuple(regex)
+
+    def hits(self, columns, index):
+        """
+        Returns the keys of all of the regular expressions that match the
+        row (of the columns) at the index specified
+        """
+        hits = set()
+        for column, compiled, groups, key in self._regex:
+            result = compiled.match(columns[column][index])
+            if result is None:
+                continue
+
+            if groups is None:
+                hits.add(key)
+
+            else:
+                # The groups that didn't take part in our match start at -1
+                hits.update(compress(key, imap(
+                    ne, imap(result.start, groups), repeat(-1))))
+
+        return hits
+
+    @staticmethod
+    def _walk(trie, value, starts=True):
+        """
+        Returns the keys of all of the literals in the trie specified that
+        the value starts (or ends) with
+        """
+        keys = []
+        if starts or not value:
+            # Empty literals
+            keys.extend(trie.get(None, ()))
+
+        node = trie
+        for c in (value if starts else reversed(value)):
+            node = node.get(c)
+            if node is None:
+                break
+
+            keys.extend(node.get(None, ()))
+
+        return keys
+
+    def literals(self, columns, index):
+        """
+        Returns a dictionary of the keys of all of the literals that match
+        the rows (of the columns) identified by index
+        """
+        found = dict((i, set()) for i in index)
+        for (column, starts), trie in self._tries.iteritems():
+            values = columns[column]
+            for i in index:
+                found[i].update(self._walk(trie, values[i], starts))
+
+        return found
+
+    def _apply(self, code, columns, hits, index=None):
+        """
+        A generator returning each of the rules of the list identified by
+        code along with the indexes of the rows (of the columns specified)
+        they match.
+
+        Rules with literals are only checked against the rows that matched
+        their first (longest) literal; the rest are checked against all of
+        our rows.
+
+        Our numeric comparisons are evaluated a whole column at a time;
+        each distinct one is only ever evaluated once. Only the rows that
+        survive them are compared against our literals and regular
+        expressions (which are looked up and cached in hits the first time
+        a row needs them).
+
+        """
+        rules, plain, anchors = self._lists[code]
+
+        # Our rows
+        rows = xrange(len(columns[FilterColumn.SCORE])) \
+            if index is None else index
+
+        # Our evaluated comparisons
+        masks = {}
+
+        # Our rules mapped to the rows we'll check them against
+        candidates = [(r, rows) for r in plain]
+
+        literals = None
+        if anchors:
+            literals = self.literals(columns, rows)
+
+            found = {}
+            for i in rows:
+                for key in literals[i]:
+                    for r in anchors.get(key, ()):
+                        found.setdefault(r, []).append(i)
+
+            candidates.extend(sorted(found.iteritems()))
+
+        for r, matched in candidates:
+            rule = rules[r]
+            for comparison in rule[1]:
+                column, op, value = comparison
+                mask = masks.get(comparison)
+                if mask is None and matched is rows:
+                    mask = masks[comparison] = list(
+                        imap(op, columns[column], repeat(value)))
+
+                if mask is None:
+                    # Just a few rows; we compare them directly
+                    column = columns[column]
+                    matched = [i for i in matched if op(column[i], value)]
+
+                else:
+                    matched = list(
+                        compress(matched, imap(mask.__getitem__, matched)))
+
+                if not matched:
+                    break
+
+            if not matched:
+                continue
+
+            for key in rule[2][1:]:
+                matched = [i for i in matched if key in literals[i]]
+                if not matched:
+                    break
+
+            if matched and rule[3]:
+                for i in matched:
+                    if hits[i] is None:
+                        hits[i] = self.hits(columns, i)
+
+                for key in rule[3]:
+                    matched = [i for i in matched if key in hits[i]]
+                    if not matched:
+                        break
+
+            if matched:
+                yield rule, matched
+
+    def score(self, columns, hits, index=None):
+        """
+        Returns the scores of the rows (of the columns) specified; only the
+        rows identified by index are scored if specified
+        """
+        scores = [0] * len(columns[FilterColumn.SCORE])
+        for rule, matched in self._apply(
+                FilterListCode.SCORELIST, columns, hits, index):
+            for i in matched:
+                scores[i] += rule[0]
+
+        return scores
+
+    def match(self, code, columns, hits, index=None):
+        """
+        Returns the indexes of the rows (of the columns) specified matched by
+        the list identified by code; only the rows identified by index are
+        checked if specified
+        """
+        matched = set()
+        for _, _matched in self._apply(code, columns, hits, index):
+            matched.update(_matched)
+
+        return sorted(matched)
+
+    @staticmethod
+    def row(poster, date, subject, size, lines, xgroups, score=0, **kwargs):
+        """
+        Returns the row our rules are applied to built from the arguments
+        (or XOVER entry) specified
+        """
+        return [score, subject, poster, lines, size, date, len(xgroups)]
+
+    @staticmethod
+    def columns(rows):
+        """
+        Returns the columns our rules are applied to built from the rows
+        specified
+        """
+        if not rows:
+            return [[] for _ in xrange(FilterColumn.XPOSTS + 1)]
+
+        return [list(c) for c in izip(*rows)]
+
+
 class NNTPFilterBase(object):
     """
     A class that can be applied to an NNTPConnection to additionaly apply a
@@ -158,6 +603,9 @@ class NNTPFilterBase(object):
         # precompiled; it's populated when a group is first accessed
         self._regex_hash = {}
 
+        # The programs compiled from the above hash (see compile())
+        self._program = {}
+
         self._blacklist = {}
         self._whitelist = {}
 
@@ -195,6 +643,7 @@ class NNTPFilterBase(object):
         if reset:
             self._regex_map = {}
             self._regex_hash = {}
+            self._program = {}
             self._blacklist = {}
             self._whitelist = {}
             self._scorelist = {}
@@ -439,6 +888,7 @@ class NNTPFilterBase(object):
         if len(self._regex_hash):
             # Force a rehash next time we apply our list
             self._regex_hash = {}
+            self._program = {}
 
 
     def blacklist_append(self, group_regex, entry):
@@ -508,6 +958,7 @@ class NNTPFilterBase(object):
         if len(self._regex_hash):
             # Force a rehash next time we apply our list
             self._regex_hash = {}
+            self._program = {}
 
 
     def whitelist_append(self, group_regex, entry):
@@ -577,6 +1028,7 @@ class NNTPFilterBase(object):
         if len(self._regex_hash):
             # Force a rehash next time we apply our list
             self._regex_hash = {}
+            self._program = {}
 
 
     def lazy_re_fetch(self, group):
@@ -637,170 +1089,20 @@ class NNTPFilterBase(object):
         return self._regex_hash[group]
 
 
-    def _match(self, entry, poster, date, subject, size, lines, xgroups,
-               *args, **kwargs):
+    def compile(self, group):
         """
-        The generic function called to scan whitelists, blacklists,
-        and scorelists which is defined by 'typelist',
+        Returns the FilterProgram built from the whitelist, blacklist and
+        scorelist entries that apply to the group specified
         """
+        if group not in self._program:
+            lists = self.lazy_re_fetch(group)
+            self._program[group] = FilterProgram(
+                whitelist=lists[FilterListCode.WHITELIST],
+                blacklist=lists[FilterListCode.BLACKLIST],
+                scorelist=lists[FilterListCode.SCORELIST],
+            )
 
-        # Acquire a match count
-        matches = entry.get(FilterDirectives.FILTERS, 0)
-        if not matches:
-            # Probably spit a warning out here (TODO)
-            return False
-
-        # Acquire Score
-        score = kwargs.get(FilterDirectives.SCORE, 0)
-        if FilterDirectives.SCORE_GREATER_THAN in entry:
-            if score > entry[FilterDirectives.SCORE_GREATER_THAN]:
-                matches -= 1
-                if matches <= 0:
-                    return True
-            else:
-                # No match
-                return False
-
-        if FilterDirectives.SCORE_LESS_THAN in entry:
-            if score < entry[FilterDirectives.SCORE_LESS_THAN]:
-                matches -= 1
-                if matches <= 0:
-                    return True
-            else:
-                # No match
-                return False
-
-        if FilterDirectives.SUBJECT_MATCHES_REGEX in entry:
-            if entry[FilterDirectives.SUBJECT_MATCHES_REGEX].match(subject):
-                matches -= 1
-                if matches <= 0:
-                    return True
-            else:
-                # No match
-                return False
-
-        if FilterDirectives.SUBJECT_STARTS_WITH in entry:
-            if entry[FilterDirectives.SUBJECT_STARTS_WITH] == \
-               subject[0:len(entry[FilterDirectives.SUBJECT_STARTS_WITH])]:
-                matches -= 1
-                if matches <= 0:
-                    return True
-            else:
-                # No match
-                return False
-
-        if FilterDirectives.SUBJECT_ENDS_WITH in entry:
-            if entry[FilterDirectives.SUBJECT_ENDS_WITH] == \
-               subject[-len(entry[FilterDirectives.SUBJECT_ENDS_WITH]):]:
-                matches -= 1
-                if matches <= 0:
-                    return True
-            else:
-                # No match
-                return False
-
-        if FilterDirectives.POSTER_MATCHES_REGEX in entry:
-            if entry[FilterDirectives.POSTER_MATCHES_REGEX].match(poster):
-                matches -= 1
-                if matches <= 0:
-                    return True
-            else:
-                # No match
-                return False
-
-        if FilterDirectives.POSTER_STARTS_WITH in entry:
-            if entry[FilterDirectives.POSTER_STARTS_WITH] == \
-               poster[0:len(entry[FilterDirectives.POSTER_STARTS_WITH])]:
-                matches -= 1
-                if matches <= 0:
-                    return True
-            else:
-                # No match
-                return False
-
-        if FilterDirectives.POSTER_ENDS_WITH in entry:
-            if entry[FilterDirectives.POSTER_ENDS_WITH] == \
-               poster[-len(entry[FilterDirectives.POSTER_ENDS_WITH]):]:
-                matches -= 1
-                if matches <= 0:
-                    return True
-            else:
-                # No match
-                return False
-
-        if FilterDirectives.LINE_COUNT_GREATER_THAN in entry:
-            if lines > entry[FilterDirectives.LINE_COUNT_GREATER_THAN]:
-                matches -= 1
-                if matches <= 0:
-                    return True
-            else:
-                # No match
-                return False
-
-        if FilterDirectives.LINE_COUNT_LESS_THAN in entry:
-            if lines < entry[FilterDirectives.LINE_COUNT_LESS_THAN]:
-                matches -= 1
-                if matches <= 0:
-                    return True
-            else:
-                # No match
-                return False
-
-        if FilterDirectives.SIZE_GREATER_THAN in entry:
-            if size > entry[FilterDirectives.SIZE_GREATER_THAN]:
-                matches -= 1
-                if matches <= 0:
-                    return True
-            else:
-                # No match
-                return False
-
-        if FilterDirectives.SIZE_LESS_THAN in entry:
-            if size < entry[FilterDirectives.SIZE_LESS_THAN]:
-                matches -= 1
-                if matches <= 0:
-                    return True
-            else:
-                # No match
-                return False
-
-        if FilterDirectives.DATE_GREATER_THAN in entry:
-            if date > entry[FilterDirectives.DATE_GREATER_THAN]:
-                matches -= 1
-                if matches <= 0:
-                    return True
-            else:
-                # No match
-                return False
-
-        if FilterDirectives.DATE_LESS_THAN in entry:
-            if date < entry[FilterDirectives.DATE_LESS_THAN]:
-                matches -= 1
-                if matches <= 0:
-                    return True
-            else:
-                # No match
-                return False
-
-        if FilterDirectives.XPOST_COUNT_GREATER_THAN in entry:
-            if len(xgroups) > entry[FilterDirectives.XPOST_COUNT_GREATER_THAN]:
-                matches -= 1
-                if matches <= 0:
-                    return True
-            else:
-                # No match
-                return False
-
-        if FilterDirectives.XPOST_COUNT_LESS_THAN in entry:
-            if len(xgroups) < entry[FilterDirectives.XPOST_COUNT_LESS_THAN]:
-                matches -= 1
-                if matches <= 0:
-                    return True
-            else:
-                # No match
-                return False
-
-        return matches <= 0
+        return self._program[group]
 
 
     def whitelist(self, group, poster, date, subject, size, lines, xgroups,
@@ -809,19 +1111,16 @@ class NNTPFilterBase(object):
         Returns true if entry matches a filter identifed on the whitelist
         """
 
-        whitelist = self.lazy_re_fetch(group)[FilterListCode.WHITELIST]
-        if not whitelist:
+        program = self.compile(group)
+        if not program.whitelist:
             # No whitelist entries to apply
             return False
 
-        for entry in iter(whitelist):
-            if self._match(entry, poster, date, subject, size, lines, xgroups,
-                           *args, **kwargs):
-                # We can stop on our first match
-                return True
-
-        # no match
-        return False
+        row = FilterProgram.row(
+            poster, date, subject, size, lines, xgroups,
+            score=kwargs.get(FilterDirectives.SCORE, 0))
+        return bool(program.match(
+            FilterListCode.WHITELIST, [[v] for v in row], [None]))
 
 
     def blacklist(self, group, poster, date, subject, size, lines, xgroups,
@@ -830,19 +1129,16 @@ class NNTPFilterBase(object):
         Returns true if entry matches a filter identifed on the blacklist
         """
 
-        blacklist = self.lazy_re_fetch(group)[FilterListCode.BLACKLIST]
-        if not blacklist:
+        program = self.compile(group)
+        if not program.blacklist:
             # No blacklist entries to apply
             return False
 
-        for entry in iter(blacklist):
-            if self._match(entry, poster, date, subject, size, lines, xgroups,
-                           *args, **kwargs):
-                # We can stop on our first match
-                return True
-
-        # no match
-        return False
+        row = FilterProgram.row(
+            poster, date, subject, size, lines, xgroups,
+            score=kwargs.get(FilterDirectives.SCORE, 0))
+        return bool(program.match(
+            FilterListCode.BLACKLIST, [[v] for v in row], [None]))
 
 
     def score(self, group, poster, date, subject, size, lines, xgroups,
@@ -853,26 +1149,82 @@ class NNTPFilterBase(object):
         was matched otherwise the calculated score is returned.
         """
 
-        scorelist = self.lazy_re_fetch(group)[FilterListCode.SCORELIST]
-        if not scorelist:
+        program = self.compile(group)
+        if not program.scorelist:
             # No scores applied
             return 0
 
-        # Our score counter
-        score = 0
+        row = FilterProgram.row(
+            poster, date, subject, size, lines, xgroups,
+            score=kwargs.get(FilterDirectives.SCORE, 0))
+        return program.score([[v] for v in row], [None])[0]
 
-        for entry in iter(scorelist):
 
-            new_score = entry.get(FilterDirectives.SCORE)
-            if not new_score:
-                # No score defined
-                continue
-
-            if self._match(entry, poster, date, subject, size, lines, xgroups,
-                           *args, **kwargs):
+def apply_filters(filters, entries):
+    """
+    Scores and classifies a batch of entries (as returned by
+    CodecArticleIndex.detect()) against all of the filters specified in one
+    call.
 
-                # (no stopping); apend score and keep going
-                score += new_score
+    Every entry has the scores of all of our filters added to it's own;
+    the entries that aren't on a whitelist but are on a blacklist are
+    dropped. A list of the entries kept is returned (in their original
+    order).
 
-        # not all matches
-        return score
+    """
+    if not filters or not entries:
+        return list(entries)
+
+    # Our entries grouped by the group they were posted to
+    groups = {}
+    for i, entry in enumerate(entries):
+        groups.setdefault(entry['group'], []).append(i)
+
+    dropped = set()
+    for group, index in groups.iteritems():
+        programs = [f.compile(group) for f in filters]
+        columns = FilterProgram.columns(
+            [FilterProgram.row(**entries[i]) for i in index])
+
+        # The regular expressions matched are cached (per program) so they
+        # are only ever looked up once per row
+        hits = [[None] * len(index) for _ in programs]
+
+        # Apply our scores first (our scorelists are all applied against the
+        # score each entry started with)
+        scores = list(columns[FilterColumn.SCORE])
+        for program, _hits in zip(programs, hits):
+            for n, score in enumerate(program.score(columns, _hits)):
+                scores[n] += score
+
+        for n, score in enumerate(scores):
+            entries[index[n]]['score'] = score
+
+        columns[FilterColumn.SCORE] = scores
+
+        # Anything on a whitelist is kept
+        pending = range(len(index))
+        for program, _hits in zip(programs, hits):
+            if not pending:
+                break
+
+            matched = set(program.match(
+                FilterListCode.WHITELIST, columns, _hits, pending))
+            if matched:
+                pending = [n for n in pending if n not in matched]
+
+        # Otherwise we drop what's on a blacklist
+        for program, _hits in zip(programs, hits):
+            if not pending:
+                break
+
+            matched = set(program.match(
+                FilterListCode.BLACKLIST, columns, _hits, pending))
+            if matched:
+                dropped.update(index[n] for n in matched)
+                pending = [n for n in pending if n not in matched]
+
+    if not dropped:
+        return list(entries)
+
+    return [e for i, e in enumerate(entries) if i not in dropped]
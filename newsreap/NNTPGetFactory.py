@@ -28,6 +28,10 @@ from os.path import basename
 from os.path import dirname
 from os.path import splitext
 from StringIO import StringIO
+from gevent import spawn
+from gevent import joinall
+from gevent.event import Event
+from gevent.queue import Queue
 
 from .NNTPGroup import NNTPGroup
 from .NNTPArticle import MESSAGE_ID_RE
@@ -65,6 +69,14 @@ class NNTPGetFactory(object):
     # Used for calculating queue sizes
     xfer_rate_max_queue_size = 20
 
+    # The number of retrieved files allowed to wait on each of our
+    # assembly stages before we stop to let them catch up
+    assembly_queue_size = 4
+
+    # The maximum number of decoded bytes we allow to sit waiting to be
+    # assembled before we stop retrieving more articles (256MB)
+    assembly_memory_budget = 268435456
+
     def __init__(self, connection=None, hooks=None, groups=None,
                  *args, **kwargs):
         """
@@ -359,7 +371,8 @@ class NNTPGetFactory(object):
 
         return status
 
-    def _download(self, commit_on_file=True, *args, **kwargs):
+    def _download(self, commit_on_file=True, memory_budget=None,
+                  *args, **kwargs):
         """
         Download our content
         """
@@ -419,6 +432,11 @@ class NNTPGetFactory(object):
             return False
 
         # We are dealing with an NZB-File if we get here
+        if isinstance(self.connection, NNTPManager):
+            # Assemble each file as soon as all of it's articles have been
+            # retrieved (while the rest continue to download)
+            return self._download_staged(memory_budget=memory_budget)
+
         response = self.connection.get(self.nzb, work_dir=self.tmp_path)
 
         # Deobsfucate re-scans the existing NZB-Content and attempts to pair
@@ -435,61 +453,219 @@ class NNTPGetFactory(object):
             # combine it as one; but we need to get our filename's
             # straight. We will try to build the best name we can from
             # each entry we find.
+            if not self._assemble(segment):
+                # Toggle our return status
+                status = False
+
+            elif not self._finalize(segment):
+                # Toggle our return status
+                status = False
 
-            # Track our segment count
-            seg_count = len(segment)
+        # Return our status
+        return status
+
+    def _download_staged(self, memory_budget=None):
+        """
+        Downloads our NZB-File content as a series of stages that all run at
+        the same time:
+           1. our articles are retrieved by the NNTPManager and decoded
+              straight into the file they make up (see
+              NNTPSegmentedPost.place())
+           2. each file is assembled as soon as all of it's articles arrive
+           3. assembled files are moved into their final location
+
+        Each stage hands it's work to the next through a bounded queue so
+        that a slow stage holds back the ones feeding it rather then allowing
+        content to pile up.  We additionally stop pulling new articles
+        while more then memory_budget bytes of decoded content are waiting
+        to be assembled; content already written into the file it makes up
+        (see NNTPSegmentedPost.place()) is no longer waiting on anything.
+
+        A file that fails to be assembled (or finalized) only fails that
+        file; our stages carry on with the rest.
+
+        """
+        if memory_budget is None:
+            memory_budget = self.assembly_memory_budget
+
+        # Take a snapshot of our segments; we can't iterate over our NZB-File
+        # from more then one place at the same time.
+        segments = list(self.nzb.segments)
+
+        # Track the segment each article belongs to and how many articles
+        # are still outstanding for it
+        owner = {}
+        remaining = {}
+        for segment in segments:
+            remaining[id(segment)] = len(segment)
+            for article in segment:
+                owner[id(article)] = segment
+
+        # Our stages
+        assembly_queue = Queue(maxsize=self.assembly_queue_size)
+        finalize_queue = Queue(maxsize=self.assembly_queue_size)
+
+        # Signaled each time a file is assembled
+        assembled = Event()
+
+        # bytes: the decoded content (not yet placed) waiting to be
+        #        assembled
+        # queued: the number of files waiting to be assembled
+        # status: our return status
+        state = {'bytes': 0, 'queued': 0, 'status': True}
+
+        # The decoded content tracked per segment
+        pending_bytes = {}
+
+        def assembly_stage():
+            while True:
+                segment = assembly_queue.get()
+                if segment is StopIteration:
+                    finalize_queue.put(StopIteration)
+                    break
+
+                try:
+                    # Now that we have all of our content, we can get our
+                    # filename straight before we combine it as one
+                    self.nzb.deobsfucate(segments=[segment])
+
+                    if self._assemble(segment):
+                        finalize_queue.put(segment)
+
+                    else:
+                        # Toggle our return status
+                        state['status'] = False
+
+                except Exception as e:
+                    logger.error(
+                        "Failed to assemble segment '%s'." % segment.filename)
+                    logger.debug('Assembly exception: %s' % str(e))
 
-            if not segment.join():
-                # We failed to join
-                if segment.filename:
                     # Toggle our return status
-                    status = False
+                    state['status'] = False
+
+                finally:
+                    # Release our memory hold; anything waiting on us must
+                    # always be woken up
+                    state['bytes'] -= pending_bytes.pop(id(segment), 0)
+                    state['queued'] -= 1
+                    assembled.set()
+
+        def finalize_stage():
+            while True:
+                segment = finalize_queue.get()
+                if segment is StopIteration:
+                    break
+
+                try:
+                    if not self._finalize(segment):
+                        # Toggle our return status
+                        state['status'] = False
+
+                except Exception as e:
+                    logger.error(
+                        "Failed to save segment '%s'." % segment.filename)
+                    logger.debug('Finalize exception: %s' % str(e))
 
-                    logger.warning(
-                        "Failed to assemble segment '%s' (%s)." % (
-                            segment.filename,
-                            segment.strsize(),
-                        ),
-                    )
+                    # Toggle our return status
+                    state['status'] = False
+
+        workers = [spawn(assembly_stage), spawn(finalize_stage)]
+
+        try:
+            articles = (a for segment in segments for a in segment)
+            for article, response in self.connection.get_iter(
+                    articles, work_dir=self.tmp_path,
+                    assembly_dir=join(self.tmp_path, 'assembly')):
+
+                segment = owner.get(id(article))
+                if segment is None:
                     continue
 
-                else:
-                    # Toggle our return status
-                    status = False
+                if response is not None and not segment.place(article):
+                    # Our content isn't part of the file it makes up; track
+                    # the decoded content now waiting on us to assemble it
+                    size = article.size()
+                    pending_bytes[id(segment)] = \
+                        pending_bytes.get(id(segment), 0) + size
+                    state['bytes'] += size
+
+                remaining[id(segment)] -= 1
+                if remaining[id(segment)] == 0:
+                    # We have everything we're going to get; hand it off
+                    state['queued'] += 1
+                    assembly_queue.put(segment)
+
+                # Don't retrieve anything further until our assembly stage
+                # catches up (if we've exceeded our budget). We only wait if
+                # there is something to assemble; otherwise we'd never wake.
+                while state['bytes'] > memory_budget and state['queued'] > 0:
+                    assembled.clear()
+                    assembled.wait()
+
+            # Segments that don't contain any articles still need handling
+            for segment in segments:
+                if remaining[id(segment)] == 0 and not len(segment):
+                    state['queued'] += 1
+                    assembly_queue.put(segment)
 
-                    logger.warning(
-                        "Failed to assemble segment (%s)." % (
-                            segment.strsize(),
-                        ),
-                    )
-            else:
-                # Toggle our return status
-                status = False
+        finally:
+            # Signal our stages to finish up
+            assembly_queue.put(StopIteration)
+            joinall(workers)
 
-                # We failed to join
-                logger.debug("Assembled '%s' len=%s (parts=%d)." % (
-                    segment.filename, segment.strsize(), seg_count))
+        # Return our status
+        return state['status']
 
-            if segment.save(filepath=self.path):
-                logger.info(
-                    "Successfully saved %s (%s)" % (
+    def _assemble(self, segment):
+        """
+        Combines the articles associated with the specified segment
+        """
+        # Track our segment count
+        seg_count = len(segment)
+
+        if not segment.join():
+            # We failed to join
+            if segment.filename:
+                logger.warning(
+                    "Failed to assemble segment '%s' (%s)." % (
                         segment.filename,
                         segment.strsize(),
                     ),
                 )
-            else:
-                # Toggle our return status
-                status = False
 
-                logger.error(
-                    "Failed to save %s (%s)" % (
-                        segment.filename,
+            else:
+                logger.warning(
+                    "Failed to assemble segment (%s)." % (
                         segment.strsize(),
                     ),
                 )
+            return False
 
-        # Return our status
-        return status
+        logger.debug("Assembled '%s' len=%s (parts=%d)." % (
+            segment.filename, segment.strsize(), seg_count))
+        return True
+
+    def _finalize(self, segment):
+        """
+        Moves our assembled segment into it's final location
+        """
+        if segment.save(filepath=self.path):
+            logger.info(
+                "Successfully saved %s (%s)" % (
+                    segment.filename,
+                    segment.strsize(),
+                ),
+            )
+            return True
+
+        logger.error(
+            "Failed to save %s (%s)" % (
+                segment.filename,
+                segment.strsize(),
+            ),
+        )
+        return False
 
     def headers(self, source=None, *args, **kwargs):
         """
@@ -20,6 +20,8 @@ gevent.monkey.patch_all()
 # Importing these libraries forces them associate themselves
 # with the ObjectBase
 from .objects.group.Article import Article
+from .objects.group.Post import Post
+from .objects.group.Segment import Segment
 
 # The ObjectBase which contains all of the data required to
 # access our table.
@@ -28,6 +30,56 @@ from .objects.group.Vsp import Vsp
 
 from .Database import Database
 
+from sqlalchemy.exc import OperationalError
+
+# Logging
+import logging
+from newsreap.Logging import NEWSREAP_ENGINE
+logger = logging.getLogger(NEWSREAP_ENGINE)
+
+# The full-text (trigram) index kept over our article subjects and posters;
+# it references the article table for it's content so only the index
+# itself takes up space.
+ARTICLE_SEARCH_TABLE = 'article_search'
+
+# The statements that create our index; our triggers keep it up to date
+# as articles are written
+ARTICLE_SEARCH_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS article_search USING fts5("
+    "subject, poster, content='article', tokenize='trigram')",
+
+    "CREATE TRIGGER IF NOT EXISTS article_search_insert AFTER INSERT "
+    "ON article BEGIN "
+    "INSERT INTO article_search(rowid, subject, poster) "
+    "VALUES (new.rowid, new.subject, new.poster); END",
+
+    "CREATE TRIGGER IF NOT EXISTS article_search_delete AFTER DELETE "
+    "ON article BEGIN "
+    "INSERT INTO article_search(article_search, rowid, subject, poster) "
+    "VALUES ('delete', old.rowid, old.subject, old.poster); END",
+
+    "CREATE TRIGGER IF NOT EXISTS article_search_update AFTER UPDATE "
+    "OF subject, poster ON article BEGIN "
+    "INSERT INTO article_search(article_search, rowid, subject, poster) "
+    "VALUES ('delete', old.rowid, old.subject, old.poster); "
+    "INSERT INTO article_search(rowid, subject, poster) "
+    "VALUES (new.rowid, new.subject, new.poster); END",
+)
+
+# The triggers we expect to find if our index is being maintained
+ARTICLE_SEARCH_TRIGGERS = (
+    'article_search_insert',
+    'article_search_delete',
+    'article_search_update',
+)
+
+# Returns the number of our search objects (table and triggers) that exist;
+# they all must for our index to be used
+ARTICLE_SEARCH_CHECK_SQL = \
+    "SELECT count(*) FROM sqlite_master WHERE name IN (%s)" % ', '.join(
+        ["'%s'" % n for n in (ARTICLE_SEARCH_TABLE, ) +
+         ARTICLE_SEARCH_TRIGGERS])
+
 # The catch wit SQLite when referencing paths is:
 # sqlite:///relative/path/to/where we are now
 # sqlite:////absolute/path/
@@ -48,3 +100,82 @@ class NNTPGroupDatabase(Database):
             engine=engine,
             reset=reset,
         )
+
+    def has_search_index(self):
+        """
+        Returns True if our database has a full-text index over it's
+        articles that is being kept up to date, otherwise False is returned.
+
+        """
+        if self._engine is None:
+            return False
+
+        try:
+            count = self._engine.execute(ARTICLE_SEARCH_CHECK_SQL).scalar()
+
+        except OperationalError:
+            return False
+
+        return count == len(ARTICLE_SEARCH_TRIGGERS) + 1
+
+    def create_search_index(self):
+        """
+        Creates the full-text index over our articles (if it doesn't
+        already exist).  Once created, it is kept up to date as articles are
+        added, removed or changed.
+
+        Building the index for a database that already has articles in it
+        can take a while, but it only has to be done once.
+
+        Returns True if our database has a search index, otherwise False
+        is returned (such as when SQLite was built without FTS5).
+
+        """
+        if self._engine is None:
+            return False
+
+        if self.has_search_index():
+            # Nothing more to do
+            return True
+
+        try:
+            with self._engine.begin() as conn:
+                for sql in ARTICLE_SEARCH_SQL:
+                    conn.execute(sql)
+
+                # Index anything we already have (or had before our
+                # triggers went missing)
+                logger.info('Building article search index.')
+                conn.execute(
+                    "INSERT INTO article_search(article_search) "
+                    "VALUES ('rebuild')")
+
+        except OperationalError as e:
+            logger.warning('Could not create an article search index.')
+            logger.debug('Search index error: %s' % str(e))
+            return False
+
+        return True
+
+    def create_post_tables(self):
+        """
+        Creates the tables our articles are collated into posts with (if
+        they don't already exist).  Databases created before these tables
+        existed only have their articles.
+
+        Returns True if our database has them, otherwise False is returned.
+
+        """
+        if self._engine is None:
+            return False
+
+        try:
+            ObjectBase.metadata.create_all(
+                self._engine, tables=[Post.__table__, Segment.__table__])
+
+        except OperationalError as e:
+            logger.warning('Could not create our post tables.')
+            logger.debug('Post table error: %s' % str(e))
+            return False
+
+        return True
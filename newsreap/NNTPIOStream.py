@@ -36,6 +36,10 @@ class NNTPIOStream(object):
     # GZip RFC-3977 (COMPRESS Keyword used)
     RFC3977_GZIP = 'gzip.rfc3977'
 
+    # RFC-8054 Deflate (COMPRESS DEFLATE); the entire session is compressed
+    # in both directions. If the server doesn't support it, we try GZip
+    RFC8054_DEFLATE = 'deflate.rfc8054'
+
 
 # For Error Handling we maintain a list of supported I/O Streams
 NNTP_SUPPORTED_IO_STREAMS = (
@@ -44,4 +48,5 @@ NNTP_SUPPORTED_IO_STREAMS = (
     # used outside of this class. Always add new types to the end.
     NNTPIOStream.RFC3977,
     NNTPIOStream.RFC3977_GZIP,
+    NNTPIOStream.RFC8054_DEFLATE,
 )
@@ -25,6 +25,7 @@ from gevent.lock import Semaphore
 from gevent.queue import Queue
 from gevent.queue import Empty as EmptyQueueException
 
+from .DecodePool import DecodePool
 from .HookManager import HookManager
 from .NNTPConnection import NNTPConnection
 from .NNTPnzb import NNTPnzb
@@ -32,13 +33,29 @@ from .NNTPSegmentedPost import NNTPSegmentedPost
 from .NNTPArticle import NNTPArticle
 from .NNTPConnection import XoverGrouping
 from .NNTPConnectionRequest import NNTPConnectionRequest
+from .NNTPConnectionRequest import REROUTE_ACTIONS
+from .NNTPPipelineRequest import NNTPPipelineRequest
 from .NNTPSettings import NNTPSettings
+from .ShardPool import ShardPool
+from .ShardPool import shard_servers
 
 # Logging
 import logging
 from newsreap.Logging import NEWSREAP_ENGINE
 logger = logging.getLogger(NEWSREAP_ENGINE)
 
+# The time (in seconds) we'd like each XOVER request to take when
+# iterating over a range of articles (see xover_iter())
+XOVER_TARGET_TIME = 5.0
+
+# The most an XOVER batch size is allowed to shrink (or grow) by relative
+# to the one it was started with
+XOVER_BATCH_SCALE = 8
+
+# The weight given to the most recent measurement of our XOVER row
+# density (the number of articles found in the range requested)
+XOVER_DENSITY_WEIGHT = 0.2
+
 
 class WorkTracker(object):
     """
@@ -117,7 +134,7 @@ class Worker(Greenlet):
     of connections defined.
     """
 
-    def __init__(self, connection, work_queue, work_tracker):
+    def __init__(self, connection, work_queue, work_tracker, pool=None):
         Greenlet.__init__(self, run=None)
 
         # Store NNTPConnection Object
@@ -142,6 +159,10 @@ class Worker(Greenlet):
         # Store our work tracker
         self._work_tracker = work_tracker
 
+        # The WorkerPool we belong to (if any); we report how long each
+        # request took to it
+        self._pool = pool
+
         # our exit flag, it is set externally
         self._exit = Event()
 
@@ -176,9 +197,23 @@ class Worker(Greenlet):
             # Mark ourselves busy
             self._work_tracker.mark_busy(self)
 
+            # Get reference time
+            request.timer_start()
+
             # If we reach here, we have a request to process
             request.run(connection=self._connection)
 
+            # Track how long our request took
+            elapsed = request.timer_stop()
+
+            if self._pool is not None:
+                # Track our throughput
+                self._pool.track(
+                    elapsed,
+                    count=len(request.requests)
+                    if isinstance(request, NNTPPipelineRequest) else 1,
+                )
+
             # Mark ourselves available again
             self._work_tracker.mark_available(self)
 
@@ -191,6 +226,192 @@ class Worker(Greenlet):
         self._connection.close()
 
 
+class WorkerPool(object):
+    """
+    A pool of workers (and their connections) dedicated to just one of our
+    NNTP Servers.  Each pool has it's own work queue and connection limit
+    so that all of our servers can be put to work at the same time.
+
+    Each pool also keeps track of how long it takes to process a request
+    which lets the NNTPManager decide which pool is best suited to handle
+    the next request.
+
+    """
+
+    # The weight given to the most recent measurement when calculating
+    # our (moving) average request time.
+    THROUGHPUT_WEIGHT = 0.2
+
+    def __init__(self, server, limit, hooks=None, decode_pool=None):
+        """
+        Initialize our pool for the server (settings) specified.
+        """
+        super(WorkerPool, self).__init__()
+
+        # Store our server settings
+        self.server = server
+
+        # Our priority (the lower the number, the higher the priority)
+        try:
+            self.priority = int(server.get('priority'))
+
+        except (TypeError, ValueError):
+            self.priority = 0
+
+        # The maximum number of connections we can make to our server
+        try:
+            self.limit = max(1, int(server.get('connections') or limit))
+
+        except (TypeError, ValueError):
+            self.limit = max(1, int(limit))
+
+        # The number of requests our server can have pipelined at once
+        try:
+            self.window = max(1, int(server.get('pipeline', 1)))
+
+        except (TypeError, ValueError):
+            # Pipelining is not possible
+            self.window = 1
+
+        # Our hooks
+        self.hooks = hooks
+
+        # The DecodePool (if any) our connections hand their decoding to
+        self.decode_pool = decode_pool
+
+        # Our connections and the workers that use them
+        self.connections = []
+        self.workers = []
+
+        # Keep track of the workers available for processing
+        self.work_tracker = WorkTracker()
+
+        # Queue Control
+        self.work_queue = Queue()
+
+        # Our average time (in seconds) to process a request; this is None
+        # until we've processed at least one of them
+        self.avg_time = None
+
+    def spawn_workers(self, count=1):
+        """
+        Spawns X workers (but never more then our limit) and returns
+        the number actually spawned.
+        """
+        _count = 0
+        while len(self.connections) < self.limit and _count < count:
+            # First we build our connection object
+            connection = NNTPConnection(
+                decode_pool=self.decode_pool, **self.server)
+
+            # Directly map the connection's hooks to the ones defined by
+            # our NNTPManager() object
+            if self.hooks is not None:
+                connection.hooks = self.hooks
+
+            # Append connection object to a pool
+            self.connections.append(connection)
+
+            logger.debug("Spawning worker for %s..." % self.server['host'])
+            g = Worker(
+                connection=connection,
+                work_queue=self.work_queue,
+                work_tracker=self.work_tracker,
+                pool=self,
+            )
+            g.start()
+
+            # Track our worker
+            self.workers.append(g)
+            _count += 1
+
+        return _count
+
+    def put(self, request):
+        """
+        Handles the adding to our worker queue
+
+        """
+
+        # Determine if we need to spin a worker or not
+        self.work_tracker.lock.acquire(blocking=True)
+
+        if len(self.work_tracker.available) == 0:
+            # Spin up more work (if we can)
+            self.spawn_workers(count=1)
+
+        # Append to Queue for processing
+        self.work_queue.put(request)
+
+        # Release our lock
+        self.work_tracker.lock.release()
+
+    def track(self, elapsed, count=1):
+        """
+        Tracks the time it took (in seconds) to process the number of
+        requests specified.
+        """
+        if count <= 0:
+            return
+
+        elapsed = elapsed / count
+        if self.avg_time is None:
+            self.avg_time = elapsed
+
+        else:
+            self.avg_time += \
+                (elapsed - self.avg_time) * self.THROUGHPUT_WEIGHT
+
+    def cost(self, avg_time=1.0):
+        """
+        Returns the estimated time (in seconds) it would take for us to get
+        through everything already queued plus one more request.
+
+        The avg_time specified is used if we haven't processed anything yet.
+        """
+        pending = self.work_queue.qsize() + len(self.work_tracker.busy)
+        return (pending + 1) * (
+            self.avg_time if self.avg_time is not None else avg_time) \
+            / self.limit
+
+    def close(self):
+        """
+        closes out any open workers and cleans up gracefully.
+        """
+        while not self.work_queue.empty():
+            try:
+                self.work_queue.get_nowait()
+            except EmptyQueueException:
+                # Nothing available for us
+                break
+
+        for worker in self.workers:
+            # Toggle Exit
+            worker._exit.set()
+            self.work_queue.put(StopIteration)
+
+        for entry in self.connections:
+            entry.close()
+
+        for worker in self.workers:
+            logger.info("Waiting for workers to exit.")
+            worker.join()
+
+        self.workers = []
+        self.connections = []
+
+    def __repr__(self):
+        """
+        Return an unambigious version of the object
+        """
+        return '<WorkerPool host=%s priority=%d workers=%d/%d />' % (
+            self.server.get('host'),
+            self.priority,
+            len(self.workers),
+            self.limit,
+        )
+
+
 class NNTPManager(object):
     """
     Used to manage multiple NNTPConnections via worker threads.
@@ -212,19 +433,14 @@ class NNTPManager(object):
         it is presumed settings is a loaded NNTPSettings() object.
         """
 
-        # A connection pool of NNTPConnections
-        self._pool = []
-
-        # A mapping of active worker threads
-        self._workers = []
+        # Our worker pools (one per NNTP Server)
+        self._pools = []
 
-        # Keep track of the workers available for processing
-        # we will use this value to determine if we need to spin
-        # up another process or not.
-        self._work_tracker = WorkTracker()
+        # The processes (if any) we hand our decoding off to
+        self._decode_pool = None
 
-        # Queue Control
-        self._work_queue = Queue()
+        # The processes (if any) we divide our work between
+        self._shard_pool = None
 
         # Map signal
         gevent.signal(signal.SIGQUIT, gevent.kill)
@@ -245,6 +461,52 @@ class NNTPManager(object):
         # Store our defined settings
         self._settings = settings
 
+        # Our work can be divided between several processes (each with
+        # their own share of our connections); these are started before
+        # anything else
+        try:
+            shards = int(self._settings.nntp_processing.get('shards'))
+
+        except (TypeError, ValueError):
+            shards = 0
+
+        # The servers we connect to ourselves
+        servers = self._settings.nntp_servers
+
+        if shards > 1:
+            # We keep a share of our connections for ourselves (to handle
+            # everything that isn't divided between our shards); our
+            # primary server is always part of it
+            servers = shard_servers(
+                self._settings.nntp_servers,
+                self._settings.nntp_processing['threads'], shards + 1)
+
+            self._shard_pool = ShardPool(
+                self._settings, hooks=hooks, servers=servers[1:])
+            servers = servers[0]
+
+        # Decoding can be handed off to other processes; these are
+        # started before any of our connections are made
+        try:
+            processes = int(
+                self._settings.nntp_processing.get('decode_processes'))
+
+        except (TypeError, ValueError):
+            processes = 0
+
+        if processes > 0:
+            self._decode_pool = DecodePool(processes=processes)
+
+        # Prepare a pool of workers for each of our servers; they're
+        # stored in order of priority
+        self._pools = [
+            WorkerPool(
+                server,
+                limit=self._settings.nntp_processing['threads'],
+                hooks=self.hooks,
+                decode_pool=self._decode_pool,
+            ) for server in servers]
+
         return
 
     def hooks(self, hooks, reset=True):
@@ -266,44 +528,12 @@ class NNTPManager(object):
 
     def spawn_workers(self, count=1):
         """
-        Spawns X workers (but never more then the total allowed)
+        Spawns X workers (but never more then the total allowed); our
+        servers are filled in order of priority.
         """
         _count = 0
-        while len(self._pool) < self._settings.nntp_processing['threads']:
-            # First we build our connection object
-            connection = NNTPConnection(**self._settings.nntp_servers[0])
-
-            # Directly map the connection's hooks to the ones here in the
-            # NNTPManager() object
-            connection.hooks = self.hooks
-
-            if len(self._settings.nntp_servers) > 1:
-                # Append backup servers (if any defined)
-                for idx in range(1, len(self._settings.nntp_servers)):
-                    _connection = NNTPConnection(
-                        **self._settings.nntp_servers[idx])
-
-                    # Directly map the connection's hooks to the ones here in
-                    # the NNTPManager() object
-                    _connection.hooks = self.hooks
-
-                    connection.append(_connection)
-
-            # Append connection object to a pool
-            self._pool.append(connection)
-
-            logger.debug("Spawning worker...")
-            g = Worker(
-                connection=connection,
-                work_queue=self._work_queue,
-                work_tracker=self._work_tracker,
-            )
-            g.start()
-
-            # Track our worker
-            self._workers.append(g)
-
-            _count += 1
+        for pool in self._pools:
+            _count += pool.spawn_workers(count=count - _count)
             if _count >= count:
                 # Stop spawning
                 break
@@ -314,6 +544,29 @@ class NNTPManager(object):
 
         return False
 
+    def max_connections(self):
+        """
+        Returns the total number of connections our servers allow
+        """
+        connections = sum(p.limit for p in self._pools)
+        if self._shard_pool is not None:
+            # Include those of our shards
+            connections += sum(
+                s['connections'] for s in self._shard_pool.stats())
+
+        return connections
+
+    def xover_connections(self):
+        """
+        Returns the number of connections our XOVER requests are handled
+        by; they're never rerouted so only our primary server (or our
+        shards if our work is divided between them) ever sees them.
+        """
+        if self._shard_pool is not None:
+            return sum(s['connections'] for s in self._shard_pool.stats())
+
+        return self._pools[0].limit
+
     def get_connection(self):
         """
         Grabs a connection from the thread pool and returns it by reference.
@@ -326,16 +579,19 @@ class NNTPManager(object):
 
         """
 
-        if len(self._pool):
+        # Our connections in order of priority
+        connections = [c for p in self._pools for c in p.connections]
+
+        if len(connections):
             # Find the first connected connection
             connection = next(
-                (c for c in self._pool if c.connected is True), None)
+                (c for c in connections if c.connected is True), None)
 
             if connection:
                 return connection
 
             # Return the first entry if nothing is already connected
-            return self._pool[0]
+            return connections[0]
 
         # Otherwise there is nothing to return
         return None
@@ -345,50 +601,132 @@ class NNTPManager(object):
         closes out any open threads and cleans up NNTPManager
         gracefully.
         """
-        while not self._work_queue.empty():
-            try:
-                self._work_queue.get_nowait()
-            except EmptyQueueException:
-                # Nothing available for us
-                break
-
-        for worker in self._workers:
-            # Toggle Exit
-            worker._exit.set()
-            self._work_queue.put(StopIteration)
-
-        for entry in self._pool:
-            entry.close()
+        for pool in self._pools:
+            pool.close()
 
-        for worker in self._workers:
-            logger.info("Waiting for workers to exit.")
-            worker.join()
+        if self._shard_pool is not None:
+            # Stop our shards
+            self._shard_pool.close()
 
-        del self._pool
-        del self._workers
-        self._workers = []
-        self._pool = []
+        if self._decode_pool is not None:
+            # Stop our decoding processes; anything further is decoded by
+            # our connections directly
+            self._decode_pool.close()
 
     def put(self, request):
         """
         Handles the adding to the worker queue
 
+        Article requests (see REROUTE_ACTIONS) are handed to the pool
+        (server) we expect can complete them the soonest; those our server
+        could not satisfy are handed off to our other servers (see
+        reroute()).  Everything else is handled by our primary server since
+        article numbers (and group watermarks) differ from one server to
+        the next.
+
         """
+        if self._reroutable(request):
+            self.reroute(request, tried=set())
+            return
 
-        # Determine if we need to spin a worker or not
-        self._work_tracker.lock.acquire(blocking=True)
+        # Our primary server handles everything else
+        request.reroute = None
+        self._pools[0].put(request)
+
+    def put_many(self, requests):
+        """
+        Handles the adding of several requests to the worker queue at once.
+
+        If our NNTP Server supports pipelining, then the requests are handed
+        to the workers in batches so that each one of them can keep several
+        requests outstanding on the server at once.
+
+        """
+        idx = 0
+        while idx < len(requests):
+            reroutable = self._reroutable(requests[idx])
+            pool = self._schedule() if reroutable else self._pools[0]
+            if pool.window == 1:
+                # Pipelining is not possible
+                self.put(requests[idx])
+                idx += 1
+                continue
+
+            batch = []
+            while idx < len(requests) and len(batch) < pool.window \
+                    and self._reroutable(requests[idx]) == reroutable:
+                batch.append(requests[idx])
+                idx += 1
+
+            for request in batch:
+                if reroutable:
+                    # Prepare each of our requests for rerouting
+                    self._prepare(request, tried=set([pool]))
+
+                else:
+                    request.reroute = None
+
+            # Append our batch to the Queue for processing
+            pool.put(NNTPPipelineRequest(batch))
+
+    def reroute(self, request, tried):
+        """
+        Hands the request to the best pool we haven't already tried. False
+        is returned if there are no pools left to try.
+
+        """
+        pool = self._schedule(exclude=tried)
+        if pool is None:
+            # We've exhausted all of our servers
+            return False
 
-        if len(self._work_tracker.available) == 0:
-            if len(self._work_tracker) < self._settings\
-                    .nntp_processing['threads']:
-                # Spin up more work
-                self.spawn_workers(count=1)
+        tried.add(pool)
+        self._prepare(request, tried=tried)
 
         # Append to Queue for processing
-        self._work_queue.put(request)
+        pool.put(request)
+        return True
 
-        # Release our lock
-        self._work_tracker.lock.release()
+    def _reroutable(self, request):
+        """
+        Returns True if the request only fetches (or checks for) an article
+        and can therefore be handled by any one of our servers.
+
+        """
+        actions = getattr(request, 'actions', None)
+        return bool(actions) and len(actions) == 1 \
+            and actions[0][0] in REROUTE_ACTIONS
+
+    def _prepare(self, request, tried):
+        """
+        Allows the request to be rerouted to one of our other pools if the
+        one processing it doesn't have what we're looking for.
+
+        """
+        if len(tried) < len(self._pools):
+            request.reroute = lambda r: self.reroute(r, tried=tried)
+
+        else:
+            # Nowhere else to go
+            request.reroute = None
+
+    def _schedule(self, exclude=None):
+        """
+        Returns the pool we expect to complete a new request the soonest
+        based on the work it already has queued and it's measured
+        throughput. Ties go to the pool with the highest priority.
+
+        """
+        pools = [p for p in self._pools if not exclude or p not in exclude]
+        if not pools:
+            return None
+
+        # Pools we haven't measured yet are assumed to perform as well as
+        # the ones we have
+        measured = [p.avg_time for p in self._pools if p.avg_time is not None]
+        avg_time = (sum(measured) / len(measured)) if measured else 1.0
+
+        return min(pools, key=lambda p: (p.cost(avg_time), p.priority))
 
     def group(self, name, block=True):
         """
@@ -664,8 +1002,34 @@ class NNTPManager(object):
 
         The force flag when set to true forces the download of content even
         if it has previously already been retrieved.
+
+        See get_iter() if you'd rather handle each article as it arrives.
+
+        If our work is divided between shards, then the segments of an
+        NNTPnzb or NNTPSegmentedPost are divided between them.
         """
 
+        if self._shard_pool is not None and block and \
+                isinstance(id, (NNTPnzb, NNTPSegmentedPost)):
+
+            if isinstance(id, NNTPnzb):
+                if not id.is_valid():
+                    return None
+
+                articles = [a for segpost in id for a in segpost]
+
+            else:
+                articles = list(id)
+
+            # Our responses are loaded back into our articles for us
+            return self._shard_pool.get(
+                articles,
+                work_dir,
+                decoders=decoders,
+                group=group,
+                max_bytes=max_bytes,
+            )
+
         # A list of results
         requests = []
 
@@ -695,12 +1059,13 @@ class NNTPManager(object):
                         }),
                     ])
 
-                    # Append to Queue for processing
-                    self.put(request)
-
                     # Store our request
                     requests.append(request)
 
+            # Append to Queue for processing; our segments are handed to
+            # the workers in batches so they can be pipelined
+            self.put_many(requests)
+
         elif isinstance(id, NNTPSegmentedPost):
             # Pre-Spawn workers based on the number of segments we find.
             self.spawn_workers(len(id))
@@ -721,12 +1086,13 @@ class NNTPManager(object):
                     }),
                 ])
 
-                # Append to Queue for processing
-                self.put(request)
-
                 # Store our request
                 requests.append(request)
 
+            # Append to Queue for processing; our segments are handed to
+            # the workers in batches so they can be pipelined
+            self.put_many(requests)
+
         elif isinstance(id, NNTPArticle):
             # We're dealing with a single Article
 
@@ -834,6 +1200,133 @@ class NNTPManager(object):
         # Return our responses
         return responses
 
+    def get_iter(self, id, work_dir, decoders=None, group=None, max_bytes=0,
+                 max_pending=None, assembly_dir=None):
+        """
+        A non-blocking alternative to get(); a generator that yields an
+        (article, response) tuple for each article as soon as it has been
+        retrieved (in the order they complete in).
+
+        The article is the entry we were asked to retrieve (an NNTPArticle
+        from the NNTPnzb or NNTPSegmentedPost, or the Message-ID itself) and
+        the response is what was returned for it (None if it could not be
+        retrieved).  Like get(), the response is also loaded into any
+        NNTPArticle we were handed.
+
+        Rather then queuing everything at once, no more then max_pending
+        requests are ever outstanding; more are only queued as the others
+        complete.  If max_pending isn't specified, then it's based on the
+        number of connections (and pipelining) our servers allow.
+
+        This allows the caller to start working with the content retrieved
+        while the rest of it is still downloading:
+
+            for article, response in mgr.get_iter(nzb, work_dir='/tmp'):
+                if response is None:
+                    # handle missing segment
+                    continue
+
+        If an assembly_dir is specified, then the parts of multi-part yEnc
+        files are decoded straight into the file they make up within it
+        (see NNTPSegmentedPost.place()).
+
+        If our work is divided between shards, then our articles are
+        divided between them (each of which respect their share of
+        max_pending).
+        """
+
+        if isinstance(id, NNTPnzb):
+            # We're dealing with an NZB-File
+            if not id.is_valid():
+                return
+
+            # Our articles in the order they appear in our NZB-File
+            articles = (a for segpost in id for a in segpost)
+
+        elif isinstance(id, NNTPSegmentedPost):
+            articles = iter(id)
+
+        elif isinstance(id, (NNTPArticle, basestring)):
+            articles = iter([id, ])
+
+        else:
+            # Support any other iterable of articles and/or Message-IDs
+            articles = iter(id)
+
+        if self._shard_pool is not None:
+            for result in self._shard_pool.get_iter(
+                    articles,
+                    work_dir,
+                    decoders=decoders,
+                    group=group,
+                    max_bytes=max_bytes,
+                    max_pending=max_pending,
+                    assembly_dir=assembly_dir):
+                yield result
+
+            return
+
+        if not max_pending:
+            max_pending = 2 * sum(p.limit * p.window for p in self._pools)
+
+        # The largest batch we pipeline; we don't top up our requests until
+        # we can fill one of these (unless we have nothing left outstanding)
+        window = max(p.window for p in self._pools)
+
+        # Our completed requests are placed here as they finish
+        completed = Queue()
+
+        # Track what is still outstanding
+        pending = 0
+
+        while True:
+            if pending == 0 or (max_pending - pending) >= window:
+                # Queue up some more work (if there is any)
+                requests = []
+                for article in articles:
+                    # Push request to the queue
+                    request = NNTPConnectionRequest(actions=[
+                        # Append list of NNTPConnection requests in a list
+                        # ('function, (*args), (**kwargs) )
+                        ('get', (article, work_dir), {
+                            'decoders': decoders,
+                            'group': group,
+                            'max_bytes': max_bytes,
+                            'assembly_dir': assembly_dir,
+                        }),
+                    ])
+
+                    # Notify us when the request is complete
+                    request.rawlink(
+                        lambda r, a=article: completed.put((a, r)))
+
+                    # Store our request
+                    requests.append(request)
+                    if pending + len(requests) >= max_pending:
+                        break
+
+                if requests:
+                    # Append to Queue for processing
+                    self.spawn_workers(len(requests))
+                    self.put_many(requests)
+                    pending += len(requests)
+
+            if pending == 0:
+                # We're done
+                break
+
+            # Wait for the next request to complete
+            article, request = completed.get()
+            pending -= 1
+
+            response = request.response[0] if len(request.response) else None
+            if isinstance(article, NNTPArticle) and \
+                    isinstance(response, NNTPArticle):
+                # Load our response back to our article
+                article.load(response)
+
+            yield (article, response)
+
     def xover(self, group, start=None, end=None,
               sort=XoverGrouping.BY_POSTER_TIME, block=True):
         """
@@ -863,7 +1356,14 @@ class NNTPManager(object):
                   }
               }
 
+        If our work is divided between shards, then the range is divided
+        between them and their results are merged together.
+
         """
+        if self._shard_pool is not None and block:
+            return self._shard_pool.xover(
+                group, start=start, end=end, sort=sort)
+
         # Push request to the queue
         request = NNTPConnectionRequest(actions=[
             # Append list of NNTPConnection requests in a list
@@ -891,6 +1391,151 @@ class NNTPManager(object):
         # We aren't blocking, so just return the request object
         return request
 
+    def xover_iter(self, group, start, end, batch_size=None,
+                   sort=XoverGrouping.BY_ARTICLE_NO, max_pending=None,
+                   target_time=XOVER_TARGET_TIME):
+        """
+        A generator that retrieves the (inclusive) range of articles
+        specified in batches and yields a (low, high, response) tuple for
+        each of them as soon as it's been retrieved (in the order they
+        complete in).  The response is what xover() would have returned
+        for the range low to high (None if it could not be retrieved).
+
+        No more then max_pending requests are ever outstanding; more are
+        only queued as the others complete.  So no matter how large the
+        range is, the memory used stays the same.  If max_pending isn't
+        specified, then it's based on the number of connections that
+        handle our XOVER requests.
+
+        Batches start off being batch_size articles large (the
+        header_batch_size if one isn't specified) and are adjusted to the
+        time they take to retrieve; growing when they take less then
+        target_time seconds and shrinking when they take longer.  Ranges
+        that have gaps in them (articles that were removed) are requested
+        in larger batches so each one returns about the same number of
+        articles.  A batch that fails is split in two and retried until it
+        can't be made any smaller.
+
+        If our work is divided between shards, then our batches are handed
+        to each of them in turn.
+
+        """
+        if batch_size is None:
+            batch_size = self._settings.nntp_processing\
+                .get('header_batch_size', 5000)
+
+        # Our batch size limits
+        min_size = max(1, batch_size / XOVER_BATCH_SCALE)
+        max_size = batch_size * XOVER_BATCH_SCALE
+
+        if not max_pending:
+            max_pending = self.xover_connections()
+
+        # The number of articles we want each batch to return
+        size = batch_size
+
+        # The ratio of articles found in the ranges we requested
+        density = 1.0
+
+        # Ranges that need to be retried
+        retries = []
+
+        # Our completed requests are placed here as they finish
+        completed = Queue()
+
+        # Track what is still outstanding
+        pending = set()
+
+        try:
+            while True:
+                while len(pending) < max_pending and (retries or start <= end):
+                    if retries:
+                        low, high = retries.pop()
+
+                    else:
+                        # Sparse ranges can be requested in larger batches
+                        span = max(min_size, min(
+                            size * XOVER_BATCH_SCALE, int(size / density)))
+
+                        low, high = start, min(end, start + span - 1)
+                        start = high + 1
+
+                    kwargs = {
+                        'start': low,
+                        'end': high,
+                        'group': group,
+                        'sort': sort,
+                    }
+
+                    if self._shard_pool is not None:
+                        # One of our shards handles the batch
+                        request = self._shard_pool.submit('xover', **kwargs)
+
+                    else:
+                        # Push request to the queue
+                        request = NNTPConnectionRequest(actions=[
+                            # Append list of NNTPConnection requests in a
+                            # list ('function, (*args), (**kwargs) )
+                            ('xover', tuple(), kwargs),
+                        ])
+
+                    # Notify us when the request is complete
+                    request.rawlink(
+                        lambda r, l=low, h=high: completed.put((l, h, r)))
+
+                    if self._shard_pool is None:
+                        # Append to Queue for processing
+                        self.put(request)
+
+                    pending.add(request)
+
+                if not pending:
+                    # We're done
+                    break
+
+                # Wait for the next request to complete
+                low, high, request = completed.get()
+                pending.discard(request)
+
+                response = request.response[0] \
+                    if len(request.response) else None
+
+                if response is None:
+                    if high - low + 1 > min_size:
+                        # Try again using smaller batches
+                        size = max(min_size, size / 2)
+                        middle = low + (high - low) / 2
+                        retries.extend([(middle + 1, high), (low, middle)])
+                        logger.debug(
+                            'Retrying XOVER batch %d-%d as %d-%d and %d-%d.'
+                            % (low, high, low, middle, middle + 1, high))
+                        continue
+
+                    yield (low, high, None)
+                    continue
+
+                # The time our request took once it was picked up (the time
+                # it spent waiting in our queue doesn't count)
+                elapsed = request.elapsed()
+
+                if elapsed < target_time / 2:
+                    # Our server can handle more
+                    size = min(max_size, size * 2)
+
+                elif elapsed > target_time:
+                    size = max(min_size, size / 2)
+
+                # Track our density
+                density += ((max(1, len(response)) / float(high - low + 1)) -
+                            density) * XOVER_DENSITY_WEIGHT
+
+                yield (low, high, response)
+
+        finally:
+            # Anything still outstanding is no longer needed
+            for request in pending:
+                request.abort()
+
     def seek_by_date(self, refdate, group=None, block=True):
         """
         Returns a pointer in the selected group identified
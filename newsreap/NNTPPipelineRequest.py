@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+#
+# An NNTPRequest Object used by the NNTPManagaer to pipeline requests
+#
+# Copyright (C) 2017 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+
+import gevent.monkey
+gevent.monkey.patch_all()
+
+from newsreap.NNTPRequest import NNTPRequest
+from newsreap.NNTPConnectionRequest import REROUTE_ACTIONS
+
+# The NNTPConnection() functions that support pipelining mapped to the
+# function that performs them in bulk
+PIPELINE_ACTIONS = {
+    'get': 'get_many',
+    'stat': 'stat_many',
+}
+
+
+class NNTPPipelineRequest(NNTPRequest):
+    """
+    Wraps a batch of NNTPConnectionRequest() objects so that a single worker
+    can process them all at once by pipelining them to the NNTP Server.
+
+    Requests containing just one 'get' or 'stat' action are pipelined
+    together with the others that share the same arguments (other then the
+    article itself).  Everything else is just run one after another the old
+    fashioned way.
+
+    The responses are placed back into each of the NNTPConnectionRequest()
+    objects (and their completion flags are set) so that anyone waiting on
+    them is none the wiser that they were pipelined:
+
+        requests = [
+            NNTPConnectionRequest([('get', ('ABCD', '/tmp'), {}), ]),
+            NNTPConnectionRequest([('get', ('ABCE', '/tmp'), {}), ]),
+        ]
+        req = NNTPPipelineRequest(requests)
+
+    """
+
+    def __init__(self, requests, *args, **kwargs):
+        """
+        Initializes a request object and the requests specified
+        """
+        super(NNTPPipelineRequest, self).__init__(*args, **kwargs)
+
+        # Store our requests
+        self.requests = requests
+
+    def run(self, connection, *args, **kwargs):
+        """
+        Executes our requests and stores the response in each of them
+
+        """
+
+        if self.is_set():
+            # Early exit; we can't process a response that has already been
+            # set.  This flag is usually set remotely if aborting
+            return False
+
+        # Acquire the requests that still need processing
+        requests = [r for r in self.requests if not r.is_set()]
+
+        # Group the requests we can pipeline by the action they perform and
+        # the arguments (other then the article itself) they share
+        batches = []
+        for request in requests:
+            if len(request.actions) != 1 or \
+                    request.actions[0][0] not in PIPELINE_ACTIONS:
+                # This request can't be pipelined
+                batches.append((None, [request, ]))
+                continue
+
+            action = request.actions[0]
+            key = (
+                action[0],
+                tuple(action[1][1:]),
+                (action[2] if len(action) > 2 else None) or {},
+            )
+
+            batch = next((b for k, b in batches if k == key), None)
+            if batch is None:
+                batches.append((key, [request, ]))
+
+            else:
+                batch.append(request)
+
+        for key, batch in batches:
+            if key is None:
+                # Process our request the old fashioned way
+                for request in batch:
+                    request.run(connection=connection)
+                continue
+
+            name, _args, _kwargs = key
+            _func = getattr(connection, PIPELINE_ACTIONS[name])
+            for request, response in zip(batch, _func(
+                    [r.actions[0][1][0] for r in batch],
+                    *_args, **_kwargs)):
+
+                if (response is None or response is False) \
+                        and name in REROUTE_ACTIONS \
+                        and request.reroute is not None \
+                        and request.reroute(request):
+                    # Another server will handle this request
+                    continue
+
+                request.append(response)
+
+                # Set our completion flag; this flags any blocking services
+                # waiting for us to complete to resume
+                request.set()
+
+        # Set our completion flag
+        self.set()
+
+        # Return that we've set content okay
+        return True
+
+    def __len__(self):
+        """
+        support the len() function
+        """
+        return len(self.requests)
+
+    def __repr__(self):
+        """
+        Return an unambigious version of the object
+        """
+        return '<NNTPPipelineRequest requests=%d done=%s elapsed=%ss />' % (
+            len(self.requests),
+            self.is_set(),
+            self.elapsed(),
+        )
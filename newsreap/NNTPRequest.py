@@ -49,6 +49,12 @@ class NNTPRequest(Event):
         # For iterating over decoded items
         self._iter = None
 
+        # Optionally set to a function that is called with this request
+        # if the server handling it didn't have what we were looking for.
+        # If the function returns True, then it has taken responsibility
+        # for (another server) completing the request.
+        self.reroute = None
+
 
     def timer_start(self):
         """
@@ -77,8 +83,8 @@ class NNTPRequest(Event):
         Dynamically Calculates the elapsed time if it hasn't been calculated
         yet otherwise it just returns the current elapsed period
         """
-        if self._time_elapsed:
-            return self.elapsed
+        if self._time_elapsed is not None:
+            return self._time_elapsed
 
         if not self._time_start:
             return 0
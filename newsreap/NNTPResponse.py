@@ -55,6 +55,7 @@ class NNTPResponseCode(object):
     # 201 Service available, posting prohibited
     # 203 Streaming is OK
     # 205 Connection closing
+    # 206 Compression active
     # 235 Article transferred OK
     # 238 No such article found, please send it to me
     # 239 Article transferred OK
@@ -63,7 +64,8 @@ class NNTPResponseCode(object):
     # 281 Authentication accepted
     # 290 features updated
     SUCCESS = \
-        (111, 200, 201, 203, 205, 211, 223, 235, 238, 239, 240, 250, 281, 290)
+        (111, 200, 201, 203, 205, 206, 211, 223, 235, 238, 239, 240, 250, 281,
+         290)
 
     # A Success message that will be followed with data
     # This is done when calling NEWSGROUPS, XOVER, etc
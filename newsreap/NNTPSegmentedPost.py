@@ -146,6 +146,11 @@ class NNTPSegmentedPost(object):
         # A sorted set of articles
         self.articles = sortedset(key=lambda x: x.key())
 
+        # Content can be assembled as it's retrieved (see place()). This is
+        # the file we write it into along with a bitmap of the parts placed
+        self._assembly = None
+        self._bitmap = None
+
         if work_dir is None:
             self.work_dir = DEFAULT_TMP_DIR
         else:
@@ -556,6 +561,46 @@ class NNTPSegmentedPost(object):
         scope
         """
 
+        if self.is_placed():
+            # Our content was already assembled as it arrived (see place());
+            # all that's left is to swap it in place of our parts. Every
+            # part was valid, so loading it gives us valid content
+            assembly = NNTPBinaryContent(
+                filepath=self._assembly.filepath,
+                total_parts=self._assembly.total_parts,
+                total_size=self._assembly.total_size(),
+                work_dir=self.work_dir,
+            )
+            assembly.filename = self._assembly.filename
+
+            # Hand the ownership of our file over
+            self._assembly.close()
+            self._assembly.detach()
+            assembly.attach()
+
+            head_article = iter(self.articles).next().copy(
+                include_attachments=False)
+            head_article.decoded.add(assembly)
+
+            # Reset with a new sorted set of articles
+            self.articles.clear()
+
+            # Add our single head_article entry as our primary entry
+            self.articles.add(head_article)
+
+            self._assembly = None
+            self._bitmap = None
+            return True
+
+        if self._assembly is not None and self._assembly.filepath in [
+                c.filepath for a in self.articles for c in a.decoded]:
+            # Our parts were decoded straight into our assembled file but
+            # some of them are missing (or aren't valid); there is nothing
+            # left for us to join
+            logger.warning(
+                "Segment '%s' is incomplete." % self._assembly.filename)
+            return False
+
         if len(self.articles) == 1:
             # Nothing to do; no need to fail
             return True
@@ -592,6 +637,107 @@ class NNTPSegmentedPost(object):
         # We're done!
         return True
 
+    def place(self, article):
+        """
+        Tracks the decoded content of the article specified as being in
+        it's position within our assembled file (as identified by the yEnc
+        =ypart begin= offset). This allows the parts to be assembled in
+        whatever order they arrive in rather then having to join() them all
+        together once they've all been retrieved.
+
+        Content decoded straight into the file it makes up (see the
+        CodecYenc assembly_dir) is already where it belongs, so nothing is
+        written at all.  Any other content is copied into an assembled file
+        we allocate to it's full size the first time we're called.  A
+        bitmap tracks which (valid) parts are in place; once all of them
+        are, join() has nothing left to do but swap the assembled file in
+        place of our parts.
+
+        This function returns True if the content was placed and False if
+        it couldn't be (join() can still be used in this case unless other
+        parts were decoded straight into their file).
+        """
+        if len(article) != 1:
+            # We can only place articles containing one attachment
+            return False
+
+        content = article[0]
+        if not isinstance(content, NNTPBinaryContent):
+            return False
+
+        total_size = content.total_size()
+        if not total_size:
+            # We don't know how big our file is
+            return False
+
+        # Content decoded straight into the file it makes up isn't ours to
+        # clean up and is already the size of the entire file
+        in_place = not content.is_attached() and \
+            len(content) == total_size
+
+        if self._assembly is None:
+            total_parts = max(len(self.articles), content.total_parts)
+
+            if in_place:
+                # Our file was already assembled for us
+                self._assembly = NNTPBinaryContent(
+                    filepath=content.filepath,
+                    total_parts=total_parts,
+                    total_size=total_size,
+                    work_dir=self.work_dir,
+                )
+
+            else:
+                # Create our assembled file
+                self._assembly = NNTPBinaryContent(
+                    filepath=content.filename,
+                    total_parts=total_parts,
+                    total_size=total_size,
+                    work_dir=self.work_dir,
+                    unique=True,
+                )
+
+                if not self._assembly.preallocate(total_size):
+                    self._assembly = None
+                    return False
+
+            # Our assembled file is removed with us unless it's saved
+            self._assembly.attach()
+
+            # One bit per part
+            self._bitmap = bytearray((self._assembly.total_parts + 7) >> 3)
+
+        index = content.part - 1
+        if index < 0 or index >= self._assembly.total_parts or \
+                content.end() > self._assembly.total_size():
+            # We can't place this part
+            return False
+
+        if in_place:
+            if content.filepath != self._assembly.filepath:
+                # Decoded into some other file
+                return False
+
+        elif not self._assembly.write_at(content):
+            return False
+
+        if content.is_valid():
+            # Mark our part as placed
+            self._bitmap[index >> 3] |= 1 << (index & 7)
+
+        return True
+
+    def is_placed(self):
+        """
+        Returns True if all of our parts have been written into our
+        assembled file using place()
+        """
+        if self._bitmap is None:
+            return False
+
+        return sum(bin(b).count('1') for b in self._bitmap) == \
+            self._assembly.total_parts
+
     def deobsfucate(self, filebase='', codecs=None):
         """
         Using the article information we have, attempt to generate the
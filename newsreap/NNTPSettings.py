@@ -35,6 +35,8 @@
 #       use_head: True
 #       enabled: True
 #       encoding: ISO-8859-1
+#       pipeline: 1
+#       connections: 10
 #
 #   # have you got another server you want to add as a backup?
 #   # you can add as many more as you want here, just follow
@@ -258,6 +260,14 @@ DEFAULT_SERVER_VARIABLES = {
     'priority': None,
     'enabled': True,
 
+    # The maximum number of connections to make to the server; if set to
+    # zero then the number of (processing) threads is used
+    'connections': 0,
+
+    # The number of ARTICLE/BODY/STAT commands to keep outstanding on the
+    # server at once (pipelining); 1 disables pipelining
+    'pipeline': 1,
+
     # Defines The encoding thing such as the subject are encoded as
     'encoding': NNTP_DEFAULT_ENCODING,
 }
@@ -280,6 +290,17 @@ DEFAULT_PROCESSING_VARIABLES = {
     'threads': 5,
     # default header batchfile proccessing
     'header_batch_size': 25000,
+    # The number of groups to index headers for at the same time
+    'header_groups': 4,
+    # The filter file(s) (or directories of them) used to score the
+    # headers we've indexed (optional)
+    'filters': None,
+    # The number of processes to hand decoding off to (0 decodes the
+    # content within the connection that retrieved it)
+    'decode_processes': 0,
+    # The number of processes to divide our work (and connections) between
+    # (0 keeps all of it within this process)
+    'shards': 0,
     # ramdisk path (optional); leave blank if not set
     # A ramdisk greatly increases processing of certain content
     'ramdisk': None,
@@ -625,7 +625,7 @@ class NNTPnzb(NNTPContent):
         seg_count += sum(len(c) for c in self)
         return seg_count
 
-    def deobsfucate(self, filebase=None):
+    def deobsfucate(self, filebase=None, segments=None):
         """
         Scans through the segments, articles and content associated with an
         NZB-File and sets up the filenames defined in the segments to it's
@@ -635,6 +635,10 @@ class NNTPnzb(NNTPContent):
                   before the extension) to build on if we can't detect
                   the file on our own.
 
+        segments: restrict the scan to just the segments specified; this
+                  allows us to handle each file as soon as it's been
+                  retrieved (rather then waiting on the entire NZB-File).
+
         """
         # The name from the meta tag
         _name = self.meta.get('name', '').decode(self.encoding).strip()
@@ -648,7 +652,10 @@ class NNTPnzb(NNTPContent):
                 # we use the NZB-Filename itself as a backup
                 _name = splitext(basename(self.path()))[0]
 
-        for segment in self.segments:
+        if segments is None:
+            segments = self.segments
+
+        for segment in segments:
             filename = segment.deobsfucate(_name)
             if filename:
                 # Update
@@ -0,0 +1,613 @@
+# -*- coding: utf-8 -*-
+#
+# A pool of processes that each run their own NNTPManager
+#
+# Copyright (C) 2017 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+
+import gevent.monkey
+gevent.monkey.patch_all()
+
+import socket
+from datetime import datetime
+from multiprocessing import Process
+from multiprocessing import cpu_count
+
+from gevent import spawn
+from gevent.lock import Semaphore
+from gevent.queue import Queue
+
+from .DecodePool import send_message
+from .DecodePool import recv_message
+from .NNTPArticle import NNTPArticle
+from .NNTPContent import NNTPContent
+from .NNTPRequest import NNTPRequest
+
+# Logging
+import logging
+from newsreap.Logging import NEWSREAP_ENGINE
+logger = logging.getLogger(NEWSREAP_ENGINE)
+
+
+def shard_servers(servers, threads, shards):
+    """
+    Divides the connection budget of each server evenly between the number
+    of shards specified and returns a list (one per shard) of the servers
+    each one gets to use.
+
+    A server's budget is it's connection limit (or the number of threads
+    if it doesn't have one). Any connections that don't divide evenly are
+    given to different shards for each server so they balance out.  A
+    shard may end up with no servers at all if there just aren't enough
+    connections to go around.
+
+    """
+    results = [[] for _ in range(shards)]
+
+    for s_idx, server in enumerate(servers):
+        try:
+            budget = max(1, int(server.get('connections') or threads))
+
+        except (TypeError, ValueError):
+            budget = max(1, int(threads))
+
+        for idx in range(shards):
+            connections = budget / shards
+            if (idx - s_idx) % shards < budget % shards:
+                connections += 1
+
+            if connections:
+                _server = server.copy()
+                _server['connections'] = connections
+                results[idx].append(_server)
+
+    return results
+
+
+def split_range(start, end, shards):
+    """
+    Splits the (inclusive) start and end range specified into no more then
+    the number of shards specified and returns them as a list of
+    (start, end) tuples.
+
+    """
+    count = end - start + 1
+    if count <= 0:
+        return []
+
+    shards = min(shards, count)
+    results = []
+    for idx in range(shards):
+        _start = start + (count * idx) / shards
+        _end = start + (count * (idx + 1)) / shards - 1
+        results.append((_start, _end))
+
+    return results
+
+
+def article_contents(article):
+    """
+    Returns all of the NNTPContent objects associated with an article
+
+    """
+    if not isinstance(article, NNTPArticle):
+        return []
+
+    return [c for c in [article.body, article.header] + list(article.decoded)
+            if isinstance(c, NNTPContent)]
+
+
+def shard_worker(sock, settings, servers, hooks=None):
+    """
+    The main loop of each of our shards; an NNTPManager is created using
+    just the servers (and connections) we were handed.  Each request we
+    receive is handled in it's own greenlet so that we can work on several
+    of them at once.
+
+    """
+    # Imported here to avoid a circular import
+    from .NNTPManager import NNTPManager
+
+    # Only use our share of the servers
+    settings.nntp_servers = servers
+    settings.nntp_processing = settings.nntp_processing.copy()
+    settings.nntp_processing.update({
+        'threads': max(s['connections'] for s in servers),
+        # We're already a shard; our decoding is done here too
+        'shards': 0,
+        'decode_processes': 0,
+    })
+
+    mgr = NNTPManager(settings=settings, hooks=hooks)
+
+    # Our replies can be sent from several greenlets at once
+    lock = Semaphore(value=1)
+
+    def reply(job, action, payload):
+        """
+        Sends our reply back to the coordinator
+        """
+        lock.acquire(blocking=True)
+        try:
+            send_message(sock, (job, action, payload))
+
+        finally:
+            lock.release()
+
+    def handle(job, action, args, kwargs):
+        """
+        Handles a single request
+        """
+        # Get reference time
+        cur_time = datetime.now()
+
+        stats = {'requests': 0, 'failed': 0}
+        try:
+            if action == 'get_iter':
+                # Our articles are handed to us with their index so that
+                # the coordinator knows which is which
+                articles, work_dir = args
+                index = {}
+                for idx, article in articles:
+                    index.setdefault(id(article), []).append(idx)
+
+                for article, response in mgr.get_iter(
+                        [a for _, a in articles], work_dir, **kwargs):
+
+                    stats['requests'] += 1
+                    attached = []
+                    if response is None:
+                        stats['failed'] += 1
+
+                    for content in article_contents(response):
+                        # Our content is handed back to the coordinator; so
+                        # we need to detach it to prevent it from being
+                        # cleaned up by us
+                        content.close()
+                        attached.append(content.is_attached())
+                        content.detach()
+
+                    reply(job, 'result', (
+                        index[id(article)].pop(), response, attached))
+
+            else:
+                # Anything else is just a call to our NNTPManager
+                stats['requests'] += 1
+                response = getattr(mgr, action)(*args, **kwargs)
+                if response is None:
+                    stats['failed'] += 1
+
+                reply(job, 'result', (0, response, []))
+
+        except Exception as e:
+            logger.error('Shard failed to handle %s request.' % action)
+            logger.debug('Shard exception: %s' % str(e))
+
+        # Track our elapsed time
+        elapsed = datetime.now() - cur_time
+        stats['elapsed'] = (elapsed.days * 86400) + elapsed.seconds + \
+            (elapsed.microseconds / 1e6)
+
+        try:
+            reply(job, 'done', stats)
+
+        except socket.error:
+            # We lost our coordinator
+            pass
+
+    while True:
+        try:
+            request = recv_message(sock)
+
+        except (socket.error, EOFError):
+            break
+
+        if request is None:
+            break
+
+        spawn(handle, *request)
+
+    mgr.close()
+    sock.close()
+
+
+class ShardPool(object):
+    """
+    Everything an NNTPManager does (socket handling, hooks, parsing, etc)
+    happens in a single process.  A ShardPool spreads that work across
+    several processes (shards) instead; each one runs it's own NNTPManager
+    with a slice of the connections we're allowed to make.
+
+    Requests that can be divided up (such as the retrieval of the
+    segments that make up an NZB-File or an XOVER range) are split
+    between our shards and the results are gathered back together.
+
+    Shards are forked when the pool is created so it should be created
+    before any connections are made.
+
+    """
+
+    def __init__(self, settings, shards=None, hooks=None, servers=None):
+        """
+        Initializes our shards; if the number of shards isn't specified
+        then one is started for each CPU available.
+
+        Our servers (and their connections) are divided evenly between our
+        shards (see shard_servers()) unless the servers each shard gets
+        to use are specified; one list of servers per shard.
+
+        """
+        if servers is None:
+            if not shards:
+                shards = cpu_count()
+
+            servers = shard_servers(
+                settings.nntp_servers,
+                settings.nntp_processing['threads'], shards)
+
+        # Our shards; each entry is a (process, socket, lock) tuple
+        self._shards = []
+
+        # The statistics gathered from each of our shards
+        self._stats = []
+
+        # Our outstanding jobs mapped to the queue their results go to
+        self._jobs = {}
+        self._job_id = 0
+
+        # The greenlets reading the results returned by our shards
+        self._readers = []
+
+        # The shard the next request submitted goes to
+        self._next = 0
+
+        for idx, servers in enumerate(servers):
+            if not servers:
+                logger.warning(
+                    'Shard %d has no connections to work with.' % idx)
+                continue
+
+            parent, child = socket.socketpair()
+
+            # Our shards can sit idle for a while; so we never want to
+            # inherit a default timeout
+            parent.settimeout(None)
+            child.settimeout(None)
+
+            process = Process(
+                target=shard_worker, args=(child, settings, servers, hooks))
+            process.daemon = True
+            process.start()
+
+            # The child's end is no longer needed in our process
+            child.close()
+
+            self._shards.append((process, parent, Semaphore(value=1)))
+            self._stats.append({
+                'connections': sum(s['connections'] for s in servers),
+                'requests': 0,
+                'failed': 0,
+                'elapsed': 0.0,
+            })
+
+        for idx in range(len(self._shards)):
+            self._readers.append(spawn(self._reader, idx))
+
+        logger.info("Started %d shard(s)." % len(self._shards))
+
+    def _reader(self, idx):
+        """
+        Reads the results returned by the shard specified and hands them
+        to the job they belong to.
+
+        """
+        sock = self._shards[idx][1]
+        while True:
+            try:
+                message = recv_message(sock)
+
+            except (socket.error, EOFError):
+                message = None
+
+            if message is None:
+                break
+
+            job, action, payload = message
+            if action == 'done':
+                # Gather our statistics
+                for key in ('requests', 'failed', 'elapsed'):
+                    self._stats[idx][key] += payload.get(key, 0)
+
+                # Our job is no longer outstanding
+                queue = self._jobs.pop(job, None)
+
+            else:
+                queue = self._jobs.get(job)
+
+            if queue is not None:
+                queue.put((idx, action, payload))
+
+        # We lost our shard; anything still waiting on it is done
+        for job in [j for j in self._jobs.keys() if j[0] == idx]:
+            self._jobs.pop(job).put((idx, 'done', {}))
+
+    def _submit(self, idx, queue, action, *args, **kwargs):
+        """
+        Hands a request to the shard specified; it's results are placed
+        into the queue provided.
+
+        Returns True if the request was sent, otherwise False is returned.
+
+        """
+        self._job_id += 1
+        job = (idx, self._job_id)
+        self._jobs[job] = queue
+
+        process, sock, lock = self._shards[idx]
+        lock.acquire(blocking=True)
+        try:
+            send_message(sock, (job, action, args, kwargs))
+            return True
+
+        except (socket.error, TypeError) as e:
+            logger.debug('ShardPool exception: %s' % str(e))
+            del self._jobs[job]
+
+        finally:
+            lock.release()
+
+        return False
+
+    def _gather(self, requests):
+        """
+        A generator that yields each (shard, index, result) tuple returned
+        by the requests specified; each request is a (shard, action, args,
+        kwargs) tuple.
+
+        """
+        queue = Queue()
+        pending = 0
+
+        for idx, action, args, kwargs in requests:
+            if self._submit(idx, queue, action, *args, **kwargs):
+                pending += 1
+
+        while pending:
+            idx, action, payload = queue.get()
+            if action == 'done':
+                pending -= 1
+                continue
+
+            yield (idx, payload)
+
+        # Clean up our jobs
+        for job in [j for j, q in self._jobs.items() if q is queue]:
+            del self._jobs[job]
+
+    def call(self, action, *args, **kwargs):
+        """
+        Calls the NNTPManager function specified using our first shard and
+        returns it's result.
+
+        """
+        if not self._shards:
+            return None
+
+        results = [payload[1] for _, payload in self._gather(
+            [(0, action, args, kwargs), ])]
+
+        return results[0] if results else None
+
+    def submit(self, action, *args, **kwargs):
+        """
+        Hands the NNTPManager function specified to the next one of our
+        shards (in turn) and returns an NNTPRequest() object right away;
+        it's set once the shard has returned it's result (which is placed
+        into it's response).
+
+        """
+        request = NNTPRequest()
+        if not self._shards:
+            # Nothing to do it with
+            request.set()
+            return request
+
+        idx = self._next % len(self._shards)
+        self._next += 1
+
+        def run():
+            request.timer_start()
+            for _, (_, response, _) in self._gather(
+                    [(idx, action, args, kwargs), ]):
+                request.append(response)
+
+            request.timer_stop()
+            request.set()
+
+        spawn(run)
+        return request
+
+    def get_iter(self, articles, work_dir, decoders=None, group=None,
+                 max_bytes=0, max_pending=None, assembly_dir=None):
+        """
+        A generator that yields an (article, response) tuple for each
+        article as soon as it has been retrieved by one of our shards (just
+        like NNTPManager.get_iter() does).
+
+        Our articles are divided into one contiguous block per shard.
+
+        """
+        articles = list(articles)
+        if not articles or not self._shards:
+            return
+
+        kwargs = {
+            'decoders': decoders,
+            'group': group,
+            'max_bytes': max_bytes,
+            'assembly_dir': assembly_dir,
+        }
+
+        if max_pending:
+            kwargs['max_pending'] = max(1, max_pending / len(self._shards))
+
+        requests = []
+        for idx, (start, end) in enumerate(
+                split_range(0, len(articles) - 1, len(self._shards))):
+
+            requests.append((idx, 'get_iter', (
+                [(i, articles[i]) for i in range(start, end + 1)],
+                work_dir), kwargs))
+
+        for _, (index, response, attached) in self._gather(requests):
+            for content, _attached in zip(
+                    article_contents(response), attached):
+                if _attached:
+                    # Take ownership of our content
+                    content.attach()
+
+            article = articles[index]
+            if isinstance(article, NNTPArticle) and \
+                    isinstance(response, NNTPArticle):
+                # Load our response back to our article
+                article.load(response)
+
+            yield (article, response)
+
+    def get(self, articles, work_dir, decoders=None, group=None,
+            max_bytes=0):
+        """
+        Retrieves all of the articles specified using our shards and
+        returns their responses in the same order they were specified in.
+
+        """
+        articles = list(articles)
+        index = {}
+        for idx, article in enumerate(articles):
+            index.setdefault(id(article), []).append(idx)
+
+        responses = [None] * len(articles)
+        for article, response in self.get_iter(
+                articles, work_dir, decoders=decoders, group=group,
+                max_bytes=max_bytes):
+            responses[index[id(article)].pop()] = response
+
+        return responses
+
+    def xover(self, group, start=None, end=None, sort=None):
+        """
+        Divides the XOVER range specified between our shards and returns
+        the merged results.  None is returned if any part of the range
+        could not be retrieved.
+
+        """
+        if start is None or end is None:
+            # We need our group boundaries
+            response = self.call('group', group)
+            if not response or response[0] is None:
+                return None
+
+            if start is None:
+                start = response[1]
+
+            if end is None:
+                end = response[2]
+
+        if isinstance(start, datetime):
+            start = self.call('seek_by_date', start, group=group)
+
+        if isinstance(end, datetime):
+            end = self.call('seek_by_date', end, group=group)
+
+        if start is None or end is None:
+            return None
+
+        kwargs = {'group': group}
+        if sort is not None:
+            kwargs['sort'] = sort
+
+        requests = [
+            (idx, 'xover', tuple(), dict(kwargs, start=_start, end=_end))
+            for idx, (_start, _end) in enumerate(
+                split_range(start, end, len(self._shards)))]
+
+        results = None
+        count = 0
+        for _, (_, response, _) in self._gather(requests):
+            if response is None:
+                # Keep reading what's left; but we've failed
+                continue
+
+            count += 1
+            if results is None:
+                results = response
+
+            else:
+                results.update(response)
+
+        if count != len(requests):
+            # We're missing part of our range
+            return None
+
+        return results
+
+    def stats(self):
+        """
+        Returns a list containing the statistics gathered from each of our
+        shards; each entry is a dictionary containing the number of
+        connections the shard was given, the number of requests it
+        handled (and how many of them failed) and the time (in seconds)
+        it spent handling them.
+
+        """
+        return [s.copy() for s in self._stats]
+
+    def close(self):
+        """
+        Stops all of our shards
+        """
+        while self._shards:
+            process, sock, lock = self._shards.pop()
+            try:
+                send_message(sock, None)
+
+            except socket.error:
+                pass
+
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+
+            sock.close()
+
+        for reader in self._readers:
+            reader.kill()
+
+        self._readers = []
+
+    def __len__(self):
+        """
+        Returns the number of shards in our pool
+        """
+        return len(self._shards)
+
+    def __del__(self):
+        """
+        Gracefully stop our shards
+        """
+        self.close()
+
+    def __repr__(self):
+        """
+        Return a printable version of our pool
+        """
+        return '<ShardPool shards=%d />' % len(self._shards)
@@ -23,6 +23,14 @@ from gevent import Timeout
 from gevent.select import select
 from gevent.select import error as SelectError
 
+from zlib import compressobj
+from zlib import decompressobj
+from zlib import error as ZlibException
+from zlib import DEFLATED
+from zlib import MAX_WBITS
+from zlib import Z_DEFAULT_COMPRESSION
+from zlib import Z_SYNC_FLUSH
+
 from cryptography import x509
 from cryptography.hazmat.backends import default_backend
 from cryptography.x509.oid import NameOID
@@ -192,6 +200,14 @@ class SocketBase(object):
         if hooks:
             self.hooks.add(hooks=hooks)
 
+        # Our (streaming) compression objects used when the entire
+        # session is deflated; see deflate()
+        self._deflate = None
+        self._inflate = None
+
+        # Decompressed data we haven't returned yet
+        self._inflated = ''
+
     def hooks(self, hooks, reset=True):
         """
         Sets hooks into our connection object(s)
@@ -221,6 +237,10 @@ class SocketBase(object):
         a dead connection (bad file descriptor), etc
         """
 
+        if self._inflated:
+            # We still have decompressed data we haven't returned yet
+            return True
+
         # rs = Read Sockets
         # ws = Write Sockets
         # es = Error Sockets
@@ -289,6 +309,9 @@ class SocketBase(object):
                 if data is None:
                     data = ''
 
+                elif data and self._inflate is not None:
+                    data = self._inflate.decompress(data)
+
             except Exception:
                 pass
 
@@ -321,6 +344,13 @@ class SocketBase(object):
         # Reset Connect Time Stat
         self.stat_connect_time = None
 
+        # Compression is negotiated per connection
+        self._deflate = None
+        self._inflate = None
+        if self._inflated:
+            data = self._inflated + data
+            self._inflated = ''
+
         # reset remote connection details only
         # we keep the local ones so we can re-use them
         # if possible (especially the port)
@@ -665,6 +695,11 @@ class SocketBase(object):
         # Swap socket with new
         self.socket = conn
 
+        # Compression is negotiated per connection
+        self._deflate = None
+        self._inflate = None
+        self._inflated = ''
+
         # Update our local information
         (self._local_addr, self._local_port) = self.socket.getsockname()
         (self._remote_addr, self._remote_port) = self.socket.getpeername()
@@ -747,6 +782,24 @@ class SocketBase(object):
 
         return True
 
+    def deflate(self, level=Z_DEFAULT_COMPRESSION):
+        """
+        Compresses everything read from and written to our socket from this
+        point forward using a (raw) streaming deflate as defined by RFC 8054.
+
+        Both ends of the connection must agree to this first; this is
+        usually done by some sort of handshake (such as COMPRESS DEFLATE)
+        that is the last thing sent uncompressed.
+
+        Compression lasts until the connection is closed.
+        """
+        if not self.connected:
+            return False
+
+        self._deflate = compressobj(level, DEFLATED, -MAX_WBITS)
+        self._inflate = decompressobj(-MAX_WBITS)
+        return True
+
     def read(self, max_bytes=32768, timeout=None, retry_wait=0.25):
         """read()
 
@@ -764,6 +817,120 @@ class SocketBase(object):
         """
         total_data = []
 
+        def recv(max_bytes):
+            # Fetch data
+            if self._inflate is not None:
+                data = self._recv_inflated(max_bytes)
+            else:
+                data = self.socket.recv(max_bytes)
+
+            if data:
+                total_data.append(data)
+            return len(data)
+
+        def store(data):
+            # Store lingering data
+            total_data.append(data)
+            return len(data)
+
+        self._read(
+            recv, store,
+            max_bytes=max_bytes, timeout=timeout, retry_wait=retry_wait,
+        )
+
+        # Return Buffer
+        return ''.join(total_data)
+
+    def read_into(self, buffer, max_bytes=None, timeout=None,
+                  retry_wait=0.25):
+        """read_into()
+
+           Identical to read() except the data is placed directly into the
+           (writable) buffer specified such as a bytearray or memoryview.
+           This saves us from having to allocate (and later copy) a new
+           string with each read.
+
+           max_bytes:  Identify how many bytes to read from TCP stream; if
+                       set to None then we read as much as the buffer can
+                       hold.
+
+           The number of bytes placed into the buffer is returned.
+
+           raise an exception if connection lost.
+        """
+        view = memoryview(buffer)
+        if max_bytes is None or max_bytes > len(view):
+            max_bytes = len(view)
+
+        # track bytes read
+        offset = [0]
+
+        def recv(max_bytes):
+            # Fetch data
+            if self._inflate is not None:
+                # Compressed data can't be received in place
+                data = self._recv_inflated(max_bytes)
+                nbytes = len(data)
+                view[offset[0]:offset[0] + nbytes] = data
+
+            else:
+                nbytes = self.socket.recv_into(
+                    view[offset[0]:offset[0] + max_bytes], max_bytes)
+
+            offset[0] += nbytes
+            return nbytes
+
+        def store(data):
+            # Store what lingering data we can fit
+            data = data[:len(view) - offset[0]]
+            view[offset[0]:offset[0] + len(data)] = data
+            offset[0] += len(data)
+            return len(data)
+
+        return self._read(
+            recv, store,
+            max_bytes=max_bytes, timeout=timeout, retry_wait=retry_wait,
+        )
+
+    def _recv_inflated(self, max_bytes):
+        """
+        Returns up to max_bytes of decompressed data from our socket.  Any
+        decompressed data we couldn't fit is kept for the next call.
+
+        An empty string is only returned if the connection was lost.
+        """
+        # Handle what we've already received first
+        data = self._inflated
+        while not data:
+            # A small compressed block may not yield any data at all; so we
+            # keep reading until it does
+            _data = self.socket.recv(max_bytes)
+            if not _data:
+                # Connection lost
+                break
+
+            try:
+                data = self._inflate.decompress(_data)
+
+            except ZlibException:
+                # We can't recover from a corrupted stream
+                self.close()
+                raise SocketException('Corrupted compression stream')
+
+        self._inflated = data[max_bytes:]
+        return data[:max_bytes]
+
+    def _read(self, recv, store, max_bytes, timeout=None, retry_wait=0.25):
+        """
+        The guts behind read() and read_into().
+
+        recv is called with the maximum number of bytes we're willing to
+        accept and must return the number of bytes it received from the
+        socket. store is called with any lingering data left on the socket
+        when it's closed on us and must return the number of bytes it kept.
+
+        The total number of bytes read is returned.
+        """
         # Get reference time
         cur_time = datetime.now()
 
@@ -775,7 +942,7 @@ class SocketBase(object):
 
         if not self.connected:
             # No connection
-            return ''
+            return 0
 
         if retry_wait:
             # Make sure we're not blocking
@@ -803,12 +970,11 @@ class SocketBase(object):
 
             try:
                 # Fetch data
-                data = self.socket.recv(max_bytes - bytes_read)
+                nbytes = recv(max_bytes - bytes_read)
 
-                if data:
-                    # Store data
-                    bytes_read += len(data)
-                    total_data.append(data)
+                if nbytes:
+                    # Track data
+                    bytes_read += nbytes
 
                     # Get our elapsed transfer time
                     elapsed_xfer_time = datetime.now() - cur_time
@@ -824,7 +990,7 @@ class SocketBase(object):
                         host=self._remote_addr,
                         port=self._remote_port,
                         # The number of bytes read
-                        xfer_bytes=len(data),
+                        xfer_bytes=nbytes,
                         # The time it took to read these bytes
                         xfer_time=elapsed_xfer_time,
                         # Our sockets
@@ -833,13 +999,12 @@ class SocketBase(object):
 
                 # If we reach here, then we aren't using timeouts and the
                 # socket returned nothing...
-                if not data:
+                if not nbytes:
                     # We lost the connection
                     data = self.close()
                     if data:
                         # Store data
-                        bytes_read += len(data)
-                        total_data.append(data)
+                        bytes_read += store(data)
 
                     if not timeout:
                         raise SocketException('Connection lost')
@@ -895,14 +1060,13 @@ class SocketBase(object):
                 data = self.close()
                 if data:
                     # Store data
-                    bytes_read += len(data)
-                    total_data.append(data)
+                    bytes_read += store(data)
 
                 if not timeout:
                     raise SocketException('Connection broken')
 
-        # Return Buffer
-        return ''.join(total_data)
+        # Return the number of bytes read
+        return bytes_read
 
     def send(self, data, max_bytes=None, retry_wait=0.25):
         """ Socket Wrapper for people using this class as if it were just
@@ -910,6 +1074,28 @@ class SocketBase(object):
             sending the data
         """
 
+        if not max_bytes:
+            max_bytes = len(data)
+
+        if self._deflate is not None and self.connected:
+            # Compress what we're sending and flush it so that the remote
+            # end can act on it right away; we report back the number of
+            # (uncompressed) bytes we were asked to send
+            nbytes = min(max_bytes, len(data))
+            if not self._send(
+                    self._deflate.compress(data[:nbytes]) +
+                    self._deflate.flush(Z_SYNC_FLUSH), retry_wait=retry_wait):
+                return 0
+            return nbytes
+
+        return self._send(data, max_bytes=max_bytes, retry_wait=retry_wait)
+
+    def _send(self, data, max_bytes=None, retry_wait=0.25):
+        """
+        The guts behind send(); writes the data specified to our socket
+        as is.
+        """
+
         # track bytes written
         tot_bytes = 0
 
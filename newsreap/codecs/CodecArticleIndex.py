@@ -15,8 +15,13 @@
 # GNU Lesser General Public License for more details.
 
 import re
-from blist import sorteddict
+from array import array
+from calendar import timegm
+from blist import sortedset
+from collections import OrderedDict
 from datetime import datetime
+from datetime import timedelta
+from email.utils import parsedate_tz
 from pytz import UTC
 from dateutil.tz import tzutc
 from dateutil.parser import parse
@@ -24,6 +29,7 @@ from dateutil.parser import parse
 from newsreap.codecs.CodecBase import CodecBase
 from newsreap.NNTPMetaContent import NNTPMetaContent
 from newsreap.NNTPIOStream import NNTP_DEFAULT_ENCODING
+from newsreap.NNTPFilterBase import apply_filters
 
 # Logging
 import logging
@@ -55,6 +61,55 @@ NNTP_XOVER_RESPONSE_RE = re.compile(
     re.IGNORECASE,
 )
 
+# The number of XOVER fields we expect to find in each line
+NNTP_XOVER_FIELDS = 9
+
+# The number of parsed XOVER dates we keep around; articles posted
+# together share the same date so we can save ourselves from parsing
+# them over and over again
+NNTP_XOVER_DATE_CACHE_SIZE = 4096
+
+# Our (least recently used) cache of parsed XOVER dates
+NNTP_XOVER_DATE_CACHE = OrderedDict()
+
+
+def parse_xover_date(date_str):
+    """
+    Parses the RFC 5322 date specified (as found in an XOVER response) and
+    returns it as a naive datetime object (in UTC).  None is returned if
+    the date could not be parsed.
+
+    The results are cached as many articles share the same date.
+    """
+    try:
+        # Move our entry to the end (most recently used)
+        article_date = NNTP_XOVER_DATE_CACHE.pop(date_str)
+        NNTP_XOVER_DATE_CACHE[date_str] = article_date
+        return article_date
+
+    except KeyError:
+        pass
+
+    result = parsedate_tz(date_str)
+    if result is None:
+        return None
+
+    try:
+        # Convert our date to UTC
+        article_date = datetime(*result[:6]) - \
+            timedelta(seconds=result[9] or 0)
+
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+    if len(NNTP_XOVER_DATE_CACHE) >= NNTP_XOVER_DATE_CACHE_SIZE:
+        # Drop our least recently used entry
+        NNTP_XOVER_DATE_CACHE.popitem(last=False)
+
+    NNTP_XOVER_DATE_CACHE[date_str] = article_date
+    return article_date
+
+
 class XoverGrouping(object):
     """
     Defines the xover grouping
@@ -76,6 +131,290 @@ XOVER_GROUPINGS = (
 )
 
 
+class ArticleIndexBatch(object):
+    """
+    A compact (columnar) container for the entries parsed from an XOVER
+    response.  Rather then storing a dictionary for every article, each
+    field is stored in it's own column; numbers are kept in arrays and
+    the poster, subject and group strings are stored once in a table that
+    each article references.
+
+    Articles are kept in the order they were added; the order they're
+    sorted in (see XoverGrouping) is only worked out when it's needed.
+
+    For backwards compatibility the batch can still be treated like the
+    sorteddict() that used to be returned; each article is keyed by the
+    same string (based on the sort order) and it's value is the dictionary
+    CodecArticleIndex.detect() returns.
+
+    """
+
+    def __init__(self, sort=None, entries=None):
+        """
+        Initializes our batch
+        """
+        # Sort Order
+        self.sort = sort
+        if self.sort is None or self.sort not in XOVER_GROUPINGS:
+            self.sort = XoverGrouping.BY_POSTER_TIME
+
+        # Our numeric columns
+        self._article_no = array('l')
+        self._size = array('l')
+        self._lines = array('l')
+        self._score = array('l')
+
+        # Our dates are stored as the number of seconds since the epoch
+        self._date = array('d')
+
+        # Our Message-ID's are unique to each article
+        self._id = []
+
+        # Our cross posts (if any) are stored as a tuple of
+        # (group, article_no) tuples
+        self._xgroups = []
+
+        # Our string columns reference an entry in our tables
+        self._poster = array('l')
+        self._subject = array('l')
+        self._group = array('l')
+
+        # Our string tables; each maps the string to it's index
+        self._tables = {
+            'poster': ([], {}),
+            'subject': ([], {}),
+            'group': ([], {}),
+        }
+
+        # Our sort order and keys; these are built when they're needed
+        self._order = None
+        self._index = None
+
+        if entries:
+            self.update(entries)
+
+    def _intern(self, table, value):
+        """
+        Returns the index of the value specified in the table identified
+        (adding it if it isn't already there)
+        """
+        strings, index = self._tables[table]
+        try:
+            return index[value]
+
+        except KeyError:
+            index[value] = len(strings)
+            strings.append(value)
+
+        return index[value]
+
+    def add(self, entry):
+        """
+        Adds an entry (as returned by CodecArticleIndex.detect()) to our
+        batch
+        """
+        self._article_no.append(entry['article_no'])
+        self._size.append(entry['size'])
+        self._lines.append(entry['lines'])
+        self._score.append(int(entry.get('score', 0)))
+        self._date.append(timegm(entry['date'].utctimetuple()))
+        self._id.append(entry['id'])
+        self._xgroups.append(tuple(entry['xgroups'].items())
+                             if entry['xgroups'] else ())
+        self._poster.append(self._intern('poster', entry['poster']))
+        self._subject.append(self._intern('subject', entry['subject']))
+        self._group.append(self._intern('group', entry['group']))
+
+        # Our order has changed
+        self._order = None
+        self._index = None
+
+    def update(self, entries):
+        """
+        Adds all of the entries from another batch (or dictionary) to our
+        own
+        """
+        if isinstance(entries, ArticleIndexBatch):
+            entries = entries.iterrows()
+
+        elif isinstance(entries, dict):
+            entries = entries.itervalues()
+
+        for entry in entries:
+            self.add(entry)
+
+    def column(self, name):
+        """
+        Returns an iterator over the column specified in the order our
+        articles were added to our batch.  The column names are the same
+        as the keys of each entry.
+        """
+        if name in self._tables:
+            strings = self._tables[name][0]
+            return (strings[i] for i in getattr(self, '_%s' % name))
+
+        if name == 'date':
+            return (datetime.utcfromtimestamp(d) for d in self._date)
+
+        if name == 'xgroups':
+            return (dict(x) for x in self._xgroups)
+
+        if name not in ('article_no', 'size', 'lines', 'score', 'id'):
+            raise KeyError(name)
+
+        return iter(getattr(self, '_%s' % name))
+
+    def row(self, idx):
+        """
+        Returns the article at the index specified (based on the order it
+        was added to our batch) as a dictionary.
+        """
+        return {
+            'id': self._id[idx],
+            'article_no': self._article_no[idx],
+            'poster': self._tables['poster'][0][self._poster[idx]],
+            'date': datetime.utcfromtimestamp(self._date[idx]),
+            'subject': self._tables['subject'][0][self._subject[idx]],
+            'size': self._size[idx],
+            'lines': self._lines[idx],
+            'group': self._tables['group'][0][self._group[idx]],
+            'score': self._score[idx],
+            'xgroups': dict(self._xgroups[idx]),
+        }
+
+    def iterrows(self):
+        """
+        Returns an iterator over our articles (as dictionaries) in the order
+        they were added to our batch.
+        """
+        return (self.row(idx) for idx in xrange(len(self._id)))
+
+    def order(self):
+        """
+        Returns a list of the indexes of our articles in the order they
+        should be sorted in.
+        """
+        if self._order is not None:
+            return self._order
+
+        if self.sort == XoverGrouping.BY_POSTER_TIME:
+            strings = self._tables['poster'][0]
+            key = lambda i: (
+                strings[self._poster[i]],
+                int(self._date[i]),
+                self._article_no[i],
+            )
+
+        elif self.sort == XoverGrouping.BY_TIME:
+            key = lambda i: (int(self._date[i]), self._article_no[i])
+
+        else:  # XoverGrouping.BY_ARTICLE_NO
+            key = self._article_no.__getitem__
+
+        self._order = sorted(xrange(len(self._id)), key=key)
+        return self._order
+
+    def key(self, idx):
+        """
+        Returns the key of the article at the index specified
+        """
+        if self.sort == XoverGrouping.BY_ARTICLE_NO:
+            return '%.10d' % self._article_no[idx]
+
+        date = datetime.utcfromtimestamp(self._date[idx])\
+            .strftime('%Y%m%d%H%M%S')
+
+        if self.sort == XoverGrouping.BY_TIME:
+            return '%s:%.10d' % (date, self._article_no[idx])
+
+        # XoverGrouping.BY_POSTER_TIME
+        return '%s:%s:%.10d' % (
+            self._tables['poster'][0][self._poster[idx]],
+            date,
+            self._article_no[idx],
+        )
+
+    def keys(self):
+        """
+        Returns our (sorted) keys
+        """
+        return sortedset(self.iterkeys())
+
+    def iterkeys(self):
+        """
+        Returns an iterator over our keys in order
+        """
+        return (self.key(idx) for idx in self.order())
+
+    def itervalues(self):
+        """
+        Returns an iterator over our articles in order
+        """
+        return (self.row(idx) for idx in self.order())
+
+    def iteritems(self):
+        """
+        Returns an iterator over our (key, article) tuples in order
+        """
+        return ((self.key(idx), self.row(idx)) for idx in self.order())
+
+    def values(self):
+        """
+        Returns a list of our articles in order
+        """
+        return list(self.itervalues())
+
+    def items(self):
+        """
+        Returns a list of our (key, article) tuples in order
+        """
+        return list(self.iteritems())
+
+    def get(self, key, default=None):
+        """
+        Returns the article associated with the key specified
+        """
+        if self._index is None:
+            self._index = {self.key(idx): idx for idx in xrange(len(self))}
+
+        idx = self._index.get(key)
+        return default if idx is None else self.row(idx)
+
+    def __getitem__(self, key):
+        """
+        Returns the article associated with the key specified
+        """
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+
+        return entry
+
+    def __contains__(self, key):
+        """
+        Returns True if the key specified is in our batch
+        """
+        return self.get(key) is not None
+
+    def __iter__(self):
+        """
+        Returns an iterator over our keys in order
+        """
+        return self.iterkeys()
+
+    def __len__(self):
+        """
+        Returns the number of articles in our batch
+        """
+        return len(self._id)
+
+    def __repr__(self):
+        """
+        Return a printable object
+        """
+        return '<ArticleIndexBatch articles=%d />' % len(self)
+
+
 class CodecArticleIndex(CodecBase):
     """
     This is the codec used to store general content parsed that is not encoded
@@ -87,12 +426,6 @@ class CodecArticleIndex(CodecBase):
         super(CodecArticleIndex, self).__init__(descriptor=descriptor,
             work_dir=work_dir, *args, **kwargs)
 
-        # Our Meta Content
-        self.decoded = NNTPMetaContent(work_dir=self.work_dir)
-
-        # Switch our content subvalue to be a sorteddict()
-        self.decoded.content = sorteddict()
-
         # Filters
         self.filters = filters
 
@@ -101,6 +434,12 @@ class CodecArticleIndex(CodecBase):
         if self.sort is None or self.sort not in XOVER_GROUPINGS:
             self.sort = XoverGrouping.BY_POSTER_TIME
 
+        # Our Meta Content
+        self.decoded = NNTPMetaContent(work_dir=self.work_dir)
+
+        # Switch our content subvalue to be an ArticleIndexBatch()
+        self.decoded.content = ArticleIndexBatch(sort=self.sort)
+
         # The character set encoding usenet content is retrieved in
         if encoding is None:
             self.encoding = NNTP_DEFAULT_ENCODING
@@ -117,7 +456,17 @@ class CodecArticleIndex(CodecBase):
         It returns None if there this is not a group entry line, otherwise
         it returns a dictionary of the keys and their mapped values.
 
+        Well formed lines are split on their tabs; the (much slower) regular
+        expression is only used on the lines that aren't.
+
         """
+        # Our fast path
+        fields = line.split('\t', NNTP_XOVER_FIELDS)
+        if len(fields) >= NNTP_XOVER_FIELDS:
+            entry = self._detect_fields(fields)
+            if entry is not None:
+                return entry
+
         result = NNTP_XOVER_RESPONSE_RE.match(line)
         if not result:
             return None
@@ -188,10 +537,88 @@ class CodecArticleIndex(CodecBase):
         return entry
 
 
+    def _detect_fields(self, fields):
+        """
+        Builds our entry from the tab delimited fields of a well formed
+        XOVER line; None is returned if the line isn't one of them (in which
+        case the regular expression should be used to parse it instead).
+
+        """
+        subject = fields[1].strip(' ')
+        poster = fields[2].strip(' ')
+        msgid = fields[4].strip(' <>')
+        if not (subject and poster and msgid):
+            return None
+
+        try:
+            article_no = int(fields[0])
+            size = int(fields[6])
+
+        except ValueError:
+            return None
+
+        article_date = parse_xover_date(fields[3])
+        if article_date is None:
+            # Let our regular expression (and dateutil) deal with it
+            return None
+
+        try:
+            lines = int(fields[7])
+
+        except ValueError:
+            # Initialize lines to -1 if they weren't specified
+            lines = -1
+
+        xref = fields[8].lstrip(' ')
+        if xref[:4].lower() == 'xref':
+            # Drop our Xref: prefix
+            _xref = xref[4:].lstrip(' ')
+            if _xref[:1] == ':':
+                xref = _xref[1:]
+
+        groups = xref.split()
+        if not groups:
+            return None
+
+        entry = {
+            'id': msgid,
+            'article_no': article_no,
+            'poster': poster.decode(self.encoding),
+            'date': article_date,
+            'subject': subject.decode(self.encoding),
+            'size': size,
+            'lines': lines,
+            'group': None,
+            'score': 0,
+            'xgroups': {},
+        }
+
+        # Append remaining groups
+        for x in groups:
+            grp = x.split(':')
+            if len(grp) > 1:
+                # we're dealing with a Cross Post
+                try:
+                    entry['xgroups'][grp[0]] = int(grp[1])
+                except ValueError:
+                    # This happens from time to time when a group
+                    # doesn't have it's cross-group identifier
+                    # identified
+                    entry['xgroups'][grp[0]] = 0
+            else:
+                entry['group'] = grp[0]
+
+        return entry
+
+
     def decode(self, stream):
         """ Decode the group content
         """
 
+        # The entries (and the number of bytes they were decoded from) that
+        # still have to be passed through our filters
+        entries = []
+
         # We need to parse the content until we either reach
         # the end of the file or get to an 'end' tag
         while self.decode_loop():
@@ -210,52 +637,21 @@ class CodecArticleIndex(CodecBase):
             if entry is None:
                 continue
 
-            # A key we'll use hash into our btree with.
-            # This grouping will allow us to destroy content
-            # as it is processed as well as the handling of content
-            # together
-            if self.sort == XoverGrouping.BY_POSTER_TIME:
-                key = '%s:%s:%.10d' % (
-                    entry['poster'],
-                    entry['date'].strftime('%Y%m%d%H%M%S'),
-                    entry['article_no'],
-                )
-
-            elif self.sort == XoverGrouping.BY_TIME:
-                key = '%s:%.10d' % (
-                    entry['date'].strftime('%Y%m%d%H%M%S'),
-                    entry['article_no'],
-                )
-
-            else: # XoverGrouping.BY_ARTICLE_NO
-                key = '%.10d' % entry['article_no']
-
-            # Check to see if we've added filters
-            if self.filters:
-                # First Apply our scores
-                entry['score'] += sum(
-                    [ f.score(**entry) for f in self.filters ],
-                )
-
-                # Scan our whitelist(s) and break on our first match
-                if not next((True for f in self.filters \
-                             if f.whitelist(**entry) == True), False):
+            entries.append((entry, len(data)))
 
-                    # Scan our blacklist(s) and break on our first
-                    # match
-                    if next((True for f in self.filters \
-                            if f.blacklist(**entry) == True), False):
+        if self.filters:
+            # Score our entries and drop the ones on our blacklist(s) (unless
+            # they're on one of our whitelists) all in one go
+            kept = set(id(e) for e in apply_filters(
+                self.filters, [e for e, _ in entries]))
 
-                        # Skip entries matched on our blacklist
-                        continue
+            entries = [(e, size) for e, size in entries if id(e) in kept]
 
-            self.decoded.content[key] = entry
-            #logger.debug('len=%d' % NNTP_XOVER_RESPONSE_RE.groups)
-            #for x in range(1, NNTP_XOVER_RESPONSE_RE.groups):
-            #    logger.debug('  %d=%s' % (x, str(result.group(x))))
+        for entry, size in entries:
+            self.decoded.content.add(entry)
 
             # Track the number of bytes decoded
-            self._decoded += len(data)
+            self._decoded += size
 
         # Line Tracking
         self._lines = len(self.decoded.content)
@@ -282,8 +678,8 @@ class CodecArticleIndex(CodecBase):
         # Our Meta Content
         self.decoded = NNTPMetaContent(work_dir=self.work_dir)
 
-        # Switch our decoded subvalue to be a sorteddict()
-        self.decoded.content = sorteddict()
+        # Switch our decoded subvalue to be an ArticleIndexBatch()
+        self.decoded.content = ArticleIndexBatch(sort=self.sort)
 
 
     def __str__(self):
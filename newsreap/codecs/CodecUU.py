@@ -264,14 +264,14 @@ class CodecUU(CodecBase):
 
                 if 'end' in self._meta:
                     # Mark the binary as being valid
-                    self.decoded._is_valid = True
+                    self.decoded.set_valid()
 
                     # We're done!
                     break
 
                 elif EOM in self._meta:
                     # Mark the binary as being valid
-                    self.decoded._is_valid = True
+                    self.decoded.set_valid()
 
                     # But keep going because we'll probably get an 'end' next
                     continue
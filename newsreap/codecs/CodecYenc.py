@@ -15,13 +15,18 @@
 # GNU Lesser General Public License for more details.
 
 import re
+from zlib import crc32
 from os.path import basename
+from os.path import isdir
+from os.path import join
 
 from newsreap.NNTPContent import NNTPContent
+from newsreap.NNTPContent import NNTPFileMode
 from newsreap.NNTPBinaryContent import NNTPBinaryContent
 from newsreap.NNTPAsciiContent import NNTPAsciiContent
 from newsreap.Utils import SEEK_SET
 from newsreap.Utils import SEEK_END
+from newsreap.Utils import mkdir
 
 from newsreap.codecs.CodecBase import BIN_MASK
 from newsreap.codecs.CodecBase import E_ERROR
@@ -127,50 +132,44 @@ except ImportError:
     # be writting in python (a much slower solution)
     FAST_YENC_SUPPORT = False
 
-    # A Translation Map
-    YENC42 = ''.join(map(lambda x: chr((x-42) & 255), range(256)))
-
-    YENC_DECODE_SPECIAL_MAP = dict([('=%s' % chr(k+64), chr(k)) for k in (
-        # Non-Printable
-        ord('\0'), ord('\r'), ord('\n'),  ord(' '), ord('\t'),
-
-        # Printable
-        ord('.'), ord('='),
-    )] + [
-        # Ignore Types (we simply ignore these types if they are found)
-        ('\r', ''), ('\n', ''),
-    ])
-
-    # A map used for encoding content
-    YENC_ENCODE_ESCAPED_CHARACTERS = (
-        ord('\0'), ord('\r'), ord('\n'), ord('='),
-        # Whitespace only has to be escaped if it's the first element
-        # in a row (or the last). At this time manual encoding escapes
-        # everything because it's easier to code that way (but results
-        # in a larger encoded file then it has to be).
-        # TODO: Update the manual step to only escape spaces and/or
-        # tabs if they're the first/or last entry in a row
-        ord(' '), ord('\t'),
-
-        # Dot's only have to be escaped if they start a line
-        # similar to the above comment, the manual code currently escapes
-        # all dots. TODO: Fix this to only escape the first dot if present
-        ord('.'),
-    )
+# Translation Maps used when the yEnc libraries aren't available; our
+# content is translated a whole buffer at a time using these
+YENC42 = ''.join(map(lambda x: chr((x-42) & 255), range(256)))
+YENC_ENCODE42 = ''.join(map(lambda x: chr((x+42) & 255), range(256)))
+YENC_UNESCAPE64 = ''.join(map(lambda x: chr((x-64) & 255), range(256)))
 
-    # Compile our map into a decode table
-    YENC_DECODE_SPECIAL_RE = re.compile(
-        r'(' + r'|'.join(YENC_DECODE_SPECIAL_MAP.keys()) + r')',
-    )
+# Once encoded, these characters must always be escaped. The escape
+# character itself must always be handled first.
+YENC_ENCODE_ESCAPED_CHARACTERS = (
+    ('=', '=}'), ('\0', '=@'), ('\r', '=M'), ('\n', '=J'),
+)
+
+# Whitespace only has to be escaped if it's the first or last character
+# on a line, and dots only need to be escaped if they start one.
+YENC_ENCODE_ESCAPED_HEAD = ' \t.'
+YENC_ENCODE_ESCAPED_TAIL = ' \t'
 
 
 class CodecYenc(CodecBase):
 
+    # Set to False to force our (slower) Python implementation to be used
+    # even if the yEnc libraries are available
+    FAST_YENC_SUPPORT = FAST_YENC_SUPPORT
+
     def __init__(self, descriptor=None, work_dir=None,
-                 linelen=128, *args, **kwargs):
+                 linelen=128, assembly_dir=None, *args, **kwargs):
+        """
+        If an assembly_dir is specified, then each part of a multi-part
+        file is decoded straight into a file of the same name within it (at
+        the offset identified by it's =ypart begin=) rather then into a
+        temporary file of it's own; see NNTPSegmentedPost.place().
+        """
         super(CodecYenc, self).__init__(
                 descriptor=descriptor, work_dir=work_dir, *args, **kwargs)
 
+        # The directory our parts are assembled in (if any)
+        self.assembly_dir = assembly_dir
+
         # Used for internal meta tracking when using the decode()
         self._meta = {}
 
@@ -275,8 +274,9 @@ class CodecYenc(CodecBase):
         if not content.open():
             return None
 
-        # Prepare our result set
-        results = ""
+        # The last (partial) line we've encoded so far; everything else is
+        # written as soon as it's encoded
+        tail = ''
 
         # Column is used for decoding
         column = 0
@@ -291,11 +291,9 @@ class CodecYenc(CodecBase):
                 # We're done
                 break
 
-            if FAST_YENC_SUPPORT:
+            if self.FAST_YENC_SUPPORT:
                 try:
-                    _results, crc, column = encode_string(data, crc, column)
-                    # Append our parsed content onto our ongoing buffer
-                    results += _results
+                    results, crc, column = encode_string(data, crc, column)
 
                 except YencError as e:
                     logger.error("Failed to encode Yenc for %s." % content)
@@ -303,65 +301,34 @@ class CodecYenc(CodecBase):
                     return None
 
             else:
-                # The slow and painful way, the below looks complicated
-                # but it really isn't at the the end of the day; yEnc is
-                # pretty basic;
-                #  - first we translate the all of the characters by adding
-                #    42 to their value with the exception of a few special
-                #    characters that are explicitly reserved for the yEnc
-                #    language (and conflict with the NNTP Server language).
-                #
-                #  - next, we need to apply our ENCODE_SPECIAL_MAP to be
-                #    sure to handle the characters that are reserved as
-                #    special keywords used by both NNTP Servers and the yEnc
-                #    protocol itself.
-                #
-                #  - finally we want to prevent our string from going on for
-                #    to many characters (horizontally).  So we need to split
-                #    our content up
-                #
-
-                idx = 0
-                while idx < len(data):
-                    _byte = (ord(data[idx]) + 42) & 0xff
-                    if _byte in YENC_ENCODE_ESCAPED_CHARACTERS:
-                        _byte = (_byte + 64) & 0xff
-                        # Esape Sequence
-                        results += '='
-
-                    # Store our character
-                    results += chr(_byte)
-
-                    # Increment Index
-                    idx += 1
-
-            # Our offset
-            offset = 0
-
-            while offset < (len(results)-self.linelen+1):
-                eol = offset+self.linelen
-                if results[offset:eol][-1] == '=':
-                    # Lines can't end with the escape sequence (=). If we get
-                    # here then this one did. We just adjust our end-of-line
-                    # by 1 and keep moving
-                    eol -= 1
-
-                _encoded.write(results[offset:eol] + EOL)
-                offset = eol
+                # Use our (slower) Python implementation
+                results, column = self._encode_block(data, column)
+
+            # Our encoded results are already split into lines; the last
+            # one is continued by the next block we encode
+            eol = results.rfind(EOL)
+            if eol < 0:
+                tail += results
+                continue
 
-            if offset < len(results):
-                results = results[-(len(results) - offset):]
+            eol += len(EOL)
+            if tail:
+                _encoded.write(tail)
 
-            else:
-                # reset string
-                results = ''
+            # Write our complete lines without making a copy of them
+            _encoded.write(buffer(results, 0, eol))
+            tail = results[eol:]
 
         # We're done reading our data
         content.close()
 
-        if len(results):
+        if tail:
             # We still have content left in our buffer
-            _encoded.write(results + EOL)
+            if tail[-1] in YENC_ENCODE_ESCAPED_TAIL and tail[-2:-1] != '=':
+                # Whitespace can't end our last line either
+                tail = '%s=%s' % (tail[:-1], chr((ord(tail[-1]) + 64) & 255))
+
+            _encoded.write(tail + EOL)
 
         # Write footer
         _encoded.write(fmt_yend + EOL)
@@ -436,6 +403,36 @@ class CodecYenc(CodecBase):
             # fall_back ptr
             ptr = stream.tell()
 
+            if len(set(('begin', 'part')) - set(self._meta)) < 2:
+                # We're within our binary content; decode everything up to
+                # our next yEnc keyword line in one pass
+                data = self._read_block(stream)
+                if data:
+                    # Line Tracking
+                    lines = data.count('\n')
+                    self._lines += lines
+                    self._total_lines += lines
+
+                    decoded = self._decode_block(data)
+
+                    # Track the number of bytes decoded
+                    self._decoded += len(decoded)
+
+                    # Write data to out stream
+                    self.decoded.write(decoded)
+
+                    if self._max_bytes > 0 and \
+                            self._decoded >= self._max_bytes:
+                        # If we specified a limit and hit it then we're done
+                        # at this point. Before we do so; advance to the end
+                        # of our stream
+                        stream.seek(0, SEEK_END)
+
+                        # We're done
+                        break
+
+                    continue
+
             # Read in our data
             data = stream.readline()
             if not data:
@@ -474,7 +471,7 @@ class CodecYenc(CodecBase):
 
                 if 'end' in self._meta:
                     # Mark the binary as being valid
-                    self.decoded._is_valid = True
+                    self.decoded.set_valid()
 
                     # We're done!
                     break
@@ -492,10 +489,18 @@ class CodecYenc(CodecBase):
                     # Save part no globally if present (for sorting)
                     self._part = _meta.get('part', 1)
 
+                    # The total number of parts (if we know it)
+                    total_parts = _meta.get('total')
+                    if total_parts is not None and total_parts < self._part:
+                        # Ignore bad entries
+                        total_parts = None
+
                     # Create our binary instance
                     self.decoded = NNTPBinaryContent(
                         filepath=_meta['name'],
                         part=self._part,
+                        total_parts=total_parts,
+                        total_size=_meta.get('size'),
                         work_dir=self.work_dir,
                     )
 
@@ -510,8 +515,15 @@ class CodecYenc(CodecBase):
                     # Save part no globally if present (for sorting)
                     self._part = _meta.get('part', self._part)
 
-                    # Update our Binary File if nessisary
-                    self.decoded.part = self._part
+                    if 'begin' in _meta:
+                        # Now that we know where our content belongs in the
+                        # file it makes up; we can decode it there
+                        self.decoded = self._part_content(
+                            self._meta['begin'], _meta)
+
+                    else:
+                        # Update our Binary File if nessisary
+                        self.decoded.part = self._part
 
                 continue
 
@@ -520,42 +532,7 @@ class CodecYenc(CodecBase):
                 # keep going until we find it
                 continue
 
-            if FAST_YENC_SUPPORT:
-                try:
-                    decoded, self._crc, self._escape = \
-                        decode_string(data, self._crc, self._escape)
-
-                except YencError:
-                    logger.warning(
-                        "Yenc corruption detected on line %d." %
-                        self._lines,
-                    )
-
-                    # Line Tracking
-                    self._lines += 1
-
-                    # keep storing our data
-                    continue
-
-            else:
-                # The slow and painful way, the below looks complicated
-                # but it really isn't at the the end of the day; yEnc is
-                # pretty basic;
-                #  - first we need to translate the special keyword tokens
-                #    that are used by the yEnc language. We also want to
-                #    ignore any trailing white space or new lines. This
-                #    occurs by applying our DECODE_SPECIAL_MAP to the line
-                #    being processed.
-                #
-                #  - finally we translate the remaining characters by taking
-                #    away 42 from their value.
-                #
-                decoded = YENC_DECODE_SPECIAL_RE.sub(
-                    lambda x: YENC_DECODE_SPECIAL_MAP[x.group()], data,
-                ).translate(YENC42)
-
-                # CRC Calculations
-                self._calc_crc(decoded)
+            decoded = self._decode_block(data)
 
             # Line Tracking
             self._lines += 1
@@ -588,6 +565,207 @@ class CodecYenc(CodecBase):
         # Return what we do have
         return self.decoded
 
+    def _part_content(self, ybegin, ypart):
+        """
+        Returns the NNTPBinaryContent object the part identified by the
+        =ybegin and =ypart details specified is decoded into.
+
+        If we have an assembly_dir, then this is the file our part makes up
+        (allocated to it's full size) ready to write at our part's offset.
+        Otherwise our part is decoded into a temporary file of it's own.
+
+        """
+        # yEnc offsets start at 1
+        begin = max(0, ypart['begin'] - 1)
+
+        # The total number of parts (if we know it)
+        total_parts = ybegin.get('total')
+        if total_parts is not None and total_parts < self._part:
+            # Ignore bad entries
+            total_parts = None
+
+        kwargs = {
+            'part': self._part,
+            'total_parts': total_parts,
+            'begin': begin,
+            'end': ypart.get('end'),
+            'total_size': ybegin.get('size'),
+            'work_dir': self.work_dir,
+        }
+
+        if not self.assembly_dir or self._max_bytes > 0 or \
+                not ybegin.get('size'):
+            # Use a file of our own
+            return NNTPBinaryContent(filepath=ybegin['name'], **kwargs)
+
+        path = join(self.assembly_dir, ybegin['name'])
+        try:
+            if not isdir(self.assembly_dir):
+                mkdir(self.assembly_dir)
+
+            # Create our file (leaving any parts already in it alone)
+            open(path, 'ab').close()
+
+        except (IOError, OSError) as e:
+            logger.debug('Could not create %s (%s)' % (path, str(e)))
+            return NNTPBinaryContent(filepath=ybegin['name'], **kwargs)
+
+        content = NNTPBinaryContent(filepath=path, **kwargs)
+        if len(content) < ybegin['size'] and \
+                not content.preallocate(ybegin['size']):
+            return NNTPBinaryContent(filepath=ybegin['name'], **kwargs)
+
+        if not content.open(mode=NNTPFileMode.BINARY_RW, eof=False):
+            return NNTPBinaryContent(filepath=ybegin['name'], **kwargs)
+
+        # Our content is written at our part's offset
+        content.stream.seek(begin, SEEK_SET)
+
+        # Our part isn't valid until we reach it's end
+        content.set_valid(False)
+
+        return content
+
+    def _read_block(self, stream):
+        """
+        Reads a block of binary content from the stream up until the next
+        yEnc keyword line (which is left in the stream). The block always
+        ends on a line boundary.
+
+        If max_bytes was specified, we read no further then the line that
+        satisfies it.
+
+        """
+        ptr = stream.tell()
+
+        # Read in a block of data (completing the last line in it)
+        data = stream.read(DEFAULT_BUFFER_SIZE)
+        if data and data[-1] != '\n':
+            data += stream.readline()
+
+        if data.startswith('=y'):
+            # Our keyword line is up next
+            data = ''
+
+        else:
+            # Don't read past our next keyword line
+            index = data.find('\n=y')
+            if index >= 0:
+                data = data[:index + 1]
+
+            if self._max_bytes > 0:
+                # Our encoded content is never smaller then what it decodes
+                # to; so we only need to read this much (rounded up to the
+                # end of the line it's on)
+                index = data.find(
+                    '\n', max(0, self._max_bytes - self._decoded - 1))
+                if index >= 0:
+                    data = data[:index + 1]
+
+        # Adjust our pointer
+        stream.seek(ptr + len(data), SEEK_SET)
+        return data
+
+    def _decode_block(self, data):
+        """
+        Decodes the yEnc data passed in (which can span several lines)
+        updating our CRC as we go.
+        """
+        if self.FAST_YENC_SUPPORT:
+            try:
+                decoded, self._crc, self._escape = \
+                    decode_string(data, self._crc, self._escape)
+
+            except YencError:
+                if data.count('\n') > 1:
+                    # Decode each line on it's own so we only lose the
+                    # one(s) that are corrupted
+                    return ''.join(
+                        self._decode_block(line)
+                        for line in data.splitlines(True))
+
+                logger.warning(
+                    "Yenc corruption detected on line %d." %
+                    self._lines,
+                )
+
+                # keep storing our data
+                return ''
+
+        else:
+            # The python way; yEnc is pretty basic:
+            #  - first we strip our line endings and split our content on
+            #    the escape character (=). Every chunk after the first
+            #    starts with an escaped character that we take 64 away from.
+            #
+            #  - finally we translate all of the characters by taking
+            #    away 42 from their value.
+            #
+            chunks = data.translate(None, '\r\n').split('=')
+            decoded = (chunks[0] + ''.join(
+                c[:1].translate(YENC_UNESCAPE64) + c[1:]
+                for c in chunks[1:])).translate(YENC42)
+
+            # CRC Calculations (tracked the same way the yEnc libraries
+            # do so we can switch between the two)
+            self._crc = (crc32(decoded, self._crc ^ BIN_MASK) & BIN_MASK) \
+                ^ BIN_MASK
+
+        return decoded
+
+    def _encode_block(self, data, column=0):
+        """
+        Our Python equivalent of the yEnc libraries encode_string(). It
+        returns the encoded data (with line endings inserted every linelen
+        characters) along with the column our last line was left at so
+        that we can carry on from there on our next call.
+
+        Rather then working a byte at a time, our characters are translated
+        and escaped a whole buffer at a time; we only visit each line to
+        escape the characters that are just reserved at the start (or end)
+        of a line.
+        """
+        # Translate all of our characters by adding 42 to their value and
+        # then escape the ones that are always reserved
+        data = data.translate(YENC_ENCODE42)
+        for char, escaped in YENC_ENCODE_ESCAPED_CHARACTERS:
+            data = data.replace(char, escaped)
+
+        results = []
+        length = len(data)
+        ptr = 0
+
+        while ptr < length:
+            head = ''
+            if column == 0 and data[ptr] in YENC_ENCODE_ESCAPED_HEAD:
+                # Escape the character starting our line
+                head = '=%s' % chr((ord(data[ptr]) + 64) & 255)
+                column = 2
+                ptr += 1
+
+            eol = ptr + self.linelen - column
+            if eol > length:
+                # We're out of data; track where we left off
+                results.append(head + data[ptr:])
+                column += length - ptr
+                break
+
+            tail = ''
+            if data[eol - 1] == '=':
+                # Lines can't split an escape sequence
+                eol += 1
+
+            elif data[eol - 1] in YENC_ENCODE_ESCAPED_TAIL:
+                # Escape the character ending our line
+                tail = '=%s' % chr((ord(data[eol - 1]) + 64) & 255)
+                eol -= 1
+
+            results.append(head + data[ptr:eol] + tail + EOL)
+            column = 0
+            ptr = eol + (1 if tail else 0)
+
+        return ''.join(results), column
+
     def reset(self):
         """
         Reset our decoded content
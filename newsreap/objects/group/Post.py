@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+#  A Post (collection of files) assembled from the Articles in a group
+#
+# Copyright (C) 2017 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+
+from sqlalchemy import Column
+from sqlalchemy import Integer
+from sqlalchemy import String
+from sqlalchemy import Boolean
+from sqlalchemy import DateTime
+
+from .ObjectBase import ObjectBase
+
+
+class Post(ObjectBase):
+    """
+    A Post class contains a mapping of one logical post; all of the
+    articles posted by the same poster under the same description are
+    collated into it (see Segment).
+    """
+
+    __tablename__ = 'post'
+
+    # A hash of our poster and (normalized) description
+    key = Column(String(40), primary_key=True)
+
+    # Post Poster
+    poster = Column(String(128), nullable=False, index=True)
+
+    # Post Description
+    subject = Column(String(256), nullable=False, index=True)
+
+    # The number of files the poster told us to expect (the [x/y] in the
+    # subject); this is zero (0) if we weren't told
+    count = Column(Integer, default=0, nullable=False)
+
+    # The number of files we've found
+    files = Column(Integer, default=0, nullable=False)
+
+    # The number of segments we've found
+    segments = Column(Integer, default=0, nullable=False)
+
+    # The number of segments expected (for the files we've found)
+    total = Column(Integer, default=0, nullable=False)
+
+    # The size of all of our segments
+    size = Column(Integer, default=0, nullable=False)
+
+    # The date of the oldest segment
+    posted_date = Column(DateTime, index=True)
+
+    # Set when we have every segment of every file expected
+    complete = Column(Boolean, default=False, nullable=False, index=True)
+
+    # The last time segments were added to our post
+    updated = Column(DateTime, index=True)
+
+    # The last time our post was written (as an NZB-File); this is cleared
+    # if more segments are added to it
+    written = Column(DateTime, index=True)
+
+    def __init__(self, *args, **kwargs):
+        super(Post, self).__init__(*args, **kwargs)
+
+    def __repr__(self):
+        return "<Post(key=%s, subject='%s')>" % (self.key, self.subject)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+#
+#  A Segment (Article) of a file within a Post
+#
+# Copyright (C) 2017 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+
+from sqlalchemy import Column
+from sqlalchemy import Integer
+from sqlalchemy import String
+from sqlalchemy import DateTime
+from sqlalchemy import UniqueConstraint
+
+from .ObjectBase import ObjectBase
+
+
+class Segment(ObjectBase):
+    """
+    A Segment class contains a mapping of one Article to the part of the
+    file (within a Post) it holds.
+    """
+
+    __tablename__ = 'segment'
+
+    # Article (Unique) Message-ID
+    message_id = Column(String(128), primary_key=True)
+
+    # The Post we belong to (our unique constraint indexes it)
+    post_key = Column(String(40), nullable=False)
+
+    # The file we hold a part of
+    filename = Column(String(256), nullable=False)
+
+    # Our part number (the (a/b) in the subject)
+    part = Column(Integer, default=1, nullable=False)
+
+    # The number of parts that make up our file
+    total = Column(Integer, default=1, nullable=False)
+
+    # Article No (unique to usenet server only)
+    article_no = Column(Integer, nullable=False)
+
+    # Article Size
+    size = Column(Integer, default=0, nullable=False)
+
+    # Article Post Date
+    posted_date = Column(DateTime)
+
+    # A part we already have (such as one that was reposted) is ignored
+    __table_args__ = (UniqueConstraint(post_key, filename, part), )
+
+    def __init__(self, *args, **kwargs):
+        super(Segment, self).__init__(*args, **kwargs)
+
+    def __repr__(self):
+        return "<Segment(message_id=%s)>" % (self.message_id)
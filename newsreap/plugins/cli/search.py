@@ -34,9 +34,23 @@ except ImportError:
 from newsreap.objects.group.Article import Article
 from newsreap.objects.nntp.Common import get_groups
 
+import sqlite3
+from heapq import heapify
+from heapq import heappop
+from heapq import heapreplace
+
+from gevent.threadpool import ThreadPool
+
+from sqlalchemy import and_
+from sqlalchemy import func
 from sqlalchemy import not_
+from sqlalchemy import select
+from sqlalchemy import text
+from sqlalchemy import literal_column
+from sqlalchemy.dialects import sqlite
 
-from newsreap.NNTPGroupDatabase import NNTPGroupDatabase
+from newsreap.NNTPGroupDatabase import ARTICLE_SEARCH_CHECK_SQL
+from newsreap.NNTPGroupDatabase import ARTICLE_SEARCH_TRIGGERS
 from newsreap.NNTPSettings import SQLITE_DATABASE_EXTENSION
 
 # initialize our logger
@@ -48,6 +62,15 @@ NEWSREAP_CLI_PLUGINS = {
     'search': 'search',
 }
 
+# The number of articles listed by default
+SEARCH_LIMIT = 100
+
+# The number of groups searched at the same time by default
+SEARCH_JOBS = 4
+
+# The number of rows fetched from each group at a time
+SEARCH_CHUNK_SIZE = 500
+
 
 class SearchOperation(object):
     """
@@ -87,7 +110,7 @@ def parse_search_keyword(keywords):
     If there is a problem then (None, None, None) is returned
     """
 
-    _parse = re.compile(r'(?P<cat>%[sp])?^(?P<op>\+|\-)?(?P<key>.+)$')
+    _parse = re.compile(r'^(?P<cat>%[sp])?(?P<op>\+|\-)?(?P<key>.+)$')
 
     response = []
     for keyword in keywords:
@@ -106,7 +129,7 @@ def parse_search_keyword(keywords):
             _op = SearchOperation.EXCLUDE
 
         # Category
-        if result.group('cat') == 'p':
+        if result.group('cat') == '%p':
             _cat = SearchCategory.POSTER
         else:
             _cat = SearchCategory.SUBJECT
@@ -116,6 +139,260 @@ def parse_search_keyword(keywords):
     return response
 
 
+def search_match(keywords):
+    """
+    Takes the list of keywords returned by parse_search_keyword() and
+    returns the full-text (FTS5) MATCH expression that finds the articles
+    they could match.
+
+    Our index is built on trigrams so only the parts of a keyword that are
+    at least 3 characters long can be looked up with it; anything else
+    (along with the LIKE wildcards % and _) is left to our LIKE filters
+    which are always applied to the articles matched.
+
+    None is returned if there is nothing we can look up with our index.
+
+    """
+    _split = re.compile(r'[%_]+')
+
+    include = []
+    exclude = []
+    for _op, _cat, keyword in keywords:
+        column = 'poster' if _cat == SearchCategory.POSTER else 'subject'
+
+        if _op == SearchOperation.INCLUDE:
+            # Every part of our keyword must exist somewhere in our column
+            include.extend(['%s : "%s"' % (column, k.replace('"', '""'))
+                            for k in _split.split(keyword) if len(k) >= 3])
+
+        elif len(keyword) >= 3 and not _split.search(keyword) and \
+                all(ord(c) < 128 for c in keyword):
+            # Only an exact keyword can be excluded; our index ignores
+            # case the same way LIKE does but only for ASCII characters
+            exclude.append('%s : "%s"' % (
+                column, keyword.replace('"', '""')))
+
+    if not include:
+        # An expression can't be made up of exclusions alone
+        return None
+
+    return ' '.join(['(%s)' % ' AND '.join(include)] +
+                    ['NOT %s' % k for k in exclude])
+
+
+def search_filters(keywords, case_insensitive=False):
+    """
+    Takes the list of keywords returned by parse_search_keyword() and
+    returns the list of (LIKE) filters an article must match.
+
+    """
+    filters = []
+    for _op, _cat, keyword in keywords:
+        column = Article.poster \
+            if _cat == SearchCategory.POSTER else Article.subject
+
+        if case_insensitive:
+            _filter = column.ilike('%%%s%%' % keyword)
+
+        else:
+            _filter = column.like('%%%s%%' % keyword)
+
+        logger.debug('Scanning -%s- (case-%ssensitive) %s: "%s"' % (
+            'and' if _op == SearchOperation.INCLUDE else 'and not',
+            'in' if case_insensitive else '', column.name, keyword))
+
+        filters.append(
+            _filter if _op == SearchOperation.INCLUDE else not_(_filter))
+
+    return filters
+
+
+def search_statement(filters, match=None, after=None, limit=0):
+    """
+    Returns the (sql, params) of the SQLite statement that returns the
+    articles matching our filters in the order they're listed in:
+        (score, posted_date, message_id, article_no, subject)
+
+    Articles are ordered by their score, then their date (and then their
+    message-id so that no two share the same spot); highest first.  If
+    after is specified, only the articles listed after it are returned.
+    It's a tuple of the (score, posted_date, message_id) of the last
+    article seen.
+
+    If match is specified, then our full-text index narrows down the
+    articles our filters are applied to.
+
+    """
+    # NULL dates are listed last
+    posted_date = func.coalesce(Article.posted_date, literal_column("''"))
+
+    filters = list(filters)
+    if match:
+        filters.append(text(
+            'article.rowid IN (SELECT rowid FROM article_search '
+            'WHERE article_search MATCH :match)').bindparams(match=match))
+
+    if after:
+        filters.append(text(
+            "(article.score, coalesce(article.posted_date, ''), "
+            "article.message_id) < (:score, :posted_date, :message_id)")
+            .bindparams(score=after[0], posted_date=after[1],
+                        message_id=after[2]))
+
+    statement = select([
+        Article.score, posted_date, Article.message_id,
+        Article.article_no, Article.subject])\
+        .where(and_(*filters))\
+        .order_by(Article.score.desc(), posted_date.desc(),
+                  Article.message_id.desc())
+
+    if limit > 0:
+        statement = statement.limit(limit)
+
+    compiled = statement.compile(dialect=sqlite.dialect())
+    return compiled.string, [compiled.params[k] for k in compiled.positiontup]
+
+
+def search_rows(pool, path, statements, chunk_size=SEARCH_CHUNK_SIZE):
+    """
+    Queries the group database specified (within a thread of our pool) and
+    returns a generator of the rows retrieved.
+
+    Statements is a tuple of the (sql, params) to use if our database has
+    a full-text index and the (sql, params) to use if it doesn't.
+
+    The query is started right away (so several of them can run at the
+    same time) and the next chunk_size rows are always fetched while the
+    last ones are being handled.
+
+    """
+    def _query():
+        db = sqlite3.connect(path, check_same_thread=False)
+        try:
+            has_index = db.execute(ARTICLE_SEARCH_CHECK_SQL).fetchone()[0] \
+                == len(ARTICLE_SEARCH_TRIGGERS) + 1
+
+            if not has_index:
+                logger.debug('No search index in %s.' % path)
+
+            return db, db.execute(*statements[0 if has_index else 1])
+
+        except sqlite3.Error:
+            db.close()
+            raise
+
+    result = pool.spawn(_query)
+
+    def _rows():
+        try:
+            db, cursor = result.get()
+
+        except sqlite3.Error as e:
+            logger.warning('Could not search %s.' % path)
+            logger.debug('Search exception: %s' % str(e))
+            return
+
+        fetch = pool.spawn(cursor.fetchmany, chunk_size)
+        try:
+            while True:
+                rows = fetch.get()
+                if not rows:
+                    break
+
+                # Get our next rows while we deal with these ones
+                fetch = pool.spawn(cursor.fetchmany, chunk_size)
+                for row in rows:
+                    yield row
+
+        except sqlite3.Error as e:
+            logger.warning('Could not search %s.' % path)
+            logger.debug('Search exception: %s' % str(e))
+
+        finally:
+            # Our connection can't be closed while it's still in use
+            fetch.wait()
+            db.close()
+
+    return _rows()
+
+
+class SearchOrder(object):
+    """
+    Orders our search results from highest to lowest.
+    """
+    __slots__ = ('key', )
+
+    def __init__(self, row):
+        # Our (score, posted_date, message_id)
+        self.key = row[:3]
+
+    def __lt__(self, other):
+        return self.key > other.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+def merge_rows(streams):
+    """
+    Takes a dictionary of generators (each returning their rows in order)
+    and merges them into a single generator of (key, row) tuples in the
+    same order.  Rows are returned as soon as we know nothing comes before
+    them.
+
+    An article cross-posted to several of our groups is only returned once.
+
+    """
+    heap = []
+    for key, stream in streams.iteritems():
+        row = next(stream, None)
+        if row is not None:
+            heap.append((SearchOrder(row), key, row, stream))
+
+    heapify(heap)
+
+    # Track the articles returned
+    seen = set()
+
+    while heap:
+        order, key, row, stream = heap[0]
+
+        if row[2] not in seen:
+            seen.add(row[2])
+            yield (key, row)
+
+        row = next(stream, None)
+        if row is None:
+            heappop(heap)
+
+        else:
+            heapreplace(heap, (SearchOrder(row), key, row, stream))
+
+
+def search_cursor(row):
+    """
+    Returns the cursor (used with --after) that lists the articles that come
+    after the row specified.
+    """
+    return '%d,%s,%s' % (row[0], row[1].replace(' ', 'T'), row[2])
+
+
+def parse_search_cursor(cursor):
+    """
+    Takes a cursor returned by search_cursor() and returns it's
+    (score, posted_date, message_id) tuple.
+
+    None is returned if the cursor is not valid.
+
+    """
+    try:
+        score, posted_date, message_id = cursor.split(',', 2)
+        return (int(score), posted_date.replace('T', ' '), message_id)
+
+    except (AttributeError, ValueError):
+        return None
+
+
 # If we make the function name the same as the prefix identified above.
 # Instead we make it an option/action of it's own.
 @click.command(name='search')
@@ -124,11 +401,23 @@ def parse_search_keyword(keywords):
 @click.option('--minscore', '-A', default=0, type=int)
 @click.option('--maxscore', '-B', default=9999, type=int)
 @click.option('--case-insensitive', '-i', is_flag=True)
+@click.option('--limit', '-n', default=SEARCH_LIMIT, type=int,
+              help='The number of articles to list (0 lists them all).')
+@click.option('--after', '-a',
+              help='Only list the articles after the cursor specified.')
+@click.option('--jobs', '-j', default=SEARCH_JOBS, type=int,
+              help='The number of groups to search at the same time.')
 @click.pass_obj
-def search(ctx, group, keywords, minscore, maxscore, case_insensitive):
+def search(ctx, group, keywords, minscore, maxscore, case_insensitive,
+           limit, after, jobs):
     """
     Searches cached groups for articles.
 
+    When searching an alias, all of it's groups are searched at the same
+    time and the best matches (by score and then date) are listed first.
+    If there are more articles then the limit allows for, a cursor is
+    displayed that lists the ones that follow when passed into --after.
+
     Specified keywords stack on one another.  Each keyword specified must
     match somewhere in the subject line or else the result is filtered.
 
@@ -197,8 +486,44 @@ def search(ctx, group, keywords, minscore, maxscore, case_insensitive):
         logger.error("You must specify a group/alias.")
         exit(1)
 
-    for name, _id in groups.iteritems():
-        db_path = join(ctx['NNTPSettings'].cfg_path, 'cache', 'search')
+    if after is not None:
+        after = parse_search_cursor(after)
+        if after is None:
+            logger.error("An invalid cursor was specified.")
+            exit(1)
+
+    # Parse our keywords
+    parsed_keywords = parse_search_keyword(keywords)
+
+    # Our filters
+    filters = search_filters(parsed_keywords, case_insensitive)
+
+    # Handle Scores
+    if maxscore == minscore:
+        logger.debug('Scanning -score == %d-' % (maxscore))
+        filters.append(Article.score == maxscore)
+
+    else:
+        logger.debug(
+            'Scanning -score >= %d and score <= %d-' % (
+                minscore, maxscore))
+        filters.extend([Article.score <= maxscore, Article.score >= minscore])
+
+    # Prepare our full-text search (if we can use one)
+    match = search_match(parsed_keywords)
+
+    # Each group returns one more article then we need so we know if there
+    # are more to list
+    statements = (
+        search_statement(filters, match=match, after=after,
+                         limit=limit + 1 if limit > 0 else 0),
+        search_statement(filters, after=after,
+                         limit=limit + 1 if limit > 0 else 0),
+    )
+
+    db_path = join(ctx['NNTPSettings'].base_dir, 'cache', 'search')
+    paths = {}
+    for name in groups.iterkeys():
         db_file = '%s%s' % (
             join(db_path, name),
             SQLITE_DATABASE_EXTENSION,
@@ -209,97 +534,31 @@ def search(ctx, group, keywords, minscore, maxscore, case_insensitive):
             )
             continue
 
-        engine = 'sqlite:///%s' % db_file
-        db = NNTPGroupDatabase(engine=engine, reset=None)
-        group_session = db.session()
-
-        gt = group_session.query(Article)
-
-        # Parse our keywords
-        parsed_keywords = parse_search_keyword(keywords)
-        for _op, _cat, keyword in parsed_keywords:
-
-            if _cat == SearchCategory.SUBJECT:
-                if _op == SearchOperation.INCLUDE:
-                    if case_insensitive:
-                        logger.debug(
-                            'Scanning -and- (case-insensitive) subject: '
-                            '"%s"' % (keyword))
-                        gt = gt.filter(
-                            Article.subject.ilike('%%%s%%' % keyword))
-                    else:
-                        logger.debug(
-                            'Scanning -and- (case-sensitive) subject: '
-                            '"%s"' % (keyword))
-                        gt = gt.filter(
-                            Article.subject.like('%%%s%%' % keyword))
-                else:
-                    # _op == SearchCategory.EXCLUDE
-                    if case_insensitive:
-                        logger.debug(
-                            'Scanning -not- (case-insensitive) subject: '
-                            '"%s"' % (keyword))
-                        gt = gt.filter(
-                            not_(Article.subject.ilike('%%%s%%' % keyword)))
-                    else:
-                        logger.debug(
-                            'Scanning -and not- (case-sensitive) subject: '
-                            '"%s"' % (keyword))
-                        gt = gt.filter(
-                            not_(Article.subject.like('%%%s%%' % keyword)))
-
-            elif _cat == SearchCategory.POSTER:
-                if _op == SearchOperation.INCLUDE:
-                    if case_insensitive:
-                        logger.debug(
-                            'Scanning -and- (case-insensitive) poster: '
-                            '"%s"' % (keyword))
-                        gt = gt.filter(
-                            Article.poster.ilike('%%%s%%' % keyword))
-                    else:
-                        logger.debug(
-                            'Scanning -and- (case-sensitive) poster: '
-                            '"%s"' % (keyword))
-                        gt = gt.filter(
-                            Article.poster.like('%%%s%%' % keyword))
-
-                else:
-                    # _op == SearchCategory.EXCLUDE
-                    if case_insensitive:
-                        logger.debug(
-                            'Scanning -and not- (case-insensitive) poster: '
-                            '"%s"' % (keyword))
-                        gt = gt.filter(
-                            not_(Article.poster.ilike('%%%s%%' % keyword)))
-                    else:
-                        logger.debug(
-                            'Scanning -and not- (case-sensitive) poster: '
-                            '"%s"' % (keyword))
-                        gt = gt.filter(
-                            not_(Article.poster.like('%%%s%%' % keyword)))
-
-        # Handle Scores
-        if maxscore == minscore:
-            logger.debug('Scanning -score == %d-' % (maxscore))
-            gt = gt.filter(Article.score == maxscore)
+        paths[name] = db_file
 
-        else:
-            logger.debug(
-                'Scanning -score >= %d and score <= %d-' % (
-                    minscore, maxscore))
+    if not paths:
+        return
+
+    # Our groups are all searched at the same time
+    pool = ThreadPool(max(1, min(jobs, len(paths))))
+    streams = dict((name, search_rows(pool, path, statements))
+                   for name, path in paths.iteritems())
 
-            gt = gt.filter(Article.score <= maxscore)\
-                   .filter(Article.score >= minscore)
+    try:
+        last = None
+        for count, (name, row) in enumerate(merge_rows(streams)):
+            if limit > 0 and count >= limit:
+                # There is more to list
+                print("More results: --after %s" % search_cursor(last))
+                break
 
-        gt = gt.order_by(Article.score.desc())
+            print("  [%.5d] %.4d %s: %s" % (row[3], row[0], name, row[4]))
+            last = row
 
-        # Iterate through our list
-        print("%s:" % (name))
-        for entry in gt:
-            print("  [%.5d] %.4d %s" % (
-                entry.article_no, entry.score, entry.subject))
+    finally:
+        for stream in streams.itervalues():
+            stream.close()
 
-        group_session.close()
-        db.close()
+        pool.kill()
 
     return
@@ -21,6 +21,8 @@ import sys
 
 from os.path import join
 from os.path import isdir
+from os.path import isfile
+from os.path import expanduser
 from os.path import exists
 from os.path import dirname
 from os.path import abspath
@@ -35,6 +37,9 @@ from dateutil.parser import parse
 from shutil import copyfile as copy
 from shutil import move
 
+from gevent.pool import Pool
+from gevent.lock import RLock
+
 
 try:
     from newsreap.Logging import NEWSREAP_CLI
@@ -44,22 +49,30 @@ except ImportError:
     from newsreap.Logging import NEWSREAP_CLI
 
 from newsreap.objects.nntp.Group import Group
-from newsreap.objects.nntp.GroupAlias import GroupAlias
 from newsreap.objects.nntp.GroupTrack import GroupTrack
 from newsreap.objects.nntp.Server import Server
 from newsreap.objects.nntp.Common import get_groups
 from newsreap.objects.group.Article import Article
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.exc import InvalidRequestError
-from sqlalchemy.exc import IntegrityError
 
 from newsreap.NNTPConnection import XoverGrouping
 from newsreap.NNTPGroupDatabase import NNTPGroupDatabase
+from newsreap.ArticleIndexWriter import ArticleIndexWriter
+from newsreap.ArticleIndexWriter import SQLITE_DATETIME_FORMAT
+from newsreap.ArticleCollator import ArticleCollator
+from newsreap.NNTPFilterBase import NNTPFilterBase
+from newsreap.NNTPFilterBase import FilterColumn
+from newsreap.NNTPFilterBase import FilterProgram
 from newsreap.NNTPConnection import NNTPConnection
 from newsreap.NNTPSettings import SQLITE_DATABASE_EXTENSION
+from newsreap.NNTPSettings import DEFAULT_PROCESSING_VARIABLES
 
 from newsreap.Utils import mkdir
 
+import sqlite3
+import re
+
 # initialize our logger
 logger = logging.getLogger(NEWSREAP_CLI)
 
@@ -72,6 +85,20 @@ NEWSREAP_CLI_PLUGINS = {
     },
 }
 
+# The number of cached articles read (and rescored) at a time
+RESCORE_CHUNK_SIZE = 100000
+
+# Reads our cached articles a chunk at a time (in the order they're stored)
+ARTICLE_RESCORE_SQL = \
+    'SELECT rowid, subject, poster, size, lines, posted_date, score ' \
+    'FROM article WHERE rowid > ? ORDER BY rowid LIMIT ?'
+
+# Writes back the scores that changed
+ARTICLE_SCORE_SQL = 'UPDATE article SET score = ? WHERE rowid = ?'
+
+# The characters we don't allow in the NZB-Files we name after our posts
+NZB_FILENAME_RE = re.compile(r'[^\w .()\[\]-]+')
+
 
 @click.command(name='groups')
 @click.pass_obj
@@ -150,6 +177,436 @@ def update_groups(ctx):
     return
 
 
+def _fetch_headers(ctx, session, lock, server, name, _id, ramdisk=None,
+                   date_from=None, date_to=None, max_pending=None):
+    """
+    Caches the articles of the group specified into it's own database.
+
+    Several groups can be fetched at the same time (each in their own
+    greenlet); the lock is used to serialize access to our (shared) session
+    and max_pending is the number of XOVER requests this group is allowed
+    to have outstanding at once (it's share of our connections).
+
+    Returns True if the group was fetched, otherwise False is returned.
+
+    """
+    db_path = join(ctx['NNTPSettings'].base_dir, 'cache', 'search')
+    db_file = '%s%s' % (
+        join(db_path, name),
+        SQLITE_DATABASE_EXTENSION,
+    )
+
+    reset = not exists(db_file)
+
+    ram_db_file = None
+    if ramdisk:
+        # Create a ramdisk db
+        ram_db_file = '%s%s' % (
+            join(ramdisk, name),
+            SQLITE_DATABASE_EXTENSION,
+        )
+
+        # Remove the existing file if it's there
+        try:
+            unlink(ram_db_file)
+
+        except OSError:
+            # No problem; the file just doesn't already exist
+            pass
+
+        engine = 'sqlite:///%s' % ram_db_file
+
+        if not reset:
+            # Database exists, and ramdisk exists, and we're not
+            # reseting anything... copy existing database onto
+            # ramdisk for processing
+            logger.debug('Transfering %s database to ramdisk.' % name)
+            copy(db_file, ram_db_file)
+            logger.info('Transfered %s database to ramdisk.' % name)
+    else:
+        engine = 'sqlite:///%s' % db_file
+
+    db = NNTPGroupDatabase(engine=engine, reset=reset)
+    group_session = db.session()
+    if not group_session:
+        logger.warning("The database %s not be accessed." % db_file)
+        return False
+
+    # Keep a full-text index of our articles for searching; it's only
+    # built once and kept up to date from then on
+    db.create_search_index()
+
+    # TODO:
+    # Get current index associated with our primary group so we can
+    # begin fetching from that point.  The index "MUST" but the one
+    # associated with our server hostname. If one doesn't exist; create
+    # it initialized at 0
+    logger.debug('Retrieving information on group %s' % (name))
+    with lock:
+        gt = session.query(GroupTrack)\
+                    .filter(GroupTrack.group_id == _id)\
+                    .filter(GroupTrack.server_id == server.id).first()
+
+    # Our watermarks are refreshed every time around since new articles
+    # keep on arriving. Other groups may be using our connections; so we
+    # queue our request like everything else
+    response = ctx['NNTPManager'].group(name)
+    _, low, high, _ = response if response else (None, None, None, name)
+    if low is None:
+        # Could not set group
+        logger.warning("Could not access group '%s' on '%s'." % (
+            name,
+            server.host,
+        ))
+        group_session.close()
+        return False
+
+    if not gt:
+        # Create a GroupTrack object using the group info
+        gt = GroupTrack(
+            group_id=_id,
+            server_id=server.id,
+            low=low,
+            high=high,
+            scan_pointer=low,
+            index_pointer=low,
+        )
+
+        # Save this right away; another group closing it's database can
+        # reset our (shared) session at any time
+        with lock:
+            session.add(gt)
+            session.commit()
+
+        # starting pointer
+        cur = low + 1
+
+    else:
+        updates = {
+            GroupTrack.low: low,
+            GroupTrack.high: high,
+        }
+
+        if reset:
+            # Our database is gone; start over
+            updates.update({
+                GroupTrack.scan_pointer: low,
+                GroupTrack.index_pointer: low,
+            })
+
+        with lock:
+            # starting pointer
+            cur = (low if reset else gt.scan_pointer) + 1
+
+            session.query(GroupTrack)\
+                .filter(GroupTrack.group_id == _id)\
+                .filter(GroupTrack.server_id == server.id)\
+                .update(updates)
+            session.commit()
+
+    requests = []
+    if date_to:
+        requests.append(
+            ctx['NNTPManager'].seek_by_date(
+                date_to + timedelta(seconds=1), group=name, block=False))
+
+        # Mark our item
+        requests[-1]._watermark = 'high'
+
+    if date_from:
+        requests.append(
+            ctx['NNTPManager'].seek_by_date(
+                date_from, group=name, block=False))
+
+        # Mark our item
+        requests[-1]._watermark = 'low'
+
+    while len(requests):
+        # Wait for requeest to complete
+        requests[-1].wait()
+
+        # we have a request at this point
+        request = requests.pop()
+        if not request:
+            continue
+
+        # Store our watermark so we update the correct entry
+        watermark = request._watermark
+
+        # Retrieve our response
+        response = request.response.pop()
+        if response is None:
+            # We got an error in our response; take an early
+            # exit for now
+            logger.error(
+                'An unhandled server response was received: %s.' % (
+                    response))
+
+        # Store our watermark (high/low)
+        if watermark == 'low':
+            low = response
+            # Store our current pointer at the starting point we found
+            cur = low + 1
+
+        elif watermark == 'high':
+            high = response
+
+    if high <= cur:
+        # Nothing new to fetch
+        group_session.close()
+        return True
+
+    # Drop all indexes; this makes inserts that much faster
+    # TODO: make the header_batch_size a entry in NNTPSettings since it's
+    # so powerful and allows pulling down multiple things at once
+    # Retrieve a list of articles from the database in concurrent blocks
+    # Scan them and place them into the NNTPGroupDatabase()
+    batch_size = ctx['NNTPSettings'].nntp_processing\
+                                    .get('header_batch_size', 5000)
+
+    logger.info('Fetching from %d to %d [%d article(s)]' % (
+                cur, high, (high - cur + 1)))
+
+    # we'll re-add them later
+    for index in Article.__table__.indexes:
+        try:
+            index.drop(bind=db._engine)
+            logger.info('Dropping Article Index "%s"' % index.name)
+
+        except OperationalError:
+            # The index is probably already dropped
+            pass
+
+    def checkpoint(pointer):
+        """
+        Update our marker; it only ever advances over the articles
+        that have been written to our database.
+        """
+        # TODO: Do NOT update the marker if we have a ramdisk; in that
+        #       case it needs to be updated 'after' the batch has
+        #       completed.
+        with lock:
+            session.query(GroupTrack)\
+                .filter(GroupTrack.group_id == _id)\
+                .filter(GroupTrack.server_id == server.id)\
+                .update({
+                    GroupTrack.scan_pointer: pointer,
+                    GroupTrack.last_scan: datetime.now(),
+                })
+
+            # Save this now as it allows for Cntrl-C or aborts
+            # To take place and we'll resume from where we left off
+            session.commit()
+
+    # Our articles are written to our database while we keep on fetching
+    writer = ArticleIndexWriter(
+        ram_db_file if ramdisk else db_file,
+        pointer=cur - 1,
+        on_commit=checkpoint,
+    )
+
+    # Track whether or not we retrieved everything
+    success = True
+
+    # Only a limited number of XOVER requests are ever outstanding (no
+    # matter how many articles we're fetching); their batch size is
+    # adjusted to how quickly our server responds
+    for low, high, response in ctx['NNTPManager'].xover_iter(
+            group=name, start=cur, end=high, batch_size=batch_size,
+            sort=XoverGrouping.BY_ARTICLE_NO, max_pending=max_pending):
+
+        if response is None or not writer.put(low, high, response):
+            # We got an error in our response (or failed to write
+            # our last one); take an early exit for now
+            logger.error(
+                'An unhandled server response was received: %s.' % (
+                    response))
+            success = False
+            break
+
+        logger.debug(
+            'Retrieved (XOVER) batch %d-%d (%d articles).' % (
+                low, high, len(response),
+            ))
+
+    # Wait for everything to be written
+    if not writer.close():
+        logger.error('A database error occured.')
+        group_session.close()
+        return False
+
+    # Recrete all indexes
+    for index in Article.__table__.indexes:
+        try:
+            index.create(bind=db._engine)
+            logger.info('Recreated Article Index "%s"' % index.name)
+        except OperationalError:
+            # The index has probably already been recreated
+            pass
+
+    # Close our database content
+    group_session.close()
+
+    if ramdisk:
+        # Move content back as a .new extension
+        _new_db_file = '%s.new' % db_file
+        # Move existing database to .old extension
+        _old_db_file = '%s.old' % db_file
+        try:
+            unlink('%s.new' % db_file)
+        except OSError:
+            # File doesn't exist; no problem
+            pass
+
+        # TODO: Add try/catch blocks and handle cases where we can't move
+        # our new database in place.
+
+        # Move new database into place
+        logger.debug(
+            'Transfering %s database to local storage.' % (name),
+        )
+        move(ram_db_file, _new_db_file)
+        logger.info(
+            'Transfered %s database to local storage.' % (name),
+        )
+        # Rename existing database to old (for fall back)
+        rename(db_file, _old_db_file)
+        # Place new database into place
+        rename(_new_db_file, db_file)
+        # Safely remove the old database
+        unlink(_old_db_file)
+
+    return success
+
+
+def rescore_articles(path, group, filters, chunk_size=RESCORE_CHUNK_SIZE):
+    """
+    Rescores the articles cached in the (group) database specified against
+    the filters specified.
+
+    Our articles are read a chunk at a time straight from the database and
+    scored a whole chunk at a time; only the scores that changed are
+    written back. The score index is dropped while we work and rebuilt once
+    we're done.
+
+    Cross-posts aren't cached, so the XPOST_COUNT directives always see a
+    count of zero (0).
+
+    Returns a tuple of the number of articles scanned and the number of
+    them that changed, otherwise None is returned if we failed.
+
+    """
+    db = NNTPGroupDatabase(engine='sqlite:///%s' % path)
+    group_session = db.session()
+    if not group_session:
+        logger.warning("The database %s not be accessed." % path)
+        return None
+
+    programs = [f.compile(group) for f in filters]
+
+    # Dates are only converted if something is going to compare them
+    dates = next((True for p in programs if FilterColumn.DATE in p.used),
+                 False)
+
+    # Drop our score index; it's much faster to rebuild it once we're done
+    indexes = [i for i in Article.__table__.indexes if 'score' in i.columns]
+    for index in indexes:
+        try:
+            index.drop(bind=db._engine)
+            logger.info('Dropping Article Index "%s"' % index.name)
+
+        except OperationalError:
+            # The index is probably already dropped
+            pass
+
+    # Get the current time for our timer
+    cur_time = datetime.now()
+
+    count = 0
+    changed = 0
+    pointer = 0
+
+    conn = sqlite3.connect(path)
+    try:
+        # SQLite Speed changes
+        conn.execute('PRAGMA journal_mode = MEMORY')
+        conn.execute('PRAGMA synchronous = OFF')
+
+        while True:
+            chunk = conn.execute(
+                ARTICLE_RESCORE_SQL, (pointer, chunk_size)).fetchall()
+            if not chunk:
+                break
+
+            pointer = chunk[-1][0]
+            count += len(chunk)
+
+            rows = []
+            for _, subject, poster, size, lines, date, _ in chunk:
+                if dates:
+                    try:
+                        date = datetime.strptime(
+                            date, SQLITE_DATETIME_FORMAT)
+
+                    except (TypeError, ValueError):
+                        # Articles we couldn't get a date for
+                        date = datetime.fromtimestamp(0)
+
+                rows.append(FilterProgram.row(
+                    poster, date, subject, size, lines, {}))
+
+            # Score our chunk (all of our articles start at zero)
+            columns = FilterProgram.columns(rows)
+            scores = [0] * len(rows)
+            for program in programs:
+                for n, score in enumerate(
+                        program.score(columns, [None] * len(rows))):
+                    scores[n] += score
+
+            updates = [
+                (score, row[0]) for score, row in zip(scores, chunk)
+                if score != row[-1]]
+
+            if updates:
+                with conn:
+                    conn.executemany(ARTICLE_SCORE_SQL, updates)
+
+                changed += len(updates)
+
+            logger.debug('Rescored %d article(s) [changed=%d].' % (
+                count, changed))
+
+    except sqlite3.Error as e:
+        logger.error('Failed to rescore %s.' % path)
+        logger.debug('Exception: %s' % str(e))
+        return None
+
+    finally:
+        conn.close()
+
+        # Recreate our score index
+        for index in indexes:
+            try:
+                index.create(bind=db._engine)
+                logger.info('Recreated Article Index "%s"' % index.name)
+
+            except OperationalError:
+                # The index has probably already been recreated
+                pass
+
+        group_session.close()
+
+    # Calculate Processing Time
+    delta_time = datetime.now() - cur_time
+    delta_time = (delta_time.days * 86400) + delta_time.seconds \
+        + (delta_time.microseconds / 1e6)
+
+    logger.info('Rescored %d article(s) in %s sec(s) [changed=%d].' % (
+        count, delta_time, changed))
+
+    return count, changed
+
+
 # Define our functions below
 # all functions are prefixed with what is identified
 # above or they are simply ignored.
@@ -158,13 +615,16 @@ def update_groups(ctx):
 @click.option('--date-from', '-f', help='Date From')
 @click.option('--date-to', '-t', help='Date To')
 @click.option('--watched', '-w', is_flag=True, help='All watched groups.')
+@click.option('--jobs', '-j', type=int,
+              help='The number of groups to fetch at the same time.')
 @click.pass_obj
-def update_search(ctx, groups, date_from, date_to, watched):
+def update_search(ctx, groups, date_from, date_to, watched, jobs):
     """
     Cache specified articles.
 
     Articles are cached into their own database due to the sheer size of
-    the content within each group.
+    the content within each group.  Several groups are fetched at the same
+    time (each with an equal share of our connections).
 
     """
     # TODO: Support loading by date ranges (from and to)
@@ -244,8 +704,7 @@ def update_search(ctx, groups, date_from, date_to, watched):
     s = ctx['NNTPSettings'].nntp_servers[0]
     try:
         _server = session.query(Server)\
-            .filter(Server.host == s['host'])\
-            .filter(Server.port == s['port']).first()
+            .filter(Server.host == s['host']).first()
 
     except (InvalidRequestError, OperationalError):
         # Database isn't set up
@@ -271,379 +730,113 @@ def update_search(ctx, groups, date_from, date_to, watched):
         else:
             logger.info('Using ramdisk: %s' % (ramdisk))
 
-    for name, _id in groups.iteritems():
-
-        db_path = join(ctx['NNTPSettings'].cfg_path, 'cache', 'search')
-        db_file = '%s%s' % (
-            join(db_path, name),
-            SQLITE_DATABASE_EXTENSION,
-        )
-        if not isdir(db_path):
-            if not mkdir(db_path):
-                logger.error("Failed to create directory %s" % db_path)
-                exit(1)
-            logger.info("Created directory %s" % db_path)
-
-        if not access(db_path, W_OK):
-            logger.error('The directory "%s" is not accessible.' % db_path)
+    db_path = join(ctx['NNTPSettings'].base_dir, 'cache', 'search')
+    if not isdir(db_path):
+        if not mkdir(db_path):
+            logger.error("Failed to create directory %s" % db_path)
             exit(1)
+        logger.info("Created directory %s" % db_path)
 
-        reset = not exists(db_file)
-
-        ram_db_file = None
-        if ramdisk:
-            # Create a ramdisk db
-            ram_db_file = '%s%s' % (
-                join(ramdisk, name),
-                SQLITE_DATABASE_EXTENSION,
-            )
-
-            # Remove the existing file if it's there
-            try:
-                unlink(ram_db_file)
-
-            except OSError:
-                # No problem; the file just doesn't already exist
-                pass
-
-            engine = 'sqlite:///%s' % ram_db_file
-
-            if not reset:
-                # Database exists, and ramdisk exists, and we're not
-                # reseting anything... copy existing database onto
-                # ramdisk for processing
-                logger.debug('Transfering %s database to ramdisk.' % name)
-                copy(db_file, ram_db_file)
-                logger.info('Transfered %s database to ramdisk.' % name)
-        else:
-            engine = 'sqlite:///%s' % db_file
-
-        db = NNTPGroupDatabase(engine=engine, reset=reset)
-        group_session = db.session()
-        if not group_session:
-            logger.warning("The database %s not be accessed." % db_file)
-            continue
-
-        # TODO:
-        # Get current index associated with our primary group so we can
-        # begin fetching from that point.  The index "MUST" but the one
-        # associated with our server hostname. If one doesn't exist; create
-        # it initialized at 0
-        logger.debug('Retrieving information on group %s' % (name))
-        gt = session.query(GroupTrack)\
-                    .filter(GroupTrack.group_id == _id)\
-                    .filter(GroupTrack.server_id == _server.id).first()
-
-        if not gt or reset:
-            # Get an connection to work with
-            con = ctx['NNTPManager'].get_connection()
-
-            _, low, high, _ = con.group(name)
-            if low is None:
-                # Could not set group
-                logger.warning("Could not access group '%s' on '%s'." % (
-                    name,
-                    _server.host,
-                ))
-                continue
-
-            # Create a GroupTrack object using the group info
-            gt = GroupTrack(
-                group_id=_id,
-                server_id=_server.id,
-                low=low,
-                high=high,
-                scan_pointer=low,
-                index_pointer=low,
-            )
-            group_session.commit()
-            session.add(gt)
-
-        # Initialize our high/low variables
-        low = gt.high
-        high = gt.low
-
-        # starting pointer
-        cur = gt.scan_pointer + 1
-
-        requests = []
-        if date_to:
-            requests.append(
-                ctx['NNTPManager'].seek_by_date(
-                    date_to + timedelta(seconds=1), group=name, block=False))
-
-            # Mark our item
-            requests[-1]._watermark = 'high'
+    if not access(db_path, W_OK):
+        logger.error('The directory "%s" is not accessible.' % db_path)
+        exit(1)
 
-        if date_from:
-            requests.append(
-                ctx['NNTPManager'].seek_by_date(
-                    date_from, group=name, block=False))
+    if jobs is None:
+        jobs = ctx['NNTPSettings'].nntp_processing.get(
+            'header_groups', DEFAULT_PROCESSING_VARIABLES['header_groups'])
 
-            # Mark our item
-            requests[-1]._watermark = 'low'
+    try:
+        jobs = max(1, min(int(jobs), len(groups)))
 
-        while len(requests):
-            # Wait for requeest to complete
-            requests[-1].wait()
+    except (TypeError, ValueError):
+        logger.error("An invalid number of jobs was specified: %s" % jobs)
+        exit(1)
 
-            # we have a request at this point
-            request = requests.pop()
-            if not request:
-                continue
+    # Each group we fetch at the same time gets an equal share of the
+    # connections that handle our XOVER requests; this way no group can
+    # starve the others
+    max_pending = max(1, ctx['NNTPManager'].xover_connections() / jobs)
 
-            # Store our watermark so we update the correct entry
-            watermark = request._watermark
-
-            # Retrieve our response
-            response = request.response.pop()
-            if response is None:
-                # We got an error in our response; take an early
-                # exit for now
-                logger.error(
-                    'An unhandled server response was received: %s.' % (
-                        response))
-
-            # Store our watermark (high/low)
-            if watermark == 'low':
-                low = response
-                # Store our current pointer at the starting point we found
-                cur = low + 1
-
-            elif watermark == 'high':
-                high = response
-
-        if high <= cur:
-            # Skip
-            continue
+    # Our (shared) session is only accessed by one group at a time
+    lock = RLock()
 
-        # Drop all indexes; this makes inserts that much faster
-        # TODO: make the header_batch_size a entry in NNTPSettings since it's
-        # so powerful and allows pulling down multiple things at once
-        # Retrieve a list of articles from the database in concurrent blocks
-        # Scan them and place them into the NNTPGroupDatabase()
-        batch_size = ctx['NNTPSettings'].nntp_processing\
-                                        .get('header_batch_size', 5000)
-
-        logger.info('Fetching from %d to %d [%d article(s)]' % (
-                    cur, high, (high - cur + 1)))
-
-        # Initialize our batch
-        batch = list()
-
-        # Parse the Database URL
-        db_url = db.parse_url()
-
-        if db_url['schema'].lower() == 'sqlite':
-            # db_url['path'] contains the full path to the database file
-            logger.info('Optimizing update for an SQLite database.')
-            # SQLite Speed changes
-            db._engine.execute('PRAGMA journal_mode = MEMORY')
-            db._engine.execute("PRAGMA temp_store = MEMORY")
-            db._engine.execute('PRAGMA synchronous = OFF')
-            # 2 GB of RAM used for Caching for speed
-            db._engine.execute('PRAGMA cache_size = 2000000')
-
-        # we'll re-add them later
-        for index in Article.__table__.indexes:
-            try:
-                index.drop(bind=db._engine)
-                logger.info('Dropping Article Index "%s"' % index.name)
+    # Our groups are fetched at the same time (each into their own
+    # database); but never more then jobs of them
+    pool = Pool(jobs)
+    greenlets = [pool.spawn(
+        _fetch_headers, ctx, session, lock, _server, name, _id,
+        ramdisk=ramdisk, date_from=date_from, date_to=date_to,
+        max_pending=max_pending) for name, _id in groups.iteritems()]
 
-            except OperationalError:
-                # The index is probably already dropped
-                pass
+    pool.join()
 
-        while high > cur:
-            # Figure out our bach size
-            inc = min(batch_size - 1, high - cur)
-            logger.debug('Pushing XOVER batch %d-%d (inc=%d)' % (
-                cur, cur + inc, inc + 1,
-            ))
-
-            # Prepare our batch list
-            batch.append((cur, cur + inc, ctx['NNTPManager'].xover(
-                group=name, start=cur, end=cur + inc,
-                sort=XoverGrouping.BY_ARTICLE_NO,
-                block=False,
-            )))
-
-            # Increment our pointer
-            cur += inc + 1
+    if not all(g.value for g in greenlets):
+        logger.error('One or more groups could not be fetched.')
+        exit(1)
 
-        # Reverse sort the list since we know the first items pushed will be
-        # the first ones completed. we want to pop items from the batch in the
-        # same order we pushed them on:
-        #       batch = list(reversed(batch))
 
-        # The below is faster than the above for reversing a list then using
-        # the reversed() function (and does just that: reverses the results)
-        batch = batch[::-1]
+@click.command(name='rescore')
+@click.argument('groups', nargs=-1)
+@click.option('--watched', '-w', is_flag=True, help='All watched groups.')
+@click.option('--filters', '-F', multiple=True,
+              help='A filter file (or directory of them) to score with.')
+@click.pass_obj
+def update_rescore(ctx, groups, watched, filters):
+    """
+    Rescore cached articles.
 
-        logger.info('%d Article batches prepared (batch size=%d).' % (
-            len(batch),
-            batch_size,
-        ))
-        # Now we process the entries
-        while len(batch):
+    The articles already cached for the group(s) specified are scored
+    again using your filters; there is no need to fetch them again after
+    your filters change.  Unless specified on the command line, the
+    filters identified in your configuration are used.
 
-            # Block until results the oldest item added to the queue
-            # (usually the first one to return) is done:
-            batch[-1][-1].wait()
+    """
+    session = ctx['NNTPSettings'].session()
+    if not session:
+        logger.error("The database is not correctly configured.")
+        exit(1)
 
-            # If we reach here, we've got a request object to work
-            # with
-            low, high, request = batch.pop()
-            if not request:
-                continue
+    if not filters:
+        filters = ctx['NNTPSettings'].nntp_processing.get('filters')
 
-            response = request.response.pop()
-            if response is None:
-                # We got an error in our response; take an early
-                # exit for now
-                logger.error(
-                    'An unhandled server response was received: %s.' % (
-                        response))
-
-                # Reverse our list again
-                batch = batch[::-1]
-                while len(batch) > 0:
-                    _, _, request = batch.pop()
-                    request.abort()
-                break
+    if not filters:
+        logger.error("There were no filters identified for scoring.")
+        exit(1)
 
-            logger.debug(
-                'Retrieved (XOVER) batch %d-%d (%d articles).' % (
-                    low, high, len(response),
-                ))
-            # Get the current time for our timer
-            cur_time = datetime.now()
+    if isinstance(filters, basestring):
+        filters = [filters]
 
-            # For output logging
-            load_speed = 'fast'
+    # Load our filters
+    _filter = NNTPFilterBase(paths=[expanduser(f) for f in filters])
 
-            try:
-                # Try the fast way; this will always succeed unless
-                # we're dealing with a messed up table
-                db._engine.execute(
-                    Article.__table__.insert(), [{
-                        "message_id": article['id'],
-                        "article_no": article['article_no'],
-                        "subject": article['subject'],
-                        "poster": article['poster'],
-                        "size": article['size'],
-                        "lines": article['lines'],
-                        "date": article['date'],
-                        "score": article['score'],
-                    } for article in response.itervalues()]
-                )
+    groups = get_groups(session=session, lookup=groups, watched=watched)
+    if not groups:
+        logger.error("There were not groups identified for rescoring.")
+        exit(1)
 
-            except (OperationalError, IntegrityError):
-                logger.debug('Preparing for a slow load of %d items' %
-                             len(response))
-                for article in response.itervalues():
-                    # Store our batch into the database and update
-                    # our pointer
-                    try:
-                        group_session.merge(Article(
-                            message_id=article['id'],
-                            article_no=article['article_no'],
-                            subject=article['subject'],
-                            poster=article['poster'],
-                            size=article['size'],
-                            lines=article['lines'],
-                            posted_date=article['date'],
-                            score=article['score'],
-                        ))
-
-                    except OperationalError, e:
-                        logger.error(
-                            'A database operational error occured.'
-                        )
-                        logger.debug('Exception: %s' % str(e))
-                        exit(1)
-
-                    except TypeError, e:
-                        logger.error(
-                            'Failed to save article: %s.' %
-                            str(article),
-                        )
-                        logger.debug('Exception: %s' % str(e))
-                        exit(1)
-
-                group_session.commit()
-                load_speed = 'slow'
-
-            # Update our marker
-            # TODO: Do NOT update the marker if we have a ramdisk; in that
-            #       case it needs to be updated 'after' the batch has
-            #       completed.
-            session.query(GroupTrack)\
-                .filter(GroupTrack.group_id == _id)\
-                .filter(GroupTrack.server_id == _server.id)\
-                .update({
-                    GroupTrack.scan_pointer: high,
-                    GroupTrack.last_scan: datetime.now(),
-                })
+    db_path = join(ctx['NNTPSettings'].base_dir, 'cache', 'search')
 
-            # Save this now as it allows for Cntrl-C or aborts
-            # To take place and we'll resume from where we left off
-            session.commit()
+    # Track whether or not we rescored everything
+    success = True
 
-            # Calculate Processing Time
-            delta_time = datetime.now() - cur_time
-            delta_time = (delta_time.days * 86400) + delta_time.seconds \
-                + (delta_time.microseconds / 1e6)
-
-            logtxt = 'Cached %d article(s) in %s sec(s) '\
-                     '[mode=%s, remaining=%d].'
-            logger.info(logtxt % (
-                len(response),
-                delta_time,
-                load_speed,
-                len(batch)),
+    for name in groups.iterkeys():
+        db_file = '%s%s' % (
+            join(db_path, name),
+            SQLITE_DATABASE_EXTENSION,
+        )
+        if not isfile(db_file):
+            logger.warning(
+                "There is no cached content for '%s'." % db_file
             )
+            continue
 
-        # Recrete all indexes
-        for index in Article.__table__.indexes:
-            try:
-                index.create(bind=db._engine)
-                logger.info('Recreated Article Index "%s"' % index.name)
-            except OperationalError:
-                # The index has probably already been recreated
-                pass
-
-        # Close our database content
-        group_session.close()
-
-        if ramdisk:
-            # Move content back as a .new extension
-            _new_db_file = '%s.new' % db_file
-            # Move existing database to .old extension
-            _old_db_file = '%s.old' % db_file
-            try:
-                unlink('%s.new' % db_file)
-            except OSError:
-                # File doesn't exist; no problem
-                pass
-
-            # TODO: Add try/catch blocks and handle cases where we can't move
-            # our new database in place.
+        logger.info('Rescoring %s' % name)
+        if rescore_articles(db_file, name, [_filter]) is None:
+            success = False
 
-            # Move new database into place
-            logger.debug(
-                'Transfering %s database to local storage.' % (name),
-            )
-            move(ram_db_file, _new_db_file)
-            logger.info(
-                'Transfered %s database to local storage.' % (name),
-            )
-            # Rename existing database to old (for fall back)
-            rename(db_file, _old_db_file)
-            # Place new database into place
-            rename(_new_db_file, db_file)
-            # Safely remove the old database
-            unlink(_old_db_file)
+    if not success:
+        logger.error('One or more groups could not be rescored.')
+        exit(1)
 
 
 # Define our functions below
@@ -655,10 +848,12 @@ def update_search(ctx, groups, date_from, date_to, watched):
 @click.pass_obj
 def update_index(ctx, groups, watched):
     """
-    TODO Updating Indexes (Generate NZBFiles).
+    Index cached articles (Generate NZB-Files).
 
-    If a group(s) is/are specified on the command line, then just those
-    are indexed as well.
+    The articles cached for the group(s) specified are collated into posts
+    and an NZB-File is written for each post that is complete.  Only the
+    articles cached since the group was last indexed are looked at; the
+    posts they belong to pick up where they left off.
 
     """
     session = ctx['NNTPSettings'].session()
@@ -666,57 +861,113 @@ def update_index(ctx, groups, watched):
         logger.error("The database is not correctly configured.")
         exit(1)
 
-    # Track our database updates
-    pending_commits = 0
-
-    # PEP8 E712 does not allow us to make a comparison to a boolean value
-    # using the == instead of the keyword 'in'.  However SQLAlchemy
-    # requires us to do just because that's how the amazing tool works.
-    # so to get around the pep8 error, we'll just define a variable equal
-    # to True and then we can compare to it
-    pep8_e712 = True
-
-    if watched:
-        _groups = session.query(Group.name)\
-                         .filter(Group.watch == pep8_e712).all()
-        if not _groups:
-            logger.error("There are no current groups being watched.")
-            exit(1)
-        groups = set(groups) | set([g[0] for g in _groups])
+    if not len(ctx['NNTPSettings'].nntp_servers) > 0:
+        logger.error("There are no servers defined.")
+        exit(1)
 
+    # Our pointers are the ones associated with our primary server
+    s = ctx['NNTPSettings'].nntp_servers[0]
+    try:
+        _server = session.query(Server)\
+            .filter(Server.host == s['host']).first()
+
+    except (InvalidRequestError, OperationalError):
+        # Database isn't set up
+        logger.error("The database is not correctly configured.")
+        exit(1)
+
+    if not _server:
+        logger.error("Server entry is not in the database.")
+        exit(1)
+
+    groups = get_groups(session=session, lookup=groups, watched=watched)
     if not groups:
         logger.error("There were not groups identified for indexing.")
         exit(1)
 
-    # Maintain a list of completed groups; This allows us to not
-    # parse a group twice
-    completed = list()
+    db_path = join(ctx['NNTPSettings'].base_dir, 'cache', 'search')
+    nzb_path = join(ctx['NNTPSettings'].base_dir, 'cache', 'nzb')
+
+    # Track whether or not we indexed everything
+    success = True
 
-    for group in groups:
-        _group = group.lower().strip()
-        if not _group:
+    for name, _id in groups.iteritems():
+        db_file = '%s%s' % (
+            join(db_path, name),
+            SQLITE_DATABASE_EXTENSION,
+        )
+        if not isfile(db_file):
+            logger.warning(
+                "There is no cached content for '%s'." % db_file
+            )
             continue
 
-        _id = session.query(Group.id).filter(Group.name == _group).first()
-        if not _id:
-            # No problem; let us use the alias too
-            _id = session.query(Group.id)\
-                         .join(GroupAlias)\
-                         .filter(GroupAlias.name == _group).first()
-            if not _id:
-                logger.warning("The group '%s' does not exist." % group)
-                continue
+        gt = session.query(GroupTrack)\
+                    .filter(GroupTrack.group_id == _id)\
+                    .filter(GroupTrack.server_id == _server.id).first()
+        if not gt:
+            logger.warning("The group '%s' has not been cached." % name)
+            continue
 
-        if _id in completed:
-            # We've indexed this group
+        # Databases cached before we collated posts don't have the tables
+        # we need yet
+        db = NNTPGroupDatabase(engine='sqlite:///%s' % db_file)
+        group_session = db.session()
+        if not group_session:
+            logger.warning("The database %s not be accessed." % db_file)
+            success = False
             continue
 
-        # TODO Index Group based on It's placeholders in GroupTrack
+        created = db.create_post_tables()
+        group_session.close()
+        if not created:
+            success = False
+            continue
 
-        # Append to completed list (this prevents us from processing entries
-        # twice)
-        completed.append(_id)
+        _nzb_path = join(nzb_path, name)
+        if not isdir(_nzb_path):
+            if not mkdir(_nzb_path):
+                logger.error("Failed to create directory %s" % _nzb_path)
+                success = False
+                continue
+            logger.info("Created directory %s" % _nzb_path)
 
-    if pending_commits > 0:
-        # commit our results
-        session.commit()
+        def checkpoint(pointer):
+            # Save our progress as we go
+            gt.index_pointer = pointer
+            gt.last_index = datetime.now()
+            session.commit()
+
+        logger.info('Indexing %s' % name)
+        collator = ArticleCollator(
+            db_file, pointer=gt.index_pointer, on_commit=checkpoint)
+
+        # We never index past what has been cached without any gaps
+        if not collator.collate(high=gt.scan_pointer):
+            success = False
+
+        # Write an NZB-File for each post that has been completed; this
+        # includes any that a previous run didn't get to
+        written = 0
+        for key in collator.completed():
+            nzb = collator.nzb(key, groups=name)
+            filename = '%s.%s.nzb' % (
+                NZB_FILENAME_RE.sub('', nzb.meta['name']).strip() or 'post',
+                key[:8],
+            )
+            if nzb.save(join(_nzb_path, filename)):
+                # Don't write it again
+                collator.written(key)
+                written += 1
+
+            else:
+                logger.warning('Failed to write NZB-File %s' % filename)
+                success = False
+
+        collator.close()
+
+        logger.info('Wrote %d NZB-File(s) for %s.' % (written, name))
+
+    if not success:
+        logger.error('One or more groups could not be indexed.')
+        exit(1)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+#
+# Test the writing of article indexes (XOVER results) to a group database
+#
+# Copyright (C) 2017 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+
+import sys
+if 'threading' in sys.modules:
+    #  gevent patching since pytests import
+    #  the sys library before we do.
+    del sys.modules['threading']
+
+import gevent.monkey
+gevent.monkey.patch_all()
+
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from io import BytesIO
+from datetime import datetime
+
+try:
+    from tests.TestBase import TestBase
+
+except ImportError:
+    sys.path.insert(0, dirname(dirname(abspath(__file__))))
+    from tests.TestBase import TestBase
+
+from newsreap.ArticleIndexWriter import ArticleIndexWriter
+from newsreap.NNTPGroupDatabase import NNTPGroupDatabase
+from newsreap.objects.group.Article import Article
+from newsreap.codecs.CodecArticleIndex import CodecArticleIndex
+from newsreap.codecs.CodecArticleIndex import XoverGrouping
+
+
+class ArticleIndexWriter_Test(TestBase):
+    """
+    Tests ArticleIndexWriter
+    """
+
+    def batch(self, low, high):
+        """
+        Returns an ArticleIndexBatch containing the articles specified
+        """
+        data = BytesIO()
+        for no in range(low, high + 1):
+            data.write(
+                "%d\tSubject %d\tposter@example.com\t"
+                "Wed, 23 Jul 2014 20:01:02 -0600\t<%d@example.com>\t\t"
+                "1000\t10\tXref: news.example.com alt.binaries.test:%d\r\n"
+                % (no, no, no, no))
+        data.seek(0)
+
+        ch = CodecArticleIndex(sort=XoverGrouping.BY_ARTICLE_NO)
+        ch.decode(data)
+        return ch.decoded.content
+
+    def test_writing(self):
+        """
+        Batches are written as they arrive but our pointer only advances
+        over the ranges written without any gaps between them.
+        """
+        db_file = join(self.tmp_dir, 'ArticleIndexWriter.db')
+
+        # Create our database
+        db = NNTPGroupDatabase(engine='sqlite:///%s' % db_file, reset=True)
+        session = db.session()
+
+        pointers = []
+        writer = ArticleIndexWriter(
+            db_file, pointer=0, on_commit=pointers.append)
+
+        # Our second range arrives before our first
+        assert writer.put(11, 20, self.batch(11, 20)) is True
+        gevent.sleep(0.5)
+        assert writer.pointer == 0
+        assert pointers == []
+
+        assert writer.put(1, 10, self.batch(1, 10)) is True
+
+        # Articles we already have are ignored
+        assert writer.put(21, 30, self.batch(15, 30)) is True
+
+        # Everything gets written before we close
+        assert writer.close() is True
+        assert writer.pointer == 30
+        assert pointers[-1] == 30
+        assert writer.count == 36
+
+        assert session.query(Article).count() == 30
+        article = session.query(Article)\
+            .filter(Article.article_no == 5).first()
+        assert article.message_id == '5@example.com'
+        assert article.subject == 'Subject 5'
+        assert article.posted_date == datetime(2014, 7, 24, 2, 1, 2)
+        assert article.hidden is False
+        session.close()
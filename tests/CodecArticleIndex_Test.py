@@ -26,6 +26,7 @@ gevent.monkey.patch_all()
 from os.path import dirname
 from os.path import abspath
 from datetime import datetime
+from io import BytesIO
 
 try:
     from tests.TestBase import TestBase
@@ -34,6 +35,10 @@ except ImportError:
     from tests.TestBase import TestBase
 
 from newsreap.codecs.CodecArticleIndex import CodecArticleIndex
+from newsreap.codecs.CodecArticleIndex import ArticleIndexBatch
+from newsreap.codecs.CodecArticleIndex import XoverGrouping
+from newsreap.codecs.CodecArticleIndex import parse_xover_date
+from newsreap.codecs.CodecArticleIndex import NNTP_XOVER_DATE_CACHE
 
 
 class Codec_ArticleIndex(TestBase):
@@ -93,3 +98,116 @@ class Codec_ArticleIndex(TestBase):
                 u'XviD AC3-Osiris - Dawn of the Planet of the Apes ' + \
                 u'2014 480p WebripXviD AC3.US-Osiris.nzb 241176 bytes (1/1)',
         }
+
+    def test_malformed_lines(self):
+        """
+        Well formed lines are split on their tabs; everything else is
+        handed to our regular expression.  Either way the results should
+        be the same.
+        """
+
+        # Initialize Codec
+        ch = CodecArticleIndex()
+
+        # A well formed line
+        line = "24423\tA Subject (1/1)\tposter@example.com\t" + \
+            "Wed, 23 Jul 2014 20:01:02 -0600\t<abcd@example.com>\t\t" + \
+            "338850\t5363\tXref: news.example.com alt.binaries.test:24423"
+        entry = ch.detect(line)
+        assert entry == {
+            'id': 'abcd@example.com',
+            'article_no': 24423,
+            'score': 0,
+            'group': 'news.example.com',
+            'poster': u'poster@example.com',
+            'date': datetime(2014, 7, 24, 2, 1, 2),
+            'xgroups': {
+                'alt.binaries.test': 24423,
+            },
+            'size': 338850,
+            'lines': 5363,
+            'subject': u'A Subject (1/1)',
+        }
+
+        # Our date was cached
+        assert NNTP_XOVER_DATE_CACHE['Wed, 23 Jul 2014 20:01:02 -0600'] == \
+            datetime(2014, 7, 24, 2, 1, 2)
+
+        # A date that isn't RFC 5322 compliant is left for dateutil
+        assert parse_xover_date('2014-07-23 20:01:02') is None
+        assert ch.detect(line.replace(
+            'Wed, 23 Jul 2014 20:01:02 -0600',
+            '2014-07-23 20:01:02 -0600'))['date'] == \
+            datetime(2014, 7, 24, 2, 1, 2)
+
+        # Missing line counts are tolerated
+        assert ch.detect(line.replace('\t5363\t', '\t\t'))['lines'] == -1
+
+        # Invalid article numbers are not
+        assert ch.detect(line.replace('24423', 'abcd', 1)) is None
+
+        # Missing fields are not
+        assert ch.detect('\t'.join(line.split('\t')[:8])) is None
+
+    def test_article_index_batch(self):
+        """
+        Our XOVER results are stored in columns but can still be accessed
+        like the dictionary they used to be stored in.
+        """
+
+        data = BytesIO()
+        for no in range(20):
+            data.write(
+                "%d\tSubject %d\tposter%d@example.com\t"
+                "Wed, 23 Jul 2014 20:%.2d:02 -0600\t<%d@example.com>\t\t"
+                "1000\t10\tXref: news.example.com alt.binaries.test:%d\r\n"
+                % (100 - no, no, no % 3, no % 7, no, 100 - no))
+
+        for sort in (XoverGrouping.BY_ARTICLE_NO,
+                     XoverGrouping.BY_TIME,
+                     XoverGrouping.BY_POSTER_TIME):
+
+            # Initialize Codec
+            ch = CodecArticleIndex(sort=sort)
+            data.seek(0)
+            ch.decode(data)
+
+            batch = ch.decoded.content
+            assert isinstance(batch, ArticleIndexBatch)
+            assert len(batch) == 20
+
+            # Our keys are the same ones we've always used
+            keys = batch.keys()
+            assert len(keys) == 20
+            assert list(keys) == sorted(keys)
+            assert list(batch) == list(keys)
+
+            for key, entry in batch.iteritems():
+                assert batch[key] == entry
+                assert key in batch
+                if sort == XoverGrouping.BY_ARTICLE_NO:
+                    assert key == '%.10d' % entry['article_no']
+
+                elif sort == XoverGrouping.BY_TIME:
+                    assert key == '%s:%.10d' % (
+                        entry['date'].strftime('%Y%m%d%H%M%S'),
+                        entry['article_no'])
+
+                else:
+                    assert key == '%s:%s:%.10d' % (
+                        entry['poster'],
+                        entry['date'].strftime('%Y%m%d%H%M%S'),
+                        entry['article_no'])
+
+            # Our columns are in the order the articles were added
+            assert list(batch.column('article_no')) == range(100, 80, -1)
+            assert len(set(batch.column('poster'))) == 3
+            assert next(batch.column('xgroups')) == \
+                {'alt.binaries.test': 100}
+
+            # We can merge our batches together
+            merged = ArticleIndexBatch(sort=sort)
+            merged.update(batch)
+            merged.update(batch)
+            assert len(merged) == 40
+            assert merged.values()[0] == batch.values()[0]
@@ -575,6 +575,115 @@ class CodecYENC_Test(TestBase):
         assert(decoded.crc32() == content.crc32())
         assert(decoded.md5() == content.md5())
 
+    def test_yenc_python_encode_and_decode(self):
+        """
+        Test that content encoded by our Python implementation can be
+        decoded by the yEnc C libraries (and vice versa).
+
+        """
+        # A simple test for ensuring that the yEnc
+        # library exists; otherwise we want this test
+        # to fail; the below line will handle this for
+        # us; we'll let the test fail on an import error
+        import yenc
+
+        # Our private Key Location
+        tmp_file = join(
+            self.tmp_dir,
+            'test_yenc_python_encode_and_decode.tmp',
+        )
+
+        # Create a larger file
+        assert(self.touch(tmp_file, size='1M', random=True))
+
+        # Create an NNTPContent Object pointing to our new data
+        content = NNTPBinaryContent(tmp_file)
+
+        # Create our Yenc Codec instances
+        codec_c = CodecYenc(work_dir=self.test_dir)
+        codec_py = CodecYenc(work_dir=self.test_dir)
+
+        # Force one to operate in python (manual/slow) mode
+        codec_py.FAST_YENC_SUPPORT = False
+
+        for encoder, decoder in ((codec_py, codec_c), (codec_c, codec_py)):
+            encoded = encoder.encode(content)
+            assert isinstance(encoded, NNTPAsciiContent) is True
+
+            decoded = decoder.decode(encoded)
+            assert isinstance(decoded, NNTPBinaryContent) is True
+
+            # Our original content should be the same as our decoded
+            # content
+            assert decoded.crc32() == content.crc32()
+            assert decoded.md5() == content.md5()
+
+        # Our lines never start with whitespace or a dot and never
+        # end with whitespace (only these need to be escaped)
+        encoded, column = codec_py._encode_block('\xf6\xf6\xe2\x04' * 256)
+        lines = encoded.split('\r\n')[:-1]
+        assert len(lines) == 8
+        for line in lines:
+            assert line[0] not in ' \t.'
+            assert line[-1] not in ' \t'
+
+        # We produce the same output as the yEnc C libraries
+        assert (encoded, column) == yenc._yenc.encode_string(
+            '\xf6\xf6\xe2\x04' * 256)[0::2]
+
+    def test_yenc_streaming_encode(self):
+        """
+        Test that our encoded content is written out line by line as it's
+        encoded (regardless of the size of the buffer we're working with)
+
+        """
+        # A simple test for ensuring that the yEnc
+        # library exists; otherwise we want this test
+        # to fail; the below line will handle this for
+        # us; we'll let the test fail on an import error
+        import yenc
+
+        # Our private Key Location
+        tmp_file = join(
+            self.tmp_dir,
+            'test_yenc_streaming_encode.tmp',
+        )
+
+        # Create a file that doesn't divide evenly into our buffer
+        assert(self.touch(tmp_file, size='100K', random=True))
+        with open(tmp_file, 'ab') as fd_out:
+            fd_out.write('. \t')
+
+        # Create an NNTPContent Object pointing to our new data
+        content = NNTPBinaryContent(tmp_file)
+
+        for fast in (True, False):
+            codec = CodecYenc(work_dir=self.test_dir)
+            codec.FAST_YENC_SUPPORT = fast
+
+            # A buffer that isn't aligned with our lines
+            encoded = codec.encode(content, mem_buf=1000)
+            assert isinstance(encoded, NNTPAsciiContent) is True
+
+            decoded = codec.decode(encoded)
+            assert isinstance(decoded, NNTPBinaryContent) is True
+
+            # Our original content should be the same as our decoded
+            # content
+            assert decoded.crc32() == content.crc32()
+
+            lines = encoded.getvalue().split('\r\n')
+            # our yend line is the last one we write
+            assert lines[-1] == ''
+            assert lines[-2].startswith('=yend ')
+
+            for line in lines[2:-2]:
+                # No lines are empty or longer then they should be
+                assert 0 < len(line) <= 129
+
+                # Whitespace never ends a line
+                assert line[-1] not in ' \t'
+
     def test_partial_download(self):
         """
         Test the handling of a download that is explicitly ordered to abort
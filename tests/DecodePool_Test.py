@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+#
+# Test the decoding of content using a pool of processes
+#
+# Copyright (C) 2017 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+
+import sys
+if 'threading' in sys.modules:
+    #  gevent patching since pytests import
+    #  the sys library before we do.
+    del sys.modules['threading']
+
+import gevent.monkey
+gevent.monkey.patch_all()
+
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from os.path import isfile
+
+try:
+    from tests.TestBase import TestBase
+
+except ImportError:
+    sys.path.insert(0, dirname(dirname(abspath(__file__))))
+    from tests.TestBase import TestBase
+
+from tests.NNTPSocketServer import NNTPSocketServer
+from tests.NNTPSocketServer import NNTP_TEST_VAR_PATH as VAR_PATH
+
+from newsreap.DecodePool import DecodePool
+from newsreap.DecodePool import decode_payload
+from newsreap.NNTPConnection import NNTPConnection
+from newsreap.NNTPArticle import NNTPArticle
+from newsreap.NNTPBinaryContent import NNTPBinaryContent
+from newsreap.NNTPResponse import NNTPResponse
+from newsreap.codecs.CodecYenc import CodecYenc
+
+
+class BrokenCodec(CodecYenc):
+    """
+    A decoder that chokes on all of the content handed to it
+    """
+    def decode(self, stream):
+        raise ValueError('Bad Payload')
+
+
+class DecodePool_Test(TestBase):
+    def setUp(self):
+        """
+        Grab a few more things from the config
+        """
+        super(DecodePool_Test, self).setUp()
+
+        # Insecure NNTP Server
+        self.nntp = NNTPSocketServer(
+            secure=False,
+            join_group=True,
+        )
+
+        # Common Group Name
+        self.common_group = 'alt.binaries.test'
+
+        # Map Articles (to groups) for fetching
+        for article_id in ('5', '20', '21'):
+            self.nntp.map(
+                article_id=article_id,
+                groups=(self.common_group, ),
+                filepath=join(VAR_PATH, '%.8d.ntx' % int(article_id)),
+            )
+
+        # Exit the server thread when the main thread terminates
+        self.nntp.daemon = True
+
+        # Start Our Server Thread
+        self.nntp.start()
+
+        # Acquire our configuration
+        self.nttp_ipaddr, self.nntp_portno = \
+            self.nntp.local_connection_info()
+
+    def tearDown(self):
+        # Shutdown NNTP Dummy Server Daemon
+        self.nntp.shutdown()
+
+        super(DecodePool_Test, self).tearDown()
+
+    def test_decode_payload(self):
+        """
+        Tests the decoding of a payload the way our workers do it
+        """
+        with open(join(self.var_dir, '00000005.ntx'), 'r') as fd_in:
+            data = fd_in.read()
+
+        body, decoded = decode_payload(
+            data, [CodecYenc(work_dir=self.tmp_dir)])
+        assert len(decoded) == 1
+        assert isinstance(decoded[0], NNTPBinaryContent)
+        assert decoded[0].is_valid() is True
+
+        # Content no decoder took ownership of is left in our body
+        assert 'Newsgroups: yenc' in body
+        assert '=ybegin' not in body
+
+        with open(join(self.var_dir, 'testfile.txt'), 'r') as fd_in:
+            assert fd_in.read() == decoded[0].getvalue()
+
+    def test_pool_decode(self):
+        """
+        Tests the handing of decoding off to our pool
+        """
+        pool = DecodePool(processes=2)
+        assert len(pool) == 2
+
+        with open(join(self.var_dir, '00000020.ntx'), 'r') as fd_in:
+            data = fd_in.read()
+
+        response = NNTPResponse(work_dir=self.tmp_dir)
+        assert pool.decode(
+            response, data, CodecYenc(work_dir=self.tmp_dir)) is True
+
+        assert len(response.decoded) == 1
+        content = iter(response.decoded).next()
+        assert isinstance(content, NNTPBinaryContent)
+        assert content.is_valid() is True
+        assert content.part == 1
+
+        # Our content is attached to our object (as it would have been had
+        # we decoded it ourselves)
+        assert content.is_attached() is True
+        filepath = content.filepath
+        assert isfile(filepath) is True
+        del response
+        del content
+        assert isfile(filepath) is False
+
+        # Once closed; we can't decode anything further
+        pool.close()
+        assert len(pool) == 0
+        response = NNTPResponse(work_dir=self.tmp_dir)
+        assert pool.decode(
+            response, data, CodecYenc(work_dir=self.tmp_dir)) is False
+
+    def test_pool_failures(self):
+        """
+        Tests that our pool survives content that can't be decoded and
+        drops the workers it loses
+        """
+        pool = DecodePool(processes=2)
+
+        with open(join(self.var_dir, '00000020.ntx'), 'r') as fd_in:
+            data = fd_in.read()
+
+        # Content our workers can't decode is left to us
+        for _ in range(3):
+            response = NNTPResponse(work_dir=self.tmp_dir)
+            assert pool.decode(
+                response, data, BrokenCodec(work_dir=self.tmp_dir)) is False
+            assert len(response.decoded) == 0
+
+        # But none of our workers were lost
+        assert len(pool) == 2
+        response = NNTPResponse(work_dir=self.tmp_dir)
+        assert pool.decode(
+            response, data, CodecYenc(work_dir=self.tmp_dir)) is True
+        assert len(response.decoded) == 1
+
+        # A worker that goes away is dropped from our pool
+        process, _ = pool._processes[0]
+        process.terminate()
+        process.join()
+
+        results = []
+        for _ in range(2):
+            response = NNTPResponse(work_dir=self.tmp_dir)
+            results.append(pool.decode(
+                response, data, CodecYenc(work_dir=self.tmp_dir)))
+
+        assert len(pool) == 1
+        assert results.count(True) == 1
+
+        # The rest of our pool carries on
+        response = NNTPResponse(work_dir=self.tmp_dir)
+        assert pool.decode(
+            response, data, CodecYenc(work_dir=self.tmp_dir)) is True
+
+        # Losing all of our workers leaves the decoding to us
+        process, _ = pool._processes[0]
+        process.terminate()
+        process.join()
+
+        for _ in range(2):
+            response = NNTPResponse(work_dir=self.tmp_dir)
+            assert pool.decode(
+                response, data, CodecYenc(work_dir=self.tmp_dir)) is False
+
+        assert len(pool) == 0
+        pool.close()
+
+    def test_connection_with_pool(self):
+        """
+        Tests the retrieval of content decoded by our pool
+        """
+        pool = DecodePool(processes=2)
+
+        # Create a non-secure connection
+        sock = NNTPConnection(
+            host=self.nttp_ipaddr,
+            port=self.nntp_portno,
+            username='valid',
+            password='valid',
+            secure=False,
+            join_group=True,
+            pipeline=2,
+            decode_pool=pool,
+        )
+        assert sock.connect() is True
+
+        # Our standard retrieval
+        article = sock.get('5', work_dir=self.tmp_dir, group=self.common_group)
+        assert isinstance(article, NNTPArticle) is True
+        assert len(article.decoded) == 1
+        assert iter(article.decoded).next().is_valid() is True
+
+        # Compare File
+        with open(join(self.var_dir, 'testfile.txt'), 'r') as fd_in:
+            decoded = fd_in.read()
+
+        assert decoded == iter(article.decoded).next().getvalue()
+
+        # Our pipelined retrieval
+        articles = sock.get_many(['20', '21', '5'], work_dir=self.tmp_dir)
+        assert len(articles) == 3
+        for article in articles:
+            assert isinstance(article, NNTPArticle) is True
+            assert len(article.decoded) == 1
+            assert iter(article.decoded).next().is_valid() is True
+
+        assert decoded == iter(articles[2].decoded).next().getvalue()
+
+        # Close up our socket and pool
+        sock.close()
+        pool.close()
@@ -294,6 +294,100 @@ class NNTPConnection_Test(TestBase):
         groups = sock.groups(filters='alt.binaries')
         assert len(groups) == 5270
 
+    def test_deflate_session(self):
+        """
+        Test a session compressed in both directions (RFC8054)
+
+        """
+        sock = NNTPConnection(
+            host=self.nttp_ipaddr,
+            port=self.nntp_portno,
+            username='valid',
+            password='valid',
+            secure=False,
+            join_group=False,
+            iostream=NNTPIOStream.RFC8054_DEFLATE,
+        )
+
+        assert sock.connect(timeout=5.0) is True
+        assert sock._iostream == NNTPIOStream.RFC8054_DEFLATE
+
+        # Our listing is decompressed as it arrives
+        groups = sock.groups(filters='alt.binaries', lazy=False)
+        assert len(groups) == 5270
+
+        # Our session is still in sync afterwards
+        groups = sock.groups(filters='alt.binaries', lazy=False)
+        assert len(groups) == 5270
+
+        sock.close()
+
+        # Now we have a server that doesn't advertise it
+        nntp = NNTPSocketServer(secure=False)
+        nntp.set_override({
+            re.compile('CAPABILITIES'): {
+                'response': '101 Capability list:\r\nVERSION 2\r\n',
+            },
+        })
+        nntp.daemon = True
+        nntp.start()
+        ipaddr, portno = nntp.local_connection_info()
+
+        sock = NNTPConnection(
+            host=ipaddr,
+            port=portno,
+            username='valid',
+            password='valid',
+            secure=False,
+            join_group=False,
+            iostream=NNTPIOStream.RFC8054_DEFLATE,
+        )
+
+        assert sock.connect(timeout=5.0) is True
+
+        # We fall back to the next best thing
+        assert sock._iostream == NNTPIOStream.RFC3977_GZIP
+
+        groups = sock.groups(filters='alt.binaries', lazy=False)
+        assert len(groups) == 5270
+
+        sock.close()
+        nntp.shutdown()
+
+    def test_compressed_group_listing(self):
+        """
+        Test the retrieval of a compressed (LIST ACTIVE) listing that is
+        streamed to us in more then one chunk
+
+        """
+        # Have our server compress our listing
+        self.nntp.set_override({
+            re.compile('LIST ACTIVE'): {
+                'response': '215 Newsgroups in form "group high low flags".',
+                'gzip': join(VAR_PATH, 'group.list'),
+            },
+        })
+
+        sock = NNTPConnection(
+            host=self.nttp_ipaddr,
+            port=self.nntp_portno,
+            username='valid',
+            password='valid',
+            secure=False,
+            join_group=False,
+        )
+
+        # Force our compressed payload to arrive over several passes
+        sock.MAX_BUFFER_SIZE = 4096
+
+        assert sock.connect(timeout=5.0) is True
+        assert sock._iostream == NNTPIOStream.RFC3977_GZIP
+
+        groups = sock.groups(filters='alt.binaries', lazy=False)
+
+        # We parsed the same content we do when it isn't compressed
+        assert len(groups) == 5270
+
     def test_posting(self):
         sock = NNTPConnection(
             host=self.nttp_ipaddr,
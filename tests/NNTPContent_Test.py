@@ -232,6 +232,12 @@ class NNTPContent_Test(TestBase):
         # a failed load means not valid
         assert(ba.is_valid() is False)
 
+        # Our codecs flag our content once they've verified it
+        ba.set_valid()
+        assert(ba.is_valid() is True)
+        ba.set_valid(False)
+        assert(ba.is_valid() is False)
+
         temp_file = join(self.tmp_dir, 'NNTPContent_Test-test_iterations.tmp')
 
         with open(temp_file, 'wb') as fd:
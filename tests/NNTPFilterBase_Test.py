@@ -42,6 +42,10 @@ except ImportError:
 from newsreap.Utils import strsize_to_bytes
 from newsreap.NNTPFilterBase import NNTPFilterBase
 from newsreap.NNTPFilterBase import FilterDirectives
+from newsreap.NNTPFilterBase import FilterColumn
+from newsreap.NNTPFilterBase import FilterListCode
+from newsreap.NNTPFilterBase import FilterProgram
+from newsreap.NNTPFilterBase import apply_filters
 
 
 class NNTPFilterBase_Test(TestBase):
@@ -1901,6 +1905,231 @@ class NNTPFilterBase_Test(TestBase):
         assert len(fb._regex_hash) == 2
 
 
+    def test_compiled_program(self):
+        """
+        Our lists are compiled into a program that can be applied against a
+        whole batch of entries at once.
+        """
+        fb = NNTPFilterBase()
+
+        # Several (overlapping) regular expressions that all get merged
+        for score, regex in ((1, '.*great'), (2, 'what'), (4, '.*\.mkv'),
+                             (8, '.*\.avi')):
+            fb.scorelist_append('alt.binaries.*', {
+                FilterDirectives.SCORE: score,
+                FilterDirectives.SUBJECT_MATCHES_REGEX: regex,
+            })
+
+        # One that refers to it's own group (so it can't be merged)
+        fb.scorelist_append('alt.binaries.*', {
+            FilterDirectives.SCORE: 16,
+            FilterDirectives.SUBJECT_MATCHES_REGEX: '(what)\.a\.great.*\\1',
+        })
+
+        # Blacklist small content unless it's on our whitelist
+        fb.blacklist_append('alt.binaries.*', {
+            FilterDirectives.SIZE_LESS_THAN: strsize_to_bytes('1M'),
+        })
+        fb.whitelist_append('alt.binaries.*', {
+            FilterDirectives.SCORE_GREATER_THAN: 20,
+            FilterDirectives.POSTER_ENDS_WITH: '@email.com>',
+        })
+
+        program = fb.compile('alt.binaries.test')
+        assert len(program.scorelist) == 5
+        assert len(program.whitelist) == 1
+        assert len(program.blacklist) == 1
+
+        # Our program is cached until our lists change
+        assert fb.compile('alt.binaries.test') is program
+        assert len([r for r in program._regex if r[2] is not None]) == 1
+
+        entries = []
+        for idx, (subject, size) in enumerate((
+                ('What.A.Great.Show "what.a.great.show.mkv"', '25M'),
+                ('What.A.Great.Show "what.a.great.show.mkv"', '10K'),
+                ('Another.Show "another.show.avi"', '25M'),
+                ('Another.Show "another.show.avi"', '10K'),
+                ('Nothing.To.See', '10K'))):
+            entry = copy(self.template_entry)
+            entry['article_no'] = idx
+            entry['subject'] = subject
+            entry['size'] = strsize_to_bytes(size)
+            entry['score'] = 0
+            entries.append(entry)
+
+        # The same results we'd get one entry at a time
+        expected = []
+        for entry in copy(entries):
+            entry['score'] += fb.score(**entry)
+            if fb.whitelist(**entry) or not fb.blacklist(**entry):
+                expected.append(entry)
+
+        results = apply_filters([fb], entries)
+        assert results == expected
+        assert [(e['article_no'], e['score']) for e in results] == \
+            [(0, 23), (1, 23), (2, 8)]
+
+        # Our scores are applied to the entries themselves
+        assert entries[3]['score'] == 8
+
+        # Lists are applied in full by each of our filters
+        for entry in entries:
+            entry['score'] = 0
+
+        results = apply_filters([fb, fb], copy(entries))
+        assert [(e['article_no'], e['score']) for e in results] == \
+            [(0, 46), (1, 46), (2, 16)]
+
+        # Nothing to filter
+        assert apply_filters([], entries) == entries
+        assert apply_filters([fb], []) == []
+
+        fb.scorelist_append('alt.binaries.*', {
+            FilterDirectives.SCORE: 32,
+            FilterDirectives.SUBJECT_STARTS_WITH: 'Nothing',
+        })
+
+        # Our program was rebuilt
+        assert fb.compile('alt.binaries.test') is not program
+
+
+    def test_program_columns(self):
+        """
+        Our programs are applied a column at a time; regular expressions are
+        only looked up for the rows that survive our numeric comparisons.
+        """
+        fb = NNTPFilterBase()
+
+        fb.scorelist_append('alt.binaries.*', {
+            FilterDirectives.SCORE: 10,
+            FilterDirectives.SIZE_GREATER_THAN: strsize_to_bytes('1M'),
+            FilterDirectives.SUBJECT_MATCHES_REGEX: '.*\.mkv',
+        })
+        fb.scorelist_append('alt.binaries.*', {
+            FilterDirectives.SCORE: 5,
+            FilterDirectives.SIZE_GREATER_THAN: strsize_to_bytes('1M'),
+            FilterDirectives.LINE_COUNT_LESS_THAN: 100,
+        })
+        fb.blacklist_append('alt.binaries.*', {
+            FilterDirectives.SCORE_LESS_THAN: 10,
+            FilterDirectives.XPOST_COUNT_GREATER_THAN: 1,
+        })
+
+        program = fb.compile('alt.binaries.test')
+
+        rows = []
+        for idx, (size, lines) in enumerate((
+                ('25M', 3000), ('10K', 30), ('25M', 30), ('10K', 3000))):
+            entry = copy(self.template_entry)
+            entry['size'] = strsize_to_bytes(size)
+            entry['lines'] = lines
+            rows.append(FilterProgram.row(**entry))
+
+        columns = FilterProgram.columns(rows)
+        assert len(columns) == FilterColumn.XPOSTS + 1
+        assert columns[FilterColumn.XPOSTS] == [2, 2, 2, 2]
+
+        hits = [None] * len(rows)
+        assert program.score(columns, hits) == [10, 0, 15, 0]
+
+        # Our small articles were never matched against our subject
+        assert hits[1] is None and hits[3] is None
+        assert hits[0] and hits[2]
+
+        # Only the rows we ask for are scored
+        assert program.score(columns, hits, index=[2, 3]) == [0, 0, 15, 0]
+
+        columns[FilterColumn.SCORE] = [10, 0, 15, 0]
+        assert program.match(
+            FilterListCode.BLACKLIST, columns, hits) == [1, 3]
+        assert program.match(
+            FilterListCode.BLACKLIST, columns, hits, index=[0, 1]) == [1]
+        assert program.match(FilterListCode.WHITELIST, columns, hits) == []
+
+        # No rows at all
+        columns = FilterProgram.columns([])
+        assert len(columns) == FilterColumn.XPOSTS + 1
+        assert program.score(columns, []) == []
+        assert program.match(FilterListCode.BLACKLIST, columns, []) == []
+
+
+    def test_program_literals(self):
+        """
+        Our starts and ends with directives are looked up through a trie.
+        """
+        fb = NNTPFilterBase()
+
+        for idx in range(500):
+            fb.blacklist_append('alt.binaries.*', {
+                FilterDirectives.SUBJECT_STARTS_WITH: 'Spam.%d ' % idx,
+            })
+            fb.blacklist_append('alt.binaries.*', {
+                FilterDirectives.POSTER_ENDS_WITH: '@spam%d.com>' % idx,
+            })
+
+        # The same literal in more then one rule
+        fb.scorelist_append('alt.binaries.*', {
+            FilterDirectives.SCORE: 10,
+            FilterDirectives.SUBJECT_STARTS_WITH: 'What',
+        })
+        fb.scorelist_append('alt.binaries.*', {
+            FilterDirectives.SCORE: 5,
+            FilterDirectives.SUBJECT_STARTS_WITH: 'What',
+            FilterDirectives.SUBJECT_ENDS_WITH: '(1/1)',
+            FilterDirectives.LINE_COUNT_GREATER_THAN: 100,
+        })
+
+        # Empty literals
+        fb.scorelist_append('alt.binaries.*', {
+            FilterDirectives.SCORE: 1,
+            FilterDirectives.POSTER_STARTS_WITH: '',
+        })
+        fb.scorelist_append('alt.binaries.*', {
+            FilterDirectives.SCORE: 100,
+            FilterDirectives.POSTER_ENDS_WITH: '',
+        })
+
+        program = fb.compile('alt.binaries.test')
+        assert len(program._literals) == 1004
+        assert len(program._tries) == 4
+
+        entries = []
+        for idx, (subject, poster) in enumerate((
+                ('What.A.Great.Show (1/1)', 'l2g <l2g@example.com>'),
+                ('What.A.Great.Show (1/2)', 'l2g <l2g@example.com>'),
+                ('Spam.42 (1/1)', 'l2g <l2g@example.com>'),
+                ('Spam.42(1/1)', 'l2g <l2g@spam499.com>'),
+                ('Spam (1/1)', 'l2g <l2g@spam500.com>'),
+                ('Nothing', ''))):
+            entry = copy(self.template_entry)
+            entry['article_no'] = idx
+            entry['subject'] = subject
+            entry['poster'] = poster
+            entry['score'] = 0
+            entries.append(entry)
+
+        columns = FilterProgram.columns(
+            [FilterProgram.row(**e) for e in entries])
+        literals = program.literals(columns, [0, 2, 5])
+        assert sorted(literals) == [0, 2, 5]
+        assert len(literals[0]) == 3
+        assert len(literals[2]) == 3
+        assert len(literals[5]) == 2
+
+        # The same results we'd get one entry at a time
+        expected = []
+        for entry in copy(entries):
+            entry['score'] += fb.score(**entry)
+            if fb.whitelist(**entry) or not fb.blacklist(**entry):
+                expected.append(entry)
+
+        results = apply_filters([fb], entries)
+        assert results == expected
+        assert [(e['article_no'], e['score']) for e in results] == \
+            [(0, 16), (1, 11), (4, 1), (5, 101)]
+
+
     # Test the loading of the same content by file
     def test_file_load(self):
         """
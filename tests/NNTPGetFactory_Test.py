@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+#
+# Test the NNTPGetFactory Object
+#
+# Copyright (C) 2017 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+
+import sys
+if 'threading' in sys.modules:
+    #  gevent patching since pytests import
+    #  the sys library before we do.
+    del sys.modules['threading']
+
+import gevent.monkey
+gevent.monkey.patch_all()
+
+import gevent
+
+from os.path import dirname
+from os.path import abspath
+
+try:
+    from tests.TestBase import TestBase
+
+except ImportError:
+    sys.path.insert(0, dirname(dirname(abspath(__file__))))
+    from tests.TestBase import TestBase
+
+from newsreap.HookManager import HookManager
+from newsreap.NNTPGetFactory import NNTPGetFactory
+
+
+class StubArticle(object):
+    """
+    An article holding size bytes of decoded content
+    """
+    def __init__(self, size):
+        self._size = size
+
+    def size(self):
+        return self._size
+
+
+class StubSegment(object):
+    """
+    A file made up of a few articles; placed identifies whether or not our
+    content can be written straight into the file it makes up.
+    """
+    def __init__(self, filename, articles, placed=True):
+        self.filename = filename
+        self.articles = articles
+        self.placed = placed
+
+    def place(self, article):
+        return self.placed
+
+    def __iter__(self):
+        return iter(self.articles)
+
+    def __len__(self):
+        return len(self.articles)
+
+
+class StubNZB(object):
+    """
+    Just enough of an NZB-File for our factory to work with
+    """
+    def __init__(self, segments):
+        self.segments = segments
+
+    def deobsfucate(self, segments=None):
+        pass
+
+
+class StubConnection(object):
+    """
+    Stands in for our NNTPManager; every article is retrieved
+    """
+    def __init__(self, events):
+        self.hooks = HookManager()
+        self.events = events
+
+    def get_iter(self, articles, work_dir=None, assembly_dir=None):
+        for article in articles:
+            self.events.append('get')
+            yield (article, article)
+
+
+class NNTPGetFactory_Test(TestBase):
+    """
+    A Class for testing NNTPGetFactory which handles the retrieval of
+    NZB-Files and Message-IDs.
+
+    """
+
+    def factory(self, segments, events):
+        """
+        Returns an NNTPGetFactory() ready to download the segments specified
+        """
+        factory = NNTPGetFactory(connection=StubConnection(events))
+        factory.nzb = StubNZB(segments)
+        factory.tmp_path = self.tmp_dir
+
+        def assemble(segment):
+            events.append('assemble')
+            return True
+
+        factory._assemble = assemble
+        factory._finalize = lambda segment: True
+        return factory
+
+    def test_download_staged(self):
+        """
+        Files are assembled while the rest of our articles download; we
+        only hold off retrieving more while the content waiting to be
+        assembled exceeds our memory budget.
+
+        """
+        # Content that was placed isn't waiting on anything so nothing
+        # holds back our downloads
+        events = []
+        segments = [
+            StubSegment(str(n), [StubArticle(100), StubArticle(100)])
+            for n in range(3)]
+
+        factory = self.factory(segments, events)
+        assert factory._download_staged(memory_budget=0) is True
+        assert events == ['get'] * 6 + ['assemble'] * 3
+
+        # Content that couldn't be placed counts against our budget; each
+        # file has to be assembled before we move on to the next
+        events = []
+        segments = [
+            StubSegment(str(n), [StubArticle(100), StubArticle(100)],
+                        placed=False) for n in range(3)]
+
+        factory = self.factory(segments, events)
+        assert factory._download_staged(memory_budget=0) is True
+        assert events == ['get', 'get', 'assemble'] * 3
+
+        # Content that fits within our budget doesn't hold us back
+        events = []
+        factory = self.factory(segments, events)
+        assert factory._download_staged(memory_budget=1000) is True
+        assert events == ['get'] * 6 + ['assemble'] * 3
+
+    def test_download_staged_failures(self):
+        """
+        A stage that fails (even by raising an exception) only fails the
+        file it was working on; everything else is still handled and our
+        download never hangs.
+
+        """
+        # More files then our queues can hold
+        count = NNTPGetFactory.assembly_queue_size * 3
+
+        for stage in ('_assemble', '_finalize'):
+            events = []
+            segments = [
+                StubSegment(str(n), [StubArticle(100), ], placed=False)
+                for n in range(count)]
+
+            factory = self.factory(segments, events)
+
+            handled = []
+
+            def fail(segment):
+                handled.append(segment)
+                if segment is segments[0]:
+                    raise RuntimeError('Stage failure')
+                return True
+
+            setattr(factory, stage, fail)
+
+            with gevent.Timeout(30):
+                assert factory._download_staged(memory_budget=0) is False
+
+            # Every one of our files was still handled
+            assert handled == segments
@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+#
+# Test the NNTP Group Database
+#
+# Copyright (C) 2017 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+
+import sys
+if 'threading' in sys.modules:
+    #  gevent patching since pytests import
+    #  the sys library before we do.
+    del sys.modules['threading']
+
+import gevent.monkey
+gevent.monkey.patch_all()
+
+import re
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from datetime import datetime
+
+try:
+    from tests.TestBase import TestBase
+
+except ImportError:
+    sys.path.insert(0, dirname(dirname(abspath(__file__))))
+    from tests.TestBase import TestBase
+
+from sqlalchemy import text
+from gevent.threadpool import ThreadPool
+from click.testing import CliRunner
+
+from tests.NNTPSocketServer import NNTPSocketServer
+
+from newsreap.NNTPGroupDatabase import NNTPGroupDatabase
+from newsreap.NNTPManager import NNTPManager
+from newsreap.NNTPSettings import NNTPSettings
+from newsreap.NNTPSettings import SQLITE_DATABASE_EXTENSION
+from newsreap.objects.nntp.Group import Group
+from newsreap.objects.nntp.Server import Server
+from newsreap.objects.nntp.GroupTrack import GroupTrack
+from newsreap.NNTPFilterBase import NNTPFilterBase
+from newsreap.NNTPFilterBase import FilterDirectives
+from newsreap.objects.group.Article import Article
+from newsreap.objects.group.Post import Post
+from newsreap.ArticleCollator import ArticleCollator
+from newsreap.plugins.cli.search import parse_search_keyword
+from newsreap.plugins.cli.search import parse_search_cursor
+from newsreap.plugins.cli.search import search_cursor
+from newsreap.plugins.cli.search import search_filters
+from newsreap.plugins.cli.search import search_match
+from newsreap.plugins.cli.search import search_rows
+from newsreap.plugins.cli.search import search_statement
+from newsreap.plugins.cli.search import merge_rows
+from newsreap.plugins.cli.update import rescore_articles
+from newsreap.plugins.cli.update import update_search
+
+
+class NNTPGroupDatabase_Test(TestBase):
+    """
+    Tests NNTPGroupDatabase
+    """
+
+    def test_search_index(self):
+        """
+        Our full-text index covers the articles we already had when it was
+        created and is kept up to date from then on.
+        """
+        db_file = join(self.tmp_dir, 'NNTPGroupDatabase.search.db')
+
+        # Create our database
+        db = NNTPGroupDatabase(engine='sqlite:///%s' % db_file, reset=True)
+        session = db.session()
+
+        # No index yet
+        assert db.has_search_index() is False
+
+        def add(no, subject, poster='l2g <l2g@example.com>'):
+            session.add(Article(
+                message_id='<%d@example.com>' % no, article_no=no,
+                subject=subject, poster=poster))
+            session.commit()
+
+        def search(*keywords):
+            match = search_match(parse_search_keyword(keywords))
+            return sorted(a.article_no for a in session.query(Article)
+                          .filter(text(
+                              'article.rowid IN (SELECT rowid FROM '
+                              'article_search WHERE article_search MATCH '
+                              ':match)').bindparams(match=match)))
+
+        # An article we had before our index
+        add(1, 'Big.Buck.Bunny.1080p "sample" (1/2)')
+
+        assert db.create_search_index() is True
+        assert db.has_search_index() is True
+
+        # Calling it again does nothing
+        assert db.create_search_index() is True
+
+        # Articles added after our index was created
+        add(2, 'Big.Buck.Bunny.720p (2/2)', poster='Jack <jack@example.com>')
+        add(3, 'Sintel.1080p (1/1)')
+
+        # Case is ignored and any part of our subject can be matched
+        assert search('bunny') == [1, 2]
+        assert search('1080P') == [1, 3]
+        assert search('bunny', '-1080p') == [2]
+        assert search('%pjack') == [2]
+        assert search('%p+l2g', '-%pjack') == [1, 3]
+        assert search('"sample"') == [1]
+
+        # Wildcards are looked up by the parts around them
+        assert search('Big%1080p') == [1]
+
+        # Nothing we can look up
+        assert search_match(parse_search_keyword(['ab', '-bunny'])) is None
+
+        # Our index follows our changes
+        session.query(Article).filter(Article.article_no == 3)\
+            .update({Article.subject: 'Tears.of.Steel.2160p'})
+        session.commit()
+        assert search('1080p') == [1]
+        assert search('steel') == [3]
+
+        session.query(Article).filter(Article.article_no == 1).delete()
+        session.commit()
+        assert search('bunny') == [2]
+
+        session.close()
+        db.close()
+
+    def test_search_groups(self):
+        """
+        Several groups are searched at the same time and their results are
+        merged (best first) and listed a page at a time.
+        """
+        paths = {}
+        for idx, name in enumerate(('alt.binaries.one', 'alt.binaries.two')):
+            paths[name] = join(
+                self.tmp_dir, 'NNTPGroupDatabase.%s.db' % name)
+
+            db = NNTPGroupDatabase(
+                engine='sqlite:///%s' % paths[name], reset=True)
+            session = db.session()
+
+            # Only our first group has a search index
+            if idx == 0:
+                assert db.create_search_index() is True
+
+            for no in range(1, 51):
+                session.add(Article(
+                    message_id='<%d.%d@example.com>' % (idx, no),
+                    article_no=no, subject='Subject %d' % no,
+                    poster='l2g <l2g@example.com>', score=no % (5 + idx),
+                    posted_date=datetime(2017, 1, no % 28 + 1)))
+
+            # An article cross-posted to both of our groups
+            session.add(Article(
+                message_id='<cross@example.com>', article_no=100,
+                subject='Subject cross-posted', poster='l2g', score=10,
+                posted_date=datetime(2017, 1, 1)))
+
+            session.commit()
+            session.close()
+            db.close()
+
+        keywords = parse_search_keyword(['Subject', '-Subject 1'])
+        filters = search_filters(keywords)
+        match = search_match(keywords)
+
+        pool = ThreadPool(2)
+
+        def search(after=None, limit=0):
+            statements = (
+                search_statement(
+                    filters, match=match, after=after, limit=limit),
+                search_statement(filters, after=after, limit=limit),
+            )
+            return list(merge_rows(dict(
+                (name, search_rows(pool, path, statements, chunk_size=7))
+                for name, path in paths.iteritems())))
+
+        results = search()
+
+        # Our cross-posted article is only listed once
+        assert len(results) == 2 * (50 - 11) + 1
+        assert results[0][1][2] == '<cross@example.com>'
+
+        # Best first
+        keys = [row[:3] for _, row in results]
+        assert keys == sorted(keys, reverse=True)
+
+        # Now a page at a time
+        pages = []
+        after = None
+        while True:
+            page = search(after=after, limit=10)
+            pages.extend(page[:10])
+            if len(page) <= 10:
+                break
+
+            after = parse_search_cursor(search_cursor(page[9][1]))
+
+        assert pages == results
+
+        # Bad cursors
+        assert parse_search_cursor('invalid') is None
+        assert parse_search_cursor(None) is None
+
+        pool.kill()
+
+    def test_rescore(self):
+        """
+        The articles we've cached can be rescored whenever our filters
+        change.
+        """
+        db_file = join(self.tmp_dir, 'NNTPGroupDatabase.rescore.db')
+
+        db = NNTPGroupDatabase(engine='sqlite:///%s' % db_file, reset=True)
+        session = db.session()
+
+        for no in range(1, 101):
+            session.add(Article(
+                message_id='<%d@example.com>' % no, article_no=no,
+                subject='Subject %d.%s' % (no, 'mkv' if no % 2 else 'avi'),
+                poster='l2g <l2g@example.com>', size=no * 1000, score=5,
+                posted_date=datetime(2017, 1, no % 28 + 1)))
+
+        session.commit()
+
+        fb = NNTPFilterBase()
+        fb.scorelist_append('alt.binaries.test', {
+            FilterDirectives.SCORE: 10,
+            FilterDirectives.SUBJECT_MATCHES_REGEX: '.*\.mkv$',
+        })
+        fb.scorelist_append('alt.binaries.test', {
+            FilterDirectives.SCORE: 5,
+            FilterDirectives.SIZE_GREATER_THAN: 50000,
+            FilterDirectives.DATE_LESS_THAN: datetime(2017, 1, 15),
+        })
+
+        expected = {}
+        for no in range(1, 101):
+            expected[no] = 10 if no % 2 else 0
+            if no * 1000 > 50000 and no % 28 + 1 < 15:
+                expected[no] += 5
+
+        # Only the scores that changed are written
+        changed = len([no for no, score in expected.items() if score != 5])
+        assert rescore_articles(
+            db_file, 'alt.binaries.test', [fb], chunk_size=7) == \
+            (100, changed)
+
+        session.expire_all()
+        assert dict(session.query(Article.article_no, Article.score)) == \
+            expected
+
+        # Our score index was rebuilt
+        assert session.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'index' AND "
+            "name = 'ix_article_score'").scalar() == 1
+
+        # Nothing changes the second time around
+        assert rescore_articles(
+            db_file, 'alt.binaries.test', [fb]) == (100, 0)
+
+        # Filters for other groups don't apply
+        assert rescore_articles(
+            db_file, 'alt.binaries.other', [fb]) == \
+            (100, len([s for s in expected.values() if s]))
+
+        session.expire_all()
+        assert session.query(Article)\
+            .filter(Article.score != 0).count() == 0
+
+        session.close()
+        db.close()
+
+
+    def test_collate(self):
+        """
+        Our articles are collated into posts a chunk at a time, picking up
+        where we left off; complete posts can be written as NZB-Files.
+        """
+        db_file = join(self.tmp_dir, 'NNTPGroupDatabase.collate.db')
+
+        db = NNTPGroupDatabase(engine='sqlite:///%s' % db_file, reset=True)
+        session = db.session()
+        assert db.create_post_tables() is True
+
+        def add(no, subject, poster='l2g <l2g@example.com>'):
+            session.add(Article(
+                message_id='%d@example.com' % no, article_no=no,
+                subject=subject, poster=poster, size=100,
+                posted_date=datetime(2017, 1, no)))
+
+        # Two files of one post (posted out of order), a single file
+        # posted without a description and an article that isn't part of
+        # a post at all
+        add(1, 'Big Buck Bunny [1/2] - "bbb.rar" yEnc (1/2)')
+        add(2, 'Big Buck Bunny [2/2] - "bbb.par2" yEnc (1/1)')
+        add(3, 'Not a post')
+        add(4, '"sintel.mkv" yEnc (1/1)')
+        add(5, 'big buck  bunny [1/2] - "bbb.rar" yEnc (1/2)',
+            poster='Jack <jack@example.com>')
+        session.commit()
+
+        pointers = []
+        collator = ArticleCollator(
+            db_file, on_commit=pointers.append, chunk_size=2)
+        assert collator.collate() is True
+        assert pointers == [2, 4, 5]
+        assert (collator.count, collator.skipped) == (4, 1)
+
+        # Posters don't share posts
+        key = ArticleCollator.key('l2g <l2g@example.com>', 'Big Buck Bunny', 2)
+        assert session.query(Post).count() == 3
+        sintel = ArticleCollator.key('l2g <l2g@example.com>', 'sintel.mkv')
+        assert collator.completed() == [sintel]
+
+        # Once written, a post isn't returned again
+        collator.written(sintel)
+        assert collator.completed() == []
+
+        post = session.query(Post).filter(Post.key == key).one()
+        assert (post.files, post.segments, post.total, post.complete) == \
+            (2, 2, 3, False)
+        collator.close()
+
+        # Our last part (and a repost of our first) arrives later
+        add(6, 'Big Buck Bunny [1/2] - "bbb.rar" yEnc (2/2)')
+        add(7, 'Big Buck Bunny [1/2] - "bbb.rar" yEnc (1/2)')
+        add(8, 'Big Buck Bunny [1/2] - "bbb.rar" yEnc (3/2)')
+        session.commit()
+
+        # We stop where we're told to
+        collator = ArticleCollator(db_file, pointer=pointers[-1])
+        assert collator.collate(high=7) is True
+        assert collator.pointer == 7
+        assert collator.count == 2
+        assert collator.completed() == [key]
+
+        session.expire_all()
+        post = session.query(Post).filter(Post.key == key).one()
+        assert (post.files, post.segments, post.total, post.size) == \
+            (2, 3, 3, 300)
+        assert post.posted_date == datetime(2017, 1, 1)
+
+        nzb = collator.nzb(key, groups='alt.binaries.test')
+        assert nzb.meta == {'name': 'Big Buck Bunny'}
+        assert [(f.filename, [a.msgid() for a in f]) for f in nzb] == [
+            ('bbb.par2', ['2@example.com']),
+            ('bbb.rar', ['1@example.com', '6@example.com']),
+        ]
+
+        nzbfile = join(self.tmp_dir, 'NNTPGroupDatabase.collate.nzb')
+        assert nzb.save(nzbfile) is True
+
+        assert collator.nzb('invalid') is None
+        collator.close()
+
+        # Posts that were never written (such as when we were interrupted)
+        # are still returned the next time around
+        collator = ArticleCollator(db_file, pointer=7)
+        assert collator.collate() is True
+        assert collator.completed() == [key]
+
+        # A post that gains segments is written again
+        collator.written(key)
+        add(9, 'Big Buck Bunny [2/2] - "bbb.par2" yEnc (1/1)',
+            poster='l2g <l2g@example.com>')
+        session.commit()
+        assert collator.collate() is True
+        assert collator.completed() == []
+
+        add(10, 'Big Buck Bunny [1/2] - "bbb.sfv" yEnc (1/1)')
+        session.commit()
+        assert collator.collate() is True
+        assert collator.completed() == [key]
+        collator.close()
+
+        session.close()
+        db.close()
+
+    def test_update_search(self):
+        """
+        The headers of a group are cached (from our server) into it's own
+        database; we pick up where we left off the next time around.
+        """
+        nntp = NNTPSocketServer(secure=False, join_group=True)
+        nntp.daemon = True
+        nntp.start()
+        ipaddr, portno = nntp.local_connection_info()
+
+        def xover(low, high):
+            return '224 Overview information follows\r\n' + ''.join(
+                '%d\tSubject %d\tl2g <l2g@example.com>\t'
+                'Sun, 01 Jan 2017 00:00:00 +0000\t<%d@example.com>\t\t'
+                '1000\t10\tXref: l2g alt.binaries.test:%d\r\n' % (
+                    no, no, no, no) for no in range(low, high + 1))
+
+        # Our group starts with 10 articles
+        nntp.set_override({
+            re.compile('GROUP alt.binaries.test'): {
+                'response': '211 10 1 10 alt.binaries.test',
+            },
+            re.compile('XOVER 2-10'): {'response': xover(2, 10)},
+        })
+
+        setting = NNTPSettings(cfg_file=join(self.tmp_dir, 'missing.yaml'))
+        setting.base_dir = join(self.tmp_dir, 'update_search')
+        setting.nntp_servers = [{
+            'username': 'valid',
+            'password': 'valid',
+            'host': ipaddr,
+            'port': portno,
+            'secure': False,
+            'join_group': True,
+        }]
+
+        assert setting.open(engine='sqlite:///%s' % join(
+            self.tmp_dir, 'NNTPGroupDatabase.update_search.db'), reset=True)
+        session = setting.session()
+        session.add(Server(name='test', host=ipaddr))
+        session.add(Group(name='alt.binaries.test', watch=True))
+        session.commit()
+
+        mgr = NNTPManager(setting)
+        ctx = {'NNTPSettings': setting, 'NNTPManager': mgr}
+
+        result = CliRunner().invoke(
+            update_search, ['alt.binaries.test'], obj=ctx,
+            catch_exceptions=False)
+        assert result.exit_code == 0
+
+        # Our first article is our starting point
+        db_file = '%s%s' % (join(
+            setting.base_dir, 'cache', 'search', 'alt.binaries.test'),
+            SQLITE_DATABASE_EXTENSION)
+
+        def cached():
+            db = NNTPGroupDatabase(engine='sqlite:///%s' % db_file)
+            group_session = db.session()
+            results = sorted(
+                no for no, in group_session.query(Article.article_no))
+            group_session.close()
+            return results
+
+        assert cached() == range(2, 11)
+
+        session = setting.session()
+        assert session.query(GroupTrack.scan_pointer).scalar() == 10
+
+        # More articles arrive
+        nntp.set_override({
+            re.compile('GROUP alt.binaries.test'): {
+                'response': '211 15 1 15 alt.binaries.test',
+            },
+            re.compile('XOVER 11-15'): {'response': xover(11, 15)},
+        })
+
+        result = CliRunner().invoke(
+            update_search, ['alt.binaries.test'], obj=ctx,
+            catch_exceptions=False)
+        assert result.exit_code == 0
+        assert cached() == range(2, 16)
+
+        session = setting.session()
+        assert session.query(GroupTrack.scan_pointer).scalar() == 15
+
+        mgr.close()
+        nntp.shutdown()
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
@@ -27,7 +27,9 @@ gevent.monkey.patch_all()
 # Import threading after monkey patching
 # see: http://stackoverflow.com/questions/8774958/\
 #        keyerror-in-module-threading-after-a-successful-py-test-run
+import re
 import threading
+import gevent
 
 from os.path import join
 from os.path import dirname
@@ -41,11 +43,13 @@ except ImportError:
     from tests.TestBase import TestBase
 
 from tests.NNTPSocketServer import NNTPSocketServer
+from tests.NNTPSocketServer import NNTP_TEST_VAR_PATH as VAR_PATH
 
 from newsreap.NNTPSettings import NNTPSettings
 from newsreap.NNTPManager import NNTPManager
 from newsreap.NNTPSettings import SERVER_LIST_KEY
 from newsreap.NNTPSettings import PROCESSING_KEY
+from newsreap.NNTPArticle import NNTPArticle
 
 
 class NNTPManager_Test(TestBase):
@@ -144,3 +148,369 @@ class NNTPManager_Test(TestBase):
 
         # Clean close
         mgr.close()
+
+    def test_multiple_servers(self):
+        """
+        Test that all of our servers are put to work and that articles
+        missing from one server are retrieved from another
+
+        """
+
+        cfg_file = join(self.tmp_dir, 'NNTPManager.config.yaml')
+
+        # Our article is only found on our second server
+        nntp = NNTPSocketServer(secure=False, join_group=True)
+        nntp.map(
+            article_id='5',
+            groups=('alt.binaries.test', ),
+            filepath=join(VAR_PATH, '00000005.ntx'),
+        )
+        nntp.daemon = True
+        nntp.start()
+        ipaddr, portno = nntp.local_connection_info()
+
+        servers = [
+            {
+                'username': 'valid',
+                'password': 'valid',
+                'host': self.nttp_ipaddr,
+                'port': self.nntp_portno,
+                'secure': 'False',
+                'compress': 'False',
+                'priority': '1',
+                'join_group': 'True',
+            },
+            {
+                'username': 'valid',
+                'password': 'valid',
+                # Our hosts must be unique
+                'host': 'localhost' if ipaddr != 'localhost' else ipaddr,
+                'port': portno,
+                'secure': 'False',
+                'compress': 'False',
+                'priority': '2',
+                'join_group': 'True',
+                'connections': 1,
+            },
+        ]
+
+        processing = {
+            # Our test server only supports one connection at this
+            # time
+            'threads': 1,
+        }
+
+        # Create a yaml configuration entry we can test with
+        with open(cfg_file, 'w') as fp:
+            fp.write('%s:\n' % PROCESSING_KEY)
+            fp.write('   %s' % ('   '.join(['%s: %s\n' % (k, v) \
+                for (k, v) in processing.items()])))
+
+            fp.write('%s:\n' % SERVER_LIST_KEY)
+            for server in servers:
+                fp.write(' - %s' % ('   '.join(['%s: %s\n' % (k, v) \
+                    for (k, v) in server.items()])))
+
+        # Settings Object
+        setting = NNTPSettings(cfg_file=cfg_file)
+        assert len(setting.nntp_servers) == 2
+
+        # Create our NNTP Manager Instance
+        mgr = NNTPManager(setting)
+
+        # We have a pool of workers for each of our servers
+        assert len(mgr._pools) == 2
+        assert mgr._pools[0].priority < mgr._pools[1].priority
+
+        # Anything other then an article request is handled by our
+        # primary server alone
+        mgr.group('alt.binaries.test')
+        assert len(mgr._pools[0].connections) == 1
+        assert len(mgr._pools[1].connections) == 0
+
+        # So only our primary server's connections handle XOVER requests
+        assert mgr.max_connections() == 2
+        assert mgr.xover_connections() == 1
+
+        # Our first server comes up empty so we're rerouted to the next one
+        article = mgr.get(
+            '5', work_dir=self.tmp_dir, group='alt.binaries.test')
+        assert isinstance(article, NNTPArticle) is True
+        assert iter(article.decoded).next().is_valid() is True
+
+        # Both of our servers were used
+        assert len(mgr._pools[0].connections) == 1
+        assert len(mgr._pools[1].connections) == 1
+
+        # Our measured throughput is tracked per server
+        assert mgr._pools[0].avg_time is not None
+        assert mgr._pools[1].avg_time is not None
+
+        # Clean close
+        mgr.close()
+        nntp.shutdown()
+
+    def test_get_iter(self):
+        """
+        Test that our articles are handed back to us as they're retrieved
+
+        """
+
+        cfg_file = join(self.tmp_dir, 'NNTPManager.config.yaml')
+
+        nntp = NNTPSocketServer(secure=False, join_group=True)
+        for article_id in ('5', '20', '21'):
+            nntp.map(
+                article_id=article_id,
+                groups=('alt.binaries.test', ),
+                filepath=join(VAR_PATH, '%.8d.ntx' % int(article_id)),
+            )
+        nntp.daemon = True
+        nntp.start()
+        ipaddr, portno = nntp.local_connection_info()
+
+        server = {
+            'username': 'valid',
+            'password': 'valid',
+            'host': ipaddr,
+            'port': portno,
+            'secure': 'False',
+            'compress': 'False',
+            'join_group': 'True',
+        }
+
+        processing = {
+            # Our test server only supports one connection at this
+            # time
+            'threads': 1,
+        }
+
+        # Create a yaml configuration entry we can test with
+        with open(cfg_file, 'w') as fp:
+            fp.write('%s:\n' % PROCESSING_KEY)
+            fp.write('   %s' % ('   '.join(['%s: %s\n' % (k, v) \
+                for (k, v) in processing.items()])))
+
+            fp.write('%s:\n' % SERVER_LIST_KEY)
+            fp.write(' - %s' % ('   '.join(['%s: %s\n' % (k, v) \
+                for (k, v) in server.items()])))
+
+        # Settings Object
+        setting = NNTPSettings(cfg_file=cfg_file)
+
+        # Create our NNTP Manager Instance
+        mgr = NNTPManager(setting)
+
+        # Never have more then 2 requests outstanding at once
+        results = mgr.get_iter(
+            ['20', '21', '5'],
+            work_dir=self.tmp_dir,
+            group='alt.binaries.test',
+            max_pending=2,
+        )
+
+        # Nothing is retrieved until we ask for it
+        assert len(mgr._pools[0].workers) == 0
+
+        # Everything we asked for is returned
+        found = set()
+        for article_id, response in results:
+            assert isinstance(response, NNTPArticle) is True
+            assert iter(response.decoded).next().is_valid() is True
+            found.add(article_id)
+
+        assert found == set(['20', '21', '5'])
+
+        # Clean close
+        mgr.close()
+        nntp.shutdown()
+
+    def test_shards(self):
+        """
+        Test that our work can be divided between several processes
+
+        """
+
+        cfg_file = join(self.tmp_dir, 'NNTPManager.config.yaml')
+
+        # Our test servers only support one connection at a time; so we
+        # use three of them (one for us and one for each of our shards)
+        servers = []
+        for _ in range(3):
+            nntp = NNTPSocketServer(secure=False, join_group=True)
+            for article_id in ('5', '20', '21'):
+                nntp.map(
+                    article_id=article_id,
+                    groups=('alt.binaries.test', ),
+                    filepath=join(VAR_PATH, '%.8d.ntx' % int(article_id)),
+                )
+            nntp.daemon = True
+            nntp.start()
+            servers.append(nntp)
+
+        processing = {
+            'threads': 1,
+            'shards': 2,
+        }
+
+        # Create a yaml configuration entry we can test with
+        with open(cfg_file, 'w') as fp:
+            fp.write('%s:\n' % PROCESSING_KEY)
+            fp.write('   %s' % ('   '.join(['%s: %s\n' % (k, v) \
+                for (k, v) in processing.items()])))
+
+            fp.write('%s:\n' % SERVER_LIST_KEY)
+            # Our hosts must be unique
+            for nntp, host in zip(
+                    servers, ('127.0.0.1', 'localhost', '127.0.0.2')):
+                ipaddr, portno = nntp.local_connection_info()
+                server = {
+                    'username': 'valid',
+                    'password': 'valid',
+                    'host': host,
+                    'port': portno,
+                    'secure': 'False',
+                    'compress': 'False',
+                    'join_group': 'True',
+                }
+                fp.write(' - %s' % ('   '.join(['%s: %s\n' % (k, v) \
+                    for (k, v) in server.items()])))
+
+        # Settings Object
+        setting = NNTPSettings(cfg_file=cfg_file)
+
+        # Create our NNTP Manager Instance
+        mgr = NNTPManager(setting)
+        assert len(mgr._shard_pool) == 2
+
+        # We kept our primary server for ourselves and each of our shards
+        # was given one of the others
+        assert [p.server['host'] for p in mgr._pools] == ['127.0.0.1']
+        assert [s['connections'] for s in mgr._shard_pool.stats()] == [1, 1]
+        assert mgr.max_connections() == 3
+
+        # Only our shards ever see our XOVER requests
+        assert mgr.xover_connections() == 2
+
+        # Everything we asked for is returned
+        found = set()
+        for article_id, response in mgr.get_iter(
+                ['20', '21', '5', '20'],
+                work_dir=self.tmp_dir,
+                group='alt.binaries.test'):
+
+            assert isinstance(response, NNTPArticle) is True
+            content = iter(response.decoded).next()
+            assert content.is_valid() is True
+
+            # Our content is managed by us (and not our shard)
+            assert content.is_attached() is True
+            found.add(article_id)
+
+        assert found == set(['20', '21', '5'])
+
+        # Both of our shards did their share of the work
+        assert [s['requests'] for s in mgr._shard_pool.stats()] == [2, 2]
+        assert [s['failed'] for s in mgr._shard_pool.stats()] == [0, 0]
+
+        # Our XOVER batches are divided between our shards too
+        for nntp in servers[1:]:
+            nntp.set_override({
+                re.compile('GROUP alt.binaries.xover'): {
+                    'response': '211 10 1 10 alt.binaries.xover',
+                },
+                re.compile('XOVER'): {
+                    'response': '224 Overview information follows\r\n'
+                    '1\tSubject\tl2g <l2g@example.com>\t'
+                    'Sun, 01 Jan 2017 00:00:00 +0000\t<1@example.com>\t\t'
+                    '1000\t10\tXref: l2g alt.binaries.xover:1\r\n',
+                },
+            })
+
+        ranges = []
+        for low, high, response in mgr.xover_iter(
+                'alt.binaries.xover', 1, 4, batch_size=2):
+            assert response is not None
+            ranges.append((low, high))
+
+        assert sorted(ranges) == [(1, 2), (3, 4)]
+        assert [s['requests'] for s in mgr._shard_pool.stats()] == [3, 3]
+
+        # Clean close
+        mgr.close()
+        for nntp in servers:
+            nntp.shutdown()
+
+    def test_xover_iter(self):
+        """
+        Test that our XOVER ranges are fetched a few at a time in batches
+        that adapt to how our server responds
+
+        """
+        # Settings Object
+        setting = NNTPSettings(cfg_file=join(self.tmp_dir, 'missing.yaml'))
+        setting.nntp_servers = [{
+            'username': 'valid',
+            'password': 'valid',
+            'host': self.nttp_ipaddr,
+            'port': self.nntp_portno,
+            'secure': False,
+            'join_group': True,
+        }]
+
+        # Create our NNTP Manager Instance
+        mgr = NNTPManager(setting)
+
+        # Track what's outstanding
+        pending = set()
+        peak = [0]
+
+        def put(request):
+            """
+            Stands in for our server; every article number in the ranges
+            requested is even (so only half of them are found) and anything
+            including article 50 fails.
+            """
+            pending.add(request)
+            peak[0] = max(peak[0], len(pending))
+
+            def run():
+                kwargs = request.actions[0][2]
+                low, high = kwargs['start'], kwargs['end']
+                pending.discard(request)
+                request.response.append(
+                    None if low <= 50 <= high else
+                    [no for no in range(low, high + 1) if not no % 2])
+                request.set()
+
+            gevent.spawn(run)
+
+        mgr.put = put
+
+        ranges = []
+        for low, high, response in mgr.xover_iter(
+                'alt.binaries.test', 1, 10000, batch_size=100,
+                max_pending=3):
+
+            if response is None:
+                # Our failed range was made as small as it could be
+                assert low <= 50 <= high
+                assert high - low + 1 <= 100 / 8
+
+            ranges.append((low, high))
+
+        # We never had more then we asked for outstanding
+        assert peak[0] <= 3
+
+        # Every article was requested once
+        ranges = sorted(ranges)
+        assert ranges[0][0] == 1
+        assert ranges[-1][1] == 10000
+        for idx in range(1, len(ranges)):
+            assert ranges[idx][0] == ranges[idx - 1][1] + 1
+
+        # Our server was quick so our batches grew
+        assert max(high - low + 1 for low, high in ranges) > 100
+
+        # Clean close
+        mgr.close()
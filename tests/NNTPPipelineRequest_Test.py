@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# Test the NNTPPipelineRequest Object
+#
+# Copyright (C) 2017 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+
+import sys
+if 'threading' in sys.modules:
+    #  gevent patching since pytests import
+    #  the sys library before we do.
+    del sys.modules['threading']
+
+import gevent.monkey
+gevent.monkey.patch_all()
+
+from os.path import dirname
+from os.path import abspath
+
+try:
+    from tests.TestBase import TestBase
+
+except ImportError:
+    sys.path.insert(0, dirname(dirname(abspath(__file__))))
+    from tests.TestBase import TestBase
+
+from newsreap.NNTPConnectionRequest import NNTPConnectionRequest
+from newsreap.NNTPPipelineRequest import NNTPPipelineRequest
+
+
+class StubConnection(object):
+    """
+    Stands in for our NNTPConnection; every call made is tracked
+    """
+    def __init__(self):
+        self.calls = []
+
+    def get(self, article, work_dir=None, **kwargs):
+        self.calls.append(('get', article, work_dir, kwargs))
+        return '%s@%s' % (article, work_dir)
+
+    def get_many(self, articles, work_dir=None, **kwargs):
+        self.calls.append(('get_many', articles, work_dir, kwargs))
+        return ['%s@%s' % (article, work_dir) for article in articles]
+
+
+class NNTPPipelineRequest_Test(TestBase):
+    """
+    A Class for testing NNTPPipelineRequest which processes a batch of
+    requests at once by pipelining them to the NNTP Server.
+
+    """
+
+    def test_shared_arguments(self):
+        """
+        Only requests sharing the same arguments (other then the article
+        itself) are pipelined together; each one is still handled with the
+        arguments it was created with.
+
+        """
+        requests = [
+            NNTPConnectionRequest([('get', ('1', '/a'), {}), ]),
+            NNTPConnectionRequest([('get', ('2', '/b'), {}), ]),
+            NNTPConnectionRequest([('get', ('3', '/a'), {}), ]),
+            NNTPConnectionRequest(
+                [('get', ('4', '/a'), {'assembly_dir': '/c'}), ]),
+            NNTPConnectionRequest([('get', ('5', '/b'), {}), ]),
+        ]
+
+        connection = StubConnection()
+        request = NNTPPipelineRequest(requests)
+        assert request.run(connection) is True
+        assert request.is_set() is True
+
+        assert connection.calls == [
+            ('get_many', ['1', '3'], '/a', {}),
+            ('get_many', ['2', '5'], '/b', {}),
+            ('get_many', ['4'], '/a', {'assembly_dir': '/c'}),
+        ]
+
+        # Every request gets the response to what it asked for
+        for r in requests:
+            assert r.is_set() is True
+
+        assert [r.response[0] for r in requests] == \
+            ['1@/a', '2@/b', '3@/a', '4@/a', '5@/b']
+
+        # Requests that can't be pipelined are run one after another
+        requests = [
+            NNTPConnectionRequest([('get', ('1', '/a'), {}), ]),
+            NNTPConnectionRequest([
+                ('get', ('2', '/a'), {}),
+                ('get', ('3', '/a'), {}),
+            ]),
+        ]
+
+        connection = StubConnection()
+        assert NNTPPipelineRequest(requests).run(connection) is True
+        assert connection.calls == [
+            ('get_many', ['1'], '/a', {}),
+            ('get', '2', '/a', {}),
+            ('get', '3', '/a', {}),
+        ]
@@ -76,6 +76,17 @@ NNTP_DEFAULT_MAP = {
     re.compile('XFEATURE COMPRESS GZIP'): {
         'response': '290 GZIP Feature enabled',
     },
+    re.compile('CAPABILITIES'): {
+        'response': '101 Capability list:' + '\r\n' +
+            'VERSION 2' + '\r\n' +
+            'READER' + '\r\n' +
+            'COMPRESS DEFLATE' + '\r\n',
+    },
+    re.compile('COMPRESS DEFLATE'): {
+        'response': '206 Compression active',
+        # Compress the rest of our session
+        'deflate': True,
+    },
     re.compile('LIST ACTIVE'): {
         'response': '215 Newsgroups in form "group high low flags".',
         'file': join(NNTP_TEST_VAR_PATH, 'group.list'),
@@ -190,6 +201,9 @@ class NNTPSocketServer(threading.Thread):
         # sent welcome
         self.sent_welcome = False
 
+        # Set when our session is to be compressed (RFC8054)
+        self._deflate = False
+
         # Override Map
         self.override_map = {}
 
@@ -285,6 +299,10 @@ class NNTPSocketServer(threading.Thread):
                     # Reset our current state
                     self.reset()
 
+                if 'deflate' in v:
+                    # Compress our session once our response has been sent
+                    self._deflate = True
+
                 if 'stat' in v:
                     entry = str(result.group(v['stat']))
                     if not self.current_group:
@@ -479,16 +497,19 @@ class NNTPSocketServer(threading.Thread):
                 # Truncate
                 data = BytesIO(data.read())
                 d_ptr = 0
+                d_len = data.tell()
                 data.seek(d_ptr)
 
             try:
                 # print('DEBUG: SERVER BLOCKING FOR DATA')
-                pending = self.socket.can_read(0.8)
+                # Clients may pipeline several commands at once; we only
+                # block for more data once we've handled all of them
+                pending = self.socket.can_read(0 if d_ptr < d_len else 0.8)
                 if pending is None:
                     # No more data
                     continue
 
-                if not pending:
+                if not pending and d_ptr == d_len:
                     # nothing pending; back to io_wait
                     continue
 
@@ -502,7 +523,8 @@ class NNTPSocketServer(threading.Thread):
                         return
                     # print('DEBUG: SERVER READ DATA: %s' % _data.rstrip())
 
-                    # Buffer response
+                    # Buffer response (after anything still pending)
+                    data.seek(0, 2)
                     data.write(_data)
                     d_len = data.tell()
 
@@ -533,6 +555,11 @@ class NNTPSocketServer(threading.Thread):
                 # print('DEBUG: SOCKET ERROR DURING SEND (EXITING)....')
                 return
 
+            if self._deflate:
+                # Everything from here on is compressed
+                self._deflate = False
+                self.socket.deflate()
+
         # print('DEBUG: handle() (EXITING)....')
 
     def run(self):
@@ -608,6 +635,9 @@ class NNTPSocketServer(threading.Thread):
         # Reset the current group
         self.current_group = None
 
+        # Compression is negotiated per connection
+        self._deflate = False
+
         # sent welcome
         self.sent_welcome = False
 
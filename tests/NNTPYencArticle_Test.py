@@ -33,6 +33,7 @@ from os.path import join
 from os.path import dirname
 from os.path import abspath
 from os.path import isfile
+from os.path import getsize
 from blist import sortedset
 
 try:
@@ -48,6 +49,7 @@ from tests.NNTPSocketServer import NNTP_TEST_VAR_PATH as VAR_PATH
 from newsreap.NNTPConnection import NNTPConnection
 from newsreap.NNTPIOStream import NNTPIOStream
 from newsreap.NNTPArticle import NNTPArticle
+from newsreap.NNTPSegmentedPost import NNTPSegmentedPost
 from newsreap.NNTPBinaryContent import NNTPBinaryContent
 
 
@@ -295,6 +297,204 @@ class NNTPYencArticle_Test(TestBase):
         # cleanup our file
         unlink(new_filepath)
 
+    def test_yenc_placement(self):
+        """
+        Tests the assembly of a yenc multi-message as each part arrives
+        """
+
+        # Create a non-secure connection
+        sock = NNTPConnection(
+            host=self.nttp_ipaddr,
+            port=self.nntp_portno,
+            username='valid',
+            password='valid',
+            secure=False,
+            join_group=True,
+        )
+
+        assert sock.connect() is True
+
+        segpost = NNTPSegmentedPost('joystick.jpg', work_dir=self.tmp_dir)
+
+        # We intententionally fetch the content out of order
+        article_21 = sock.get(
+            id='21', work_dir=self.tmp_dir, group=self.common_group)
+        article_20 = sock.get(id='20', work_dir=self.tmp_dir)
+        assert segpost.add(article_21) is True
+        assert segpost.add(article_20) is True
+
+        # Our yEnc offsets were tracked while decoding
+        assert article_20[0].begin() == 0
+        assert article_21[0].begin() == 11250
+        assert article_21[0].total_size() == 19338
+
+        # Nothing has been placed yet
+        assert segpost.is_placed() is False
+
+        # Place our content in the order it arrived
+        assert segpost.place(article_21) is True
+        assert segpost.is_placed() is False
+        assert segpost.place(article_20) is True
+        assert segpost.is_placed() is True
+
+        # Our join now just swaps in our assembled content
+        assert segpost.join() is True
+        assert len(segpost) == 1
+        assert segpost[0][0].is_valid() is True
+
+        # Compare File
+        decoded_filepath = join(self.var_dir, 'joystick.jpg')
+        with open(decoded_filepath, 'r') as fd_in:
+            decoded = fd_in.read()
+
+        assert decoded == segpost[0][0].getvalue()
+
+        # Close up our socket
+        sock.close()
+
+    def test_yenc_assembly_dir(self):
+        """
+        Tests the decoding of a yenc multi-message straight into the file
+        it makes up
+        """
+
+        # Create a non-secure connection
+        sock = NNTPConnection(
+            host=self.nttp_ipaddr,
+            port=self.nntp_portno,
+            username='valid',
+            password='valid',
+            secure=False,
+            join_group=True,
+        )
+
+        assert sock.connect() is True
+
+        assembly_dir = join(self.tmp_dir, 'assembly')
+        assembly_path = join(assembly_dir, 'joystick.jpg')
+
+        segpost = NNTPSegmentedPost('joystick.jpg', work_dir=self.tmp_dir)
+
+        # We intententionally fetch the content out of order
+        article_21 = sock.get(
+            id='21', work_dir=self.tmp_dir, group=self.common_group,
+            assembly_dir=assembly_dir)
+        assert segpost.add(article_21) is True
+
+        # Our part was decoded straight into the file it makes up
+        assert article_21[0].filepath == assembly_path
+        assert article_21[0].is_valid() is True
+        assert article_21[0].begin() == 11250
+        assert isfile(assembly_path) is True
+        assert getsize(assembly_path) == 19338
+
+        # We can't join a file that is missing parts
+        assert segpost.place(article_21) is True
+        assert segpost.is_placed() is False
+        assert segpost.join() is False
+
+        article_20 = sock.get(
+            id='20', work_dir=self.tmp_dir, assembly_dir=assembly_dir)
+        assert segpost.add(article_20) is True
+        assert article_20[0].filepath == assembly_path
+        assert segpost.place(article_20) is True
+        assert segpost.is_placed() is True
+
+        # Our join just swaps in our assembled content
+        assert segpost.join() is True
+        assert len(segpost) == 1
+        assert segpost[0][0].filepath == assembly_path
+        assert segpost[0][0].filename == 'joystick.jpg'
+        assert segpost[0][0].is_valid() is True
+
+        # Compare File
+        decoded_filepath = join(self.var_dir, 'joystick.jpg')
+        with open(decoded_filepath, 'r') as fd_in:
+            decoded = fd_in.read()
+
+        assert decoded == segpost[0][0].getvalue()
+
+        # Our assembled file is cleaned up with us (unless it's saved)
+        del article_20
+        del article_21
+        del segpost
+        assert isfile(assembly_path) is False
+
+        # Close up our socket
+        sock.close()
+
+    def test_pipelined_yenc_get(self):
+        """
+        Tests the retrieval of several yenc messages using a pipeline
+        """
+
+        # Create a non-secure connection
+        sock = NNTPConnection(
+            host=self.nttp_ipaddr,
+            port=self.nntp_portno,
+            username='valid',
+            password='valid',
+            secure=False,
+            join_group=True,
+            pipeline=2,
+        )
+        assert sock.pipeline_window == 2
+
+        assert sock.connect() is True
+
+        # 3 articles with a window of 2 forces us to top up our pipeline
+        # part way through
+        articles = sock.get_many(
+            ['20', '21', '5'],
+            work_dir=self.tmp_dir,
+            group=self.common_group,
+        )
+        assert sock.group_name == self.common_group
+        assert len(articles) == 3
+
+        for article in articles:
+            assert isinstance(article, NNTPArticle) is True
+            assert len(article.decoded) == 1
+            assert isinstance(iter(article.decoded).next(), NNTPBinaryContent)
+            assert iter(article.decoded).next().is_valid() is True
+
+        # Our responses are returned in the same order they were requested
+        assert articles[0].id == '20'
+        assert articles[1].id == '21'
+        assert articles[2].id == '5'
+
+        # Compare File
+        decoded_filepath = join(self.var_dir, 'testfile.txt')
+        with open(decoded_filepath, 'r') as fd_in:
+            decoded = fd_in.read()
+
+        assert decoded == iter(articles[2].decoded).next().getvalue()
+
+        # Responses that span several reads of our buffer are handled too
+        sock.MAX_BUFFER_SIZE = 128
+        sock._buffer = None
+        articles = sock.get_many(['21', '5'], work_dir=self.tmp_dir)
+        del sock.MAX_BUFFER_SIZE
+
+        assert len(articles) == 2
+        assert articles[0].id == '21'
+        assert articles[1].id == '5'
+        assert decoded == iter(articles[1].decoded).next().getvalue()
+
+        # STAT commands can be pipelined too
+        results = sock.stat_many(['20', '21'], full=False)
+        assert len(results) == 2
+        assert results[0]['Message-ID'] == '20'
+        assert results[1]['Message-ID'] == '21'
+
+        # Our connection is still in sync with the server afterwards
+        article = sock.get('5', work_dir=self.tmp_dir)
+        assert isinstance(article, NNTPArticle) is True
+        assert iter(article.decoded).next().is_valid() is True
+
+        # Close up our socket
+        sock.close()
+
     def test_partial_yenc_get(self):
         """
         Tests the handling of a partial yenc message